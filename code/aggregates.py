@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Shared count tensors for the figure pipeline
+
+Instead of masking the dataframe once per year or per region, every figure
+reads its counts from a single dense tensor indexed by
+(Year x Crisis_Catalyzed x Geographic_Region x Conflict_Type x Legal_Family),
+built with one np.bincount over the flattened cell index. Any per-year,
+per-region or per-type series is then a cheap sum over the other axes.
+"""
+
+import weakref
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DIMS = ('Year', 'Crisis_Catalyzed', 'Geographic_Region', 'Conflict_Type', 'Legal_Family')
+
+
+def _axis(series):
+    """
+    Map a column to (codes, labels). Integer columns get a contiguous
+    min..max axis so that empty years still show up as zero counts;
+    everything else is dictionary-encoded in order of first appearance.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype) and len(series):
+        lo, hi = int(series.min()), int(series.max())
+        return series.to_numpy(dtype=np.int64) - lo, pd.Index(np.arange(lo, hi + 1))
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(dtype=np.int64), series.cat.categories
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), pd.Index(uniques)
+
+
+class CountTensor:
+    """Dense case counts over named, labelled axes"""
+
+    def __init__(self, dims, labels, counts):
+        self.dims = tuple(dims)
+        self.labels = dict(labels)
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df, dims=DEFAULT_DIMS):
+        """Count every cell in one vectorized pass over df"""
+        codes, labels = [], {}
+        for dim in dims:
+            c, labels[dim] = _axis(df[dim])
+            codes.append(c)
+        shape = tuple(len(labels[d]) for d in dims)
+        valid = np.logical_and.reduce([c >= 0 for c in codes]) if codes else slice(None)
+        flat = np.ravel_multi_index([c[valid] for c in codes], shape)
+        counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+        return cls(dims, labels, counts)
+
+    def _selector(self, fixed):
+        """Index of the fixed labels, or None if one of them is not in the data"""
+        index = []
+        for dim in self.dims:
+            if dim in fixed:
+                position = self.labels[dim].get_indexer([fixed[dim]])[0]
+                if position < 0:
+                    return None
+                index.append(position)
+            else:
+                index.append(slice(None))
+        return tuple(index)
+
+    def marginal(self, *dims):
+        """Roll the tensor up onto the given dims (in that order)"""
+        missing = set(dims) - set(self.dims)
+        if missing:
+            raise KeyError(f"not a dimension of this tensor: {sorted(missing)}")
+        other = tuple(i for i, d in enumerate(self.dims) if d not in dims)
+        summed = self.counts.sum(axis=other)
+        kept = [d for d in self.dims if d in dims]
+        summed = np.moveaxis(summed, [kept.index(d) for d in dims], range(len(dims)))
+        return CountTensor(dims, {d: self.labels[d] for d in dims}, summed)
+
+    def count(self, **fixed):
+        """
+        Number of cases matching all fixed labels, e.g. count(Crisis_Catalyzed=1)
+        (0 for labels absent from the data)
+        """
+        if not fixed:
+            return int(self.counts.sum())
+        selector = self._selector(fixed)
+        return 0 if selector is None else int(self.counts[selector].sum())
+
+    def series(self, dim, **fixed):
+        """
+        Counts along one dim, restricted to the fixed labels of other dims
+        (all zero if one of those labels is absent from the data)
+        """
+        selector = self._selector(fixed)
+        if selector is None:
+            return pd.Series(0, index=self.labels[dim], name='count', dtype=self.counts.dtype)
+        sub = self.counts[selector]
+        remaining = [d for d in self.dims if d not in fixed]
+        axis = remaining.index(dim)
+        other = tuple(i for i in range(len(remaining)) if i != axis)
+        return pd.Series(sub.sum(axis=other), index=self.labels[dim], name='count')
+
+    def to_series(self):
+        """All cells as a Series over a (dims) MultiIndex"""
+        index = pd.MultiIndex.from_product([self.labels[d] for d in self.dims], names=self.dims)
+        return pd.Series(self.counts.ravel(), index=index, name='count')
+
+    def rollup(self, *dims, **groups):
+        """
+        marginal(*dims) with some dims coarsened: groups maps a dim to a
+        function from label to group label, e.g. rollup('Year',
+        'Crisis_Catalyzed', Year=lambda y: y // 5 * 5) for 5-year periods.
+        Each coarsening is one tensordot with a label-to-group indicator matrix.
+        """
+        m = self.marginal(*dims)
+        counts, labels = m.counts, dict(m.labels)
+        for dim, fn in groups.items():
+            axis = m.dims.index(dim)
+            codes, uniques = pd.factorize(pd.Index(labels[dim]).map(fn))
+            indicator = np.zeros((len(codes), len(uniques)), dtype=counts.dtype)
+            indicator[np.arange(len(codes)), codes] = 1
+            counts = np.moveaxis(np.tensordot(counts, indicator, axes=([axis], [0])), -1, axis)
+            labels[dim] = pd.Index(uniques)
+        return CountTensor(m.dims, labels, counts)
+
+    def moving_average(self, dim, window=3, labels=None, **fixed):
+        """
+        Centred moving average of series(dim, **fixed) over `window`
+        consecutive labels of an integer dim (e.g. a 3-year average), with
+        labels missing from the data counted as zero. Evaluated at `labels`
+        (default: the tensor's own axis); positions whose window runs past
+        both the data and `labels` are NaN, like rolling(center=True).
+        """
+        series = self.series(dim, **fixed)
+        axis = series.index if labels is None else series.index.union(pd.Index(labels))
+        if len(axis):
+            axis = pd.Index(np.arange(axis.min(), axis.max() + 1))
+        values = series.reindex(axis, fill_value=0).to_numpy(dtype=float)
+        sums = np.convolve(values, np.ones(window), mode='same')
+        half = window // 2
+        valid = np.zeros(len(values), dtype=bool)
+        valid[half:len(values) - (window - 1 - half)] = True
+        average = pd.Series(np.where(valid, sums / window, np.nan), index=axis, name='moving_average')
+        return average if labels is None else average.reindex(labels)
+
+
+class CountAccumulator:
+    """
+    Incremental version of CountTensor.from_frame for data that arrives in
+    batches. Label vocabularies grow as new values appear; result() gives
+    the same tensor as counting the concatenated batches in one go.
+    """
+
+    def __init__(self, dims=DEFAULT_DIMS):
+        self.dims = tuple(dims)
+        self.labels = {d: pd.Index([]) for d in self.dims}
+        self.integer = {d: None for d in self.dims}
+        self.counts = np.zeros((0,) * len(self.dims), dtype=np.int64)
+        self.rows = 0
+
+    def _codes(self, dim, series):
+        if self.integer[dim] is None:
+            self.integer[dim] = pd.api.types.is_integer_dtype(series.dtype)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            batch_labels, batch_codes = series.cat.categories, series.cat.codes.to_numpy()
+        else:
+            batch_codes, batch_labels = pd.factorize(series)
+        new = batch_labels[~batch_labels.isin(self.labels[dim])]
+        if len(new):
+            self.labels[dim] = self.labels[dim].append(pd.Index(new))
+        mapping = self.labels[dim].get_indexer(batch_labels)
+        return np.where(batch_codes >= 0, mapping[batch_codes], -1)
+
+    def add(self, batch):
+        """
+        Fold one batch of cases into the running counts. Only the cells the
+        batch falls into are written; returns how many distinct cells that was.
+        """
+        codes = [self._codes(d, batch[d]) for d in self.dims]
+        shape = tuple(len(self.labels[d]) for d in self.dims)
+        if shape != self.counts.shape:
+            grown = np.zeros(shape, dtype=np.int64)
+            grown[tuple(slice(0, n) for n in self.counts.shape)] = self.counts
+            self.counts = grown
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        flat = np.ravel_multi_index([c[valid] for c in codes], shape)
+        cells, n = np.unique(flat, return_counts=True)
+        self.counts.flat[cells] += n
+        self.rows += len(batch)
+        return len(cells)
+
+    def result(self):
+        """CountTensor over everything added so far"""
+        counts, labels = self.counts, {}
+        for axis, dim in enumerate(self.dims):
+            labels[dim] = self.labels[dim]
+            if self.integer[dim] and len(labels[dim]):
+                # Integer axes are contiguous and sorted, as in from_frame()
+                values = labels[dim].astype(np.int64)
+                full = pd.Index(np.arange(values.min(), values.max() + 1))
+                grown = np.zeros(counts.shape[:axis] + (len(full),) + counts.shape[axis + 1:],
+                                 dtype=counts.dtype)
+                index = [slice(None)] * counts.ndim
+                index[axis] = full.get_indexer(values)
+                grown[tuple(index)] = counts
+                counts, labels[dim] = grown, full
+        return CountTensor(self.dims, labels, counts)
+
+
+def stream_counts(batches, dims=DEFAULT_DIMS):
+    """CountTensor for an iterable of batches without concatenating them"""
+    acc = CountAccumulator(dims)
+    for batch in batches:
+        acc.add(batch)
+    return acc.result()
+
+
+# Tensors already built for a frame, keyed by id() and dropped with the frame.
+# Frames are treated as read-only once counted.
+_cache = {}
+
+
+def case_counts(df, dims=DEFAULT_DIMS):
+    """
+    CountTensor for df, built once per frame and shared by every figure that
+    asks for the same dims.
+    """
+    if isinstance(df, CountTensor):
+        return df
+    key = (id(df), tuple(dims))
+    tensor = _cache.get(key)
+    if tensor is None:
+        tensor = _cache[key] = CountTensor.from_frame(df, dims)
+        weakref.finalize(df, _cache.pop, key, None)
+    return tensor
+
+
+def ranked(series):
+    """Non-zero counts sorted descending, ties kept in label order (like value_counts)"""
+    series = series[series > 0]
+    return series.sort_values(ascending=False, kind='stable')
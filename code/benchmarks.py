@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmarks for the analysis pipeline on synthetic case tables
+
+For each table size (default 10^3 to 10^5 rows; up to 10^7 on request) the
+suite writes a synthetic CSV (see synthetic_data.py) and times:
+  load/*       load_data() from CSV (cold) and from the sidecar (warm),
+               and the streaming load_counts() path
+  validate/*   codebook validation of the loaded table and of the stream
+  aggregate/*  the shared count tensor and each figure's reads from it
+  layout/*     ego network and layout of a synthetic citation graph
+  stats/*      propensity model, matching, balance, bootstrap,
+               permutation and Rosenbaum bounds, and the Figure 4 fitness
+               simulation (FITNESS_TRAJECTORIES per cell)
+  search/*     similarity index build and SEARCH_QUERIES top-10 queries
+               on the exact and LSH paths
+Each stage runs --repeat times and the fastest run is kept. Every run is
+appended as one JSON line to the history file together with the machine
+and library versions, and compared with earlier runs on the same machine:
+a stage that got slower than --threshold x its previous median is
+reported as a regression (--check turns that into exit status 1).
+
+Stages that grow much faster than linearly are capped by row count
+(STAGE_MAX_ROWS) so that large sizes still finish; skipped stages are
+listed in the run record.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+import citation_network
+import fitness_sim
+import profiling
+import psm
+import resampling
+import similarity
+import synthetic_data
+import validation
+from aggregates import CountTensor, ranked
+from generate_paper_figures import load_counts, load_data
+
+HISTORY = Path('../benchmarks') / 'history.jsonl'
+DEFAULT_SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+
+# Citation graphs grow with the table but stop here
+GRAPH_MAX_NODES = 1_000_000
+
+# Row limits for stages that would dominate larger runs
+STAGE_MAX_ROWS = {
+    'layout/layout': 10 ** 5,   # spectral layout: eigsh converges slowly on large graphs
+}
+RESAMPLING_REPLICATES = 200
+SEARCH_QUERIES = 1000
+FITNESS_TRAJECTORIES = 100_000
+
+# What each figure reads from the shared count tensor (mirrors the figures)
+FIGURE_AGGREGATIONS = {
+    'figure1_timeline': lambda c: (
+        c.series('Year', Crisis_Catalyzed=1).reindex(range(2000, 2026), fill_value=0),
+        c.series('Year', Crisis_Catalyzed=0).reindex(range(2000, 2026), fill_value=0)),
+    'figure2_geographic_map': lambda c: [
+        c.count(Geographic_Region=r, **fixed)
+        for r in ('Europe', 'Latin America')
+        for fixed in ({}, {'Crisis_Catalyzed': 1}, {'Crisis_Catalyzed': 0})],
+    'figure3_conflict_typology': lambda c: ranked(c.series('Conflict_Type')),
+    'figure7_temporal_cycles': lambda c: [
+        c.moving_average('Year', 3, labels=range(2008, 2025), Crisis_Catalyzed=g) for g in (0, 1)],
+}
+
+
+def _quiet(fn, *args, **kwargs):
+    """Call fn with its progress output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+class Bench:
+    """Times stages at one table size, keeping the fastest of `repeat` runs"""
+
+    def __init__(self, rows, repeat):
+        self.rows = rows
+        self.repeat = repeat
+        self.results = []
+        self.skipped = []
+
+    def time(self, stage, fn, setup=None):
+        limit = STAGE_MAX_ROWS.get(stage)
+        if limit is not None and self.rows > limit:
+            self.skipped.append(stage)
+            return None
+        best, value = None, None
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            profiler = profiling.StageProfiler(trace_memory=False)
+            with profiler.stage(stage):
+                value = fn()
+            record = profiler.records[-1]
+            if best is None or record['wall_s'] < best['wall_s']:
+                best = record
+        self.results.append({'stage': stage, 'rows': self.rows,
+                             **{k: round(best[k], 6) for k in profiling.BUDGET_FIELDS
+                                if k != 'peak_mb'}})
+        print(f"  {stage:<40} {best['wall_s']:9.4f} s")
+        return value
+
+
+def run_size(rows, seed=0, repeat=3, vocab=None):
+    """Benchmark every stage on a synthetic table of the given size"""
+    print(f"\n{rows:,} rows")
+    csv = synthetic_data.write_csv(rows, seed, vocab=vocab)
+    bench = Bench(rows, repeat)
+
+    def drop_sidecar():
+        shutil.rmtree(case_data.sidecar_dir(csv), ignore_errors=True)
+
+    # Load
+    bench.time('load/csv', lambda: _quiet(load_data, [csv]), setup=drop_sidecar)
+    df = bench.time('load/sidecar', lambda: _quiet(load_data, [csv]))
+    bench.time('load/stream', lambda: _quiet(load_counts, [csv]))
+    bench.time('validate/frame', lambda: validation.validate(df))
+    bench.time('validate/stream', lambda: validation.validate_paths([csv], batch_rows=100_000))
+
+    # Aggregate
+    counts = bench.time('aggregate/tensor', lambda: CountTensor.from_frame(df))
+    for name, read in FIGURE_AGGREGATIONS.items():
+        bench.time(f'aggregate/{name}', lambda: read(counts))
+
+    # Layout
+    graph = synthetic_data.citation_graph(min(rows, GRAPH_MAX_NODES), seed=seed)
+    hub = graph.nodes['Node_ID'].iloc[0]
+    bench.time('layout/ego_network', lambda: citation_network.ego_network(graph, hub, k=1))
+    bench.time('layout/pagerank', lambda: citation_network.pagerank(graph))
+    bench.time('layout/layout', lambda: citation_network.layout(graph, seed=42, cache_dir=None))
+
+    # Statistics
+    treated = df[psm.TREATMENT].to_numpy() == 1
+    X = bench.time('stats/design_matrix', lambda: psm.design_matrix(df))
+    scores = bench.time('stats/propensity', lambda: psm.estimate_propensity(X, treated))
+    matches = bench.time('stats/match', lambda: psm.match(scores, treated, caliper=0.2 * scores.std()))
+    bench.time('stats/balance', lambda: psm.balance_table(X, treated))
+    # Year stands in for an outcome: only the cost matters here
+    year = df['Year'].to_numpy(dtype=float)
+    batch_size = max(1, 10 ** 7 // rows)
+    kwargs = dict(n_replicates=RESAMPLING_REPLICATES, batch_size=batch_size, seed=seed)
+    bench.time('stats/bootstrap', lambda: resampling.bootstrap_ci(year[treated], year[~treated], **kwargs))
+    bench.time('stats/permutation',
+               lambda: resampling.permutation_pvalue(year[treated], year[~treated], **kwargs))
+    if matches is not None:
+        bench.time('stats/rosenbaum', lambda: resampling.rosenbaum_bounds(
+            year[matches['treated']], year[matches['control']]))
+    bench.time('stats/fitness_sim', lambda: fitness_sim.simulate(counts, FITNESS_TRAJECTORIES, seed=seed))
+
+    # Similarity search
+    queries = np.random.default_rng(seed).integers(0, rows, SEARCH_QUERIES)
+    index = bench.time('search/index', lambda: similarity.SimilarityIndex(df, method='exact'))
+    bench.time('search/exact', lambda: index.query(queries, k=10))
+    lsh = similarity.SimilarityIndex(df, method='lsh')
+    bench.time('search/lsh', lambda: lsh.query(queries, k=10))
+    return bench
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'commit': _git_commit(),
+    }
+
+
+def load_history(path):
+    if not Path(path).exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, run):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+
+
+def regressions(run, history, threshold=1.5, floor_s=0.01):
+    """
+    Stages of run slower than threshold x the median of earlier runs on the
+    same host at the same size. Stages under floor_s are timer noise.
+    """
+    earlier = [r for r in history if r['env']['host'] == run['env']['host']]
+    past = {}
+    for r in earlier:
+        for res in r['results']:
+            past.setdefault((res['stage'], res['rows']), []).append(res['wall_s'])
+    found = []
+    for res in run['results']:
+        times = past.get((res['stage'], res['rows']))
+        if not times:
+            continue
+        baseline = float(np.median(times))
+        if res['wall_s'] > floor_s and res['wall_s'] > threshold * baseline:
+            found.append((res['stage'], res['rows'], baseline, res['wall_s']))
+    return found
+
+
+def scaling_table(results):
+    """Wall time per stage and size, plus the log-log slope between the two largest sizes"""
+    table = pd.DataFrame(results).pivot(index='stage', columns='rows', values='wall_s')
+    table = table.reindex(pd.unique(pd.DataFrame(results)['stage']))
+    sizes = [c for c in table.columns if table[c].notna().any()]
+    if len(sizes) >= 2:
+        a, b = sizes[-2], sizes[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            table['exponent'] = np.log(table[b] / table[a]) / np.log(b / a)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline on synthetic datasets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='table sizes in rows (default: 1000 10000 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, fastest kept (default: 3)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', type=Path, default=HISTORY,
+                        help=f'JSON-lines run history (default: {HISTORY})')
+    parser.add_argument('--no-record', action='store_true', help='do not append this run to the history')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='report stages slower than this x their previous median (default: 1.5)')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on regressions')
+    args = parser.parse_args()
+
+    vocab = synthetic_data.Vocabulary.from_csv()
+    started = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    benches = [run_size(rows, args.seed, args.repeat, vocab) for rows in sorted(args.sizes)]
+    run = {
+        'timestamp': started,
+        'env': environment(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': [r for b in benches for r in b.results],
+        'skipped': {b.rows: b.skipped for b in benches if b.skipped},
+    }
+
+    print("\nWall time (s) by stage and rows; exponent = log-log slope between the two largest sizes:")
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.4f}'.format):
+        print(scaling_table(run['results']).to_string())
+
+    found = regressions(run, load_history(args.history), args.threshold)
+    if not args.no_record:
+        append_history(args.history, run)
+        print(f"\n✓ Run appended to {args.history}")
+    if found:
+        print(f"\n✗ REGRESSIONS (> {args.threshold}x previous median):")
+        for stage, rows, baseline, now in found:
+            print(f"  • {stage} @ {rows:,} rows: {baseline:.4f} s -> {now:.4f} s")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Typed loader for the case dataset (see data/DATA_CODEBOOK.md)
+
+The CSV is parsed once with explicit dtypes taken from the codebook:
+low-cardinality string variables become categoricals, Year and
+Crisis_Catalyzed become compact integers. The parsed table is written to a
+binary sidecar next to the CSV (one .npy array per column plus a JSON
+header holding the category labels) and reused, memory-mapped, for as long
+as the CSV is unchanged.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Column -> storage type, in file order (codebook variables 1-11).
+#   'category' : dictionary-encoded, labels kept in order of first appearance
+#   'text'     : free text, dictionary-encoded in the sidecar only
+#   numpy dtype: stored as-is
+SCHEMA = {
+    'Case_ID': 'text',
+    'Country': 'category',
+    'Year': 'int16',
+    'Crisis_Catalyzed': 'int8',
+    'Event_Name': 'text',
+    'Geographic_Region': 'category',
+    'Legal_Family': 'category',
+    'Conflict_Type': 'category',
+    'International_Tribunal': 'category',
+    'Verified_Status': 'category',
+    'Primary_Sources': 'text',
+}
+SIDECAR_VERSION = 1
+
+# Scripts run from code/, like generate_paper_figures.py
+DEFAULT_CSV = Path('../data') / 'dataset_PSM_60casos_clean.csv'
+
+CATEGORY_COLUMNS = [c for c, t in SCHEMA.items() if t == 'category']
+TEXT_COLUMNS = [c for c, t in SCHEMA.items() if t == 'text']
+INTEGER_COLUMNS = [c for c, t in SCHEMA.items() if t not in ('category', 'text')]
+
+
+def sidecar_dir(csv_path):
+    """Binary cache location for a CSV: data/.cache/<stem>/"""
+    return csv_path.parent / '.cache' / csv_path.stem
+
+
+def _source_stamp(csv_path):
+    st = csv_path.stat()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _codes_dtype(n_labels):
+    """Smallest signed integer type that holds the codes (-1 marks missing)"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_labels <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _in_appearance_order(series):
+    """Reorder categories to first appearance, matching object-dtype semantics"""
+    codes = series.cat.codes.to_numpy()
+    order = pd.unique(codes[codes >= 0])
+    return series.cat.reorder_categories(series.cat.categories[order])
+
+
+def _read_dtypes():
+    # Integers are read nullable (Int16, Int8), so a blank Year reaches the
+    # codebook checks as a missing value instead of failing the parse
+    return {c: object if t == 'text' else t if t == 'category' else t.capitalize()
+            for c, t in SCHEMA.items()}
+
+
+def parse_csv(csv_path, **read_csv_kwargs):
+    """Parse a case CSV with codebook dtypes (no sidecar involved)"""
+    df = pd.read_csv(csv_path, dtype=_read_dtypes(), **read_csv_kwargs)
+    return apply_schema(df)
+
+
+def apply_schema(df):
+    """
+    Normalize a freshly parsed frame (or chunk): category order, and
+    integer columns back to their compact numpy type unless they have
+    missing values (those stay nullable for validation to report)
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = _in_appearance_order(df[col].astype('category'))
+    for col in INTEGER_COLUMNS:
+        if col in df and not df[col].hasnans:
+            df[col] = df[col].astype(SCHEMA[col])
+    return df
+
+
+def expand_paths(paths):
+    """Expand directories to the CSV files they contain (sorted)"""
+    out = []
+    for path in map(Path, paths):
+        out.extend(sorted(path.glob('*.csv')) if path.is_dir() else [path])
+    return out
+
+
+def check_batch(batch, source=''):
+    """
+    Minimal codebook check for one parsed batch: every codebook column is
+    present, required fields are filled and Crisis_Catalyzed is 0/1.
+    """
+    missing = [c for c in SCHEMA if c not in batch.columns]
+    if missing:
+        raise ValueError(f"{source}: missing codebook columns {missing}")
+    empty = batch.columns[batch.isna().any()].tolist()
+    if empty:
+        raise ValueError(f"{source}: missing values in required fields {empty}")
+    bad = ~batch['Crisis_Catalyzed'].isin([0, 1])
+    if bad.any():
+        raise ValueError(f"{source}: Crisis_Catalyzed must be 0/1, "
+                         f"got {sorted(batch.loc[bad, 'Crisis_Catalyzed'].unique())}")
+    return batch
+
+
+def iter_batches(paths, batch_rows=100_000, validate=check_batch):
+    """
+    Yield typed, validated batches of at most batch_rows cases from one or
+    more case CSVs (directories expand to their *.csv files). Memory use is
+    bounded by the batch size, not the dataset size.
+    """
+    for path in expand_paths(paths):
+        yield from read_batches(path, batch_rows, validate, path.name)
+
+
+def read_batches(source, batch_rows=100_000, validate=check_batch, label='',
+                 **read_csv_kwargs):
+    """
+    Typed, validated batches from one CSV path or open buffer; extra
+    arguments go to pd.read_csv (e.g. names/header for a headerless tail).
+    """
+    with pd.read_csv(source, dtype=_read_dtypes(), chunksize=batch_rows,
+                     **read_csv_kwargs) as reader:
+        for i, chunk in enumerate(reader):
+            batch = apply_schema(chunk)
+            if validate is not None:
+                validate(batch, f"{label} (batch {i})")
+            yield batch
+
+
+def write_sidecar(df, csv_path):
+    """Write df as one .npy per column plus meta.json; returns the directory"""
+    target = sidecar_dir(csv_path)
+    tmp = target.with_name(target.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    labels = {}
+    for col in df.columns:
+        series = df[col]
+        if SCHEMA.get(col) in ('category', 'text'):
+            cat = series if SCHEMA[col] == 'category' else \
+                _in_appearance_order(series.astype('category'))
+            labels[col] = [str(v) for v in cat.cat.categories]
+            values = cat.cat.codes.to_numpy().astype(_codes_dtype(len(labels[col])))
+        else:
+            values = series.to_numpy()
+        np.save(tmp / f'{col}.npy', values, allow_pickle=False)
+
+    meta = {
+        'version': SIDECAR_VERSION,
+        'source': _source_stamp(csv_path),
+        'columns': list(df.columns),
+        'rows': len(df),
+        'labels': labels,
+    }
+    (tmp / 'meta.json').write_text(json.dumps(meta))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return target
+
+
+def read_sidecar(csv_path, columns=None):
+    """
+    Load the table from its sidecar, or return None if the sidecar is
+    missing or was written for a different version of the CSV.
+    """
+    target = sidecar_dir(csv_path)
+    try:
+        meta = json.loads((target / 'meta.json').read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get('version') != SIDECAR_VERSION or meta.get('source') != _source_stamp(csv_path):
+        return None
+
+    data = {}
+    for col in columns or meta['columns']:
+        values = np.load(target / f'{col}.npy', mmap_mode='r', allow_pickle=False)
+        if SCHEMA.get(col) == 'category':
+            data[col] = pd.Categorical.from_codes(values, meta['labels'][col])
+        elif SCHEMA.get(col) == 'text':
+            # code -1 (missing) reads the trailing None
+            labels = np.array(meta['labels'][col] + [None], dtype=object)
+            data[col] = pd.Series(labels[values], dtype=object)
+        else:
+            data[col] = values
+    return pd.DataFrame(data)
+
+
+def load_cases(csv_path, use_sidecar=True):
+    """
+    Load the case table with codebook dtypes, reusing the binary sidecar
+    while the CSV is unchanged and (re)writing it otherwise.
+    """
+    if use_sidecar:
+        df = read_sidecar(csv_path)
+        if df is not None:
+            return df
+    df = parse_csv(csv_path)
+    # Blank integers keep nullable columns, which the sidecar does not store;
+    # such a table fails validation anyway, so it is simply not cached
+    if use_sidecar and all(df[c].dtype == SCHEMA[c] for c in INTEGER_COLUMNS if c in df):
+        try:
+            write_sidecar(df, csv_path)
+        except OSError as exc:  # read-only checkout: still usable, just slower
+            print(f"  (could not write dataset cache: {exc})")
+    return df
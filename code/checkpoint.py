@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Resumable on-disk checkpoints for long-running analyses
+
+A Checkpoint is the saved state of one run: named NumPy arrays plus a
+small JSON-able meta dict, written atomically as a single uncompressed .npz
+under data/.cache/checkpoints/. Its file name carries a hash of the run's
+parameters (and a digest of its input data), so a run only resumes from
+state written by the same computation. Long loops call due() and save()
+as they go; after an interruption the same call picks up from the last
+save instead of starting over.
+
+Used by resampling.resample() (finished replicate batches) and
+psm.match() (the greedy matching state and the pairs so far); both clear
+their checkpoint once the run completes. Aggregate cubes checkpoint themselves through their
+ledger (cube.py), and spectral layouts are persisted whole by
+citation_network.layout(): ARPACK offers no intermediate state to resume.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_DIR = Path('../data') / '.cache' / 'checkpoints'
+
+# Default seconds between periodic saves
+SAVE_EVERY = 30.0
+
+
+def digest(*arrays):
+    """Content hash of arrays, to tie a checkpoint to its input data"""
+    h = hashlib.sha256()
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        h.update(f'{a.dtype.str}{a.shape}'.encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+class Checkpoint:
+    """State of one run (name + parameters), saved every `every` seconds"""
+
+    def __init__(self, name, params=None, directory=CHECKPOINT_DIR, every=SAVE_EVERY):
+        key = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        self.path = Path(directory) / f'{name}-{key[:16]}.npz'
+        self.every = every
+        self.saves = 0
+        self._saved_at = time.monotonic()
+
+    def load(self):
+        """(meta, arrays) of the last save, or (None, {}) if there is none"""
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                arrays = {k: z[k] for k in z.files}
+            meta = json.loads(str(arrays.pop('__meta__')))
+        except (FileNotFoundError, KeyError, ValueError, OSError, zipfile.BadZipFile):
+            return None, {}
+        if meta.get('version') != CHECKPOINT_VERSION:
+            return None, {}
+        return meta, arrays
+
+    def due(self):
+        return time.monotonic() - self._saved_at >= self.every
+
+    def save(self, meta, **arrays):
+        """Replace the checkpoint with this state (atomically)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            np.savez(f, __meta__=np.array(json.dumps({**meta, 'version': CHECKPOINT_VERSION})),
+                     **arrays)
+        os.replace(tmp, self.path)
+        self.saves += 1
+        self._saved_at = time.monotonic()
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List or remove saved checkpoints')
+    parser.add_argument('--clear', action='store_true', help='remove all checkpoints')
+    parser.add_argument('--dir', type=Path, default=CHECKPOINT_DIR)
+    args = parser.parse_args()
+
+    files = sorted(args.dir.glob('*.npz')) if args.dir.exists() else []
+    for path in files:
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z['__meta__']))
+        age = (time.time() - path.stat().st_mtime) / 60
+        print(f"  {path.name:<48} {path.stat().st_size / 1024:9.1f} KB  {age:7.1f} min ago  "
+              f"{meta.get('progress', '')}")
+        if args.clear:
+            path.unlink()
+    print(f"{len(files)} checkpoint(s) in {args.dir}" + (' removed' if args.clear and files else ''))
+
+
+if __name__ == '__main__':
+    main()
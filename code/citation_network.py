@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Citation graph for Figure 5 and for larger ICJ/regional citation data
+
+The graph is read from two CSVs (see data/DATA_CODEBOOK.md):
+  citation_nodes.csv  Node_ID, Label, Forum_Level
+  citation_edges.csv  Source, Target   (influence flows Source -> Target,
+                                        i.e. Target cites Source)
+and held as a compressed sparse row (CSR) adjacency matrix, so memory and
+every operation below scale with the number of edges, not nodes squared:
+  - degree and PageRank centrality by sparse matrix-vector products
+  - k-hop neighbourhoods (ego networks) by sparse frontier expansion
+  - layouts: spring layout for small subgraphs, sparse spectral layout for
+    large ones, cached on disk by graph content
+"""
+
+import argparse
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse import linalg as sparse_linalg
+
+DATA_DIR = Path('../data')
+NODES_CSV = DATA_DIR / 'citation_nodes.csv'
+EDGES_CSV = DATA_DIR / 'citation_edges.csv'
+LAYOUT_CACHE_DIR = DATA_DIR / '.cache' / 'layouts'
+
+# Above this size the O(n^2)-per-iteration spring layout is not used
+SPRING_MAX_NODES = 500
+
+
+class CitationGraph:
+    """Directed citation graph: node table + CSR adjacency (row = source)"""
+
+    def __init__(self, nodes, sources, targets):
+        self.nodes = nodes.reset_index(drop=True)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        n = len(self.nodes)
+        self.adjacency = sparse.csr_matrix(
+            (np.ones(len(self.sources), dtype=np.float64), (self.sources, self.targets)),
+            shape=(n, n))
+        self.adjacency.sum_duplicates()
+        self._index = pd.Index(self.nodes['Node_ID'])
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def n_edges(self):
+        return len(self.sources)
+
+    def index_of(self, node_id):
+        return self._index.get_loc(node_id)
+
+    def digest(self):
+        """Content hash of node ids and edges (for layout caching)"""
+        h = hashlib.sha256()
+        h.update('\0'.join(map(str, self.nodes['Node_ID'])).encode('utf-8'))
+        h.update(self.sources.tobytes())
+        h.update(self.targets.tobytes())
+        return h.hexdigest()[:16]
+
+    def subgraph(self, indices):
+        """Induced subgraph on node positions, keeping node and edge order"""
+        indices = np.sort(np.asarray(indices, dtype=np.int64))
+        remap = np.full(len(self), -1, dtype=np.int64)
+        remap[indices] = np.arange(len(indices))
+        keep = (remap[self.sources] >= 0) & (remap[self.targets] >= 0)
+        return CitationGraph(self.nodes.iloc[indices], remap[self.sources[keep]],
+                             remap[self.targets[keep]])
+
+    def to_networkx(self):
+        """networkx.DiGraph keyed by Label, with node attributes, in file order"""
+        import networkx as nx
+        G = nx.DiGraph()
+        labels = self.nodes['Label'].tolist()
+        for label, attrs in zip(labels, self.nodes.drop(columns='Label').to_dict('records')):
+            G.add_node(label, **attrs)
+        G.add_edges_from((labels[s], labels[t]) for s, t in zip(self.sources, self.targets))
+        return G
+
+
+def load_graph(nodes_csv=NODES_CSV, edges_csv=EDGES_CSV):
+    """Read node and edge CSVs into a CitationGraph"""
+    nodes = pd.read_csv(nodes_csv, dtype=str, keep_default_na=False)
+    nodes['Label'] = nodes['Label'].str.replace('\\n', '\n', regex=False)
+    edges = pd.read_csv(edges_csv, dtype=str, keep_default_na=False)
+    index = pd.Index(nodes['Node_ID'])
+    sources = index.get_indexer(edges['Source'])
+    targets = index.get_indexer(edges['Target'])
+    unknown = set(edges['Source'][sources < 0]) | set(edges['Target'][targets < 0])
+    if unknown:
+        raise ValueError(f"{edges_csv}: edges reference unknown nodes {sorted(unknown)[:10]}")
+    return CitationGraph(nodes, sources, targets)
+
+
+def degree_centrality(graph):
+    """
+    Citation counts per node as a DataFrame (sparse row/column sums):
+    cited_by is how often the case is cited (its in-degree as citing ->
+    cited), cites how many cases it cites
+    """
+    A = graph.adjacency  # Source -> Target: row sums count citations received
+    return pd.DataFrame({
+        'cited_by': np.asarray(A.sum(axis=1)).ravel().astype(int),
+        'cites': np.asarray(A.sum(axis=0)).ravel().astype(int),
+    }, index=graph.nodes['Node_ID'])
+
+
+def pagerank(graph, alpha=0.85, tol=1e-10, max_iter=200):
+    """
+    Citation PageRank, by power iteration on the sparse transition matrix
+    of the citing -> cited graph: a case ranks high when it is cited by
+    cases that rank high. Dangling nodes (cases citing nothing) spread
+    their mass uniformly.
+    """
+    n = len(graph)
+    C = graph.adjacency.T.tocsr()  # citing -> cited
+    out = np.asarray(C.sum(axis=1)).ravel()
+    inv_out = np.divide(1.0, out, out=np.zeros(n), where=out > 0)
+    P_T = (sparse.diags(inv_out) @ C).T.tocsr()
+    dangling = out == 0
+    r = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        r_next = alpha * (P_T @ r + r[dangling].sum() / n) + (1.0 - alpha) / n
+        done = np.abs(r_next - r).sum() < tol
+        r = r_next
+        if done:
+            break
+    return pd.Series(r / r.sum(), index=graph.nodes['Node_ID'], name='pagerank')
+
+
+def k_hop(graph, center, k=1, direction='both'):
+    """
+    Positions of all nodes within k hops of center ('out' follows influence,
+    'in' follows citations back, 'both' ignores direction). Each hop is one
+    sparse matrix-vector product over the current frontier.
+    """
+    A = graph.adjacency
+    step = {'out': A.T, 'in': A, 'both': A + A.T}[direction].tocsr()
+    seen = np.zeros(len(graph), dtype=bool)
+    frontier = np.zeros(len(graph), dtype=bool)
+    frontier[graph.index_of(center)] = True
+    seen |= frontier
+    for _ in range(k):
+        frontier = (step @ frontier.astype(np.float64) > 0) & ~seen
+        if not frontier.any():
+            break
+        seen |= frontier
+    return np.flatnonzero(seen)
+
+
+def ego_network(graph, center, k=1, direction='both'):
+    """Induced k-hop subgraph around center"""
+    return graph.subgraph(k_hop(graph, center, k, direction))
+
+
+def spectral_layout(graph, dim=2):
+    """
+    Positions from the smallest non-trivial eigenvectors of the normalized
+    Laplacian of the undirected graph. Costs a few sparse mat-vecs per
+    Lanczos iteration, so it works on graphs far beyond spring layouts.
+    """
+    n = len(graph)
+    A = graph.adjacency
+    W = ((A + A.T) > 0).astype(np.float64)
+    deg = np.asarray(W.sum(axis=1)).ravel()
+    d = np.divide(1.0, np.sqrt(deg), out=np.zeros(n), where=deg > 0)
+    L = sparse.identity(n) - sparse.diags(d) @ W @ sparse.diags(d)
+    k = min(dim + 1, n - 1)
+    # Shift so the wanted (smallest) eigenvalues become the largest
+    _, vecs = sparse_linalg.eigsh(2.0 * sparse.identity(n) - L, k=k, which='LA',
+                                  v0=np.full(n, 1.0 / np.sqrt(n)))
+    pos = vecs[:, ::-1][:, 1:dim + 1]
+    pos -= pos.mean(axis=0)
+    scale = np.abs(pos).max() or 1.0
+    return pos / scale
+
+
+def layout(graph, seed=42, k=2, iterations=50, cache_dir=LAYOUT_CACHE_DIR):
+    """
+    {Label: position} for drawing. Small graphs use networkx's spring layout
+    (as Figure 5 always has); large ones use the spectral layout, cached in
+    cache_dir under the graph's content hash.
+    """
+    labels = graph.nodes['Label'].tolist()
+    if len(graph) <= SPRING_MAX_NODES:
+        import networkx as nx
+        return nx.spring_layout(graph.to_networkx(), k=k, iterations=iterations, seed=seed)
+
+    cache = Path(cache_dir) / f'{graph.digest()}.npy' if cache_dir else None
+    if cache is not None and cache.exists():
+        pos = np.load(cache)
+    else:
+        pos = spectral_layout(graph)
+        if cache is not None:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            np.save(cache, pos)
+    return dict(zip(labels, pos))
+
+
+def ego_roles(ego, center):
+    """
+    Role of each node in an ego network, as drawn in Figure 5:
+    'central', 'precedent' (cited by the center), 'regional' (regional forum
+    citing the center) or 'consequent' (any other later citation).
+    """
+    c = ego.index_of(center)
+    roles = np.full(len(ego), 'consequent', dtype=object)
+    roles[ego.sources[ego.targets == c]] = 'precedent'
+    regional = (ego.nodes['Forum_Level'] == 'regional').to_numpy()
+    roles[regional & (roles != 'precedent')] = 'regional'
+    roles[c] = 'central'
+    return pd.Series(roles, index=ego.nodes['Label'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Citation graph summary')
+    parser.add_argument('--center', default='BOTNIA_ICJ')
+    parser.add_argument('-k', type=int, default=1, help='hops for the ego network (default: 1)')
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    graph = load_graph()
+    ego = ego_network(graph, args.center, args.k)
+    table = degree_centrality(graph).join(pagerank(graph))
+    print(f"Citation graph: {len(graph)} nodes, {graph.n_edges} edges")
+    print(f"{args.k}-hop ego network of {args.center}: {len(ego)} nodes, {ego.n_edges} edges")
+    print(f"\nTop {args.top} by PageRank:")
+    print(table.sort_values('pagerank', ascending=False).head(args.top).round(4).to_string())
+
+
+if __name__ == '__main__':
+    main()
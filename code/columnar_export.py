@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Arrow/Feather export of the case table and its summary tables, for R
+
+The R replication scripts (replication/R_scripts/) used to parse the case
+CSV again and recompute the tables the figures already compute. Instead,
+this script writes one validated export that both stacks read:
+  cases.feather       the typed case table: categoricals as Arrow
+                      dictionaries (R factors), Year/Crisis_Catalyzed as
+                      small integers, free text as strings
+  <table>.feather     the SUMMARY_TABLES, counted from the shared count
+                      tensor (aggregates.py): N per cell, plus Percentage
+                      for one-way tables
+  manifest.json       EXPORT_VERSION, the source files (size + sha256),
+                      the validation outcome, library versions, and for
+                      every file its rows, column types and sha256
+Files are Feather V2 (Arrow IPC) without compression, so readers can
+memory-map them: arrow::read_feather(path, mmap = TRUE) in R,
+pyarrow.feather.read_table(path, memory_map=True) in Python. The directory
+is replaced atomically, and it is left alone while the manifest still
+matches the sources and records that they passed validation (--force
+rewrites it).
+
+pyarrow is optional: only this export needs it (requirements-optional.txt).
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+import validation
+from cube import _file_digest
+
+EXPORT_VERSION = 1
+# Scripts run from code/; the R scripts run from the repository root
+EXPORT_DIR = Path('../replication') / 'arrow'
+
+# Summary tables shared with R: name -> the dims counted (Decade is Year // 10 * 10)
+SUMMARY_TABLES = {
+    'crisis_balance': ('Crisis_Catalyzed',),
+    'region': ('Geographic_Region',),
+    'region_crisis': ('Geographic_Region', 'Crisis_Catalyzed'),
+    'decade': ('Decade',),
+    'decade_crisis': ('Decade', 'Crisis_Catalyzed'),
+    'conflict_type': ('Conflict_Type',),
+    'year_crisis': ('Year', 'Crisis_Catalyzed'),
+}
+INTEGER_DIMS = ('Year', 'Decade', 'Crisis_Catalyzed')
+
+
+def summary_table(counts, dims):
+    """
+    Non-empty cells of counts over dims as a frame with an N column.
+    One-way tables also get Percentage and, for labelled dims, are sorted
+    by N (descending, ties in label order) like the R scripts' arrange(desc(N)).
+    """
+    if 'Decade' in dims:
+        tensor = counts.rollup(*('Year' if d == 'Decade' else d for d in dims),
+                               Year=lambda y: y // 10 * 10)
+    else:
+        tensor = counts.marginal(*dims)
+    series = tensor.to_series()
+    frame = series[series > 0].rename('N').reset_index()
+    frame.columns = list(dims) + ['N']
+    for dim in dims:
+        if dim in INTEGER_DIMS:
+            frame[dim] = frame[dim].astype(np.int32)
+    frame['N'] = frame['N'].astype(np.int64)
+    if len(dims) == 1:
+        frame['Percentage'] = frame['N'] / counts.count() * 100
+        if dims[0] not in INTEGER_DIMS:
+            frame = frame.sort_values('N', ascending=False, kind='stable', ignore_index=True)
+    return frame
+
+
+def summary_tables(counts):
+    return {name: summary_table(counts, dims) for name, dims in SUMMARY_TABLES.items()}
+
+
+def source_stamps(paths):
+    """Size and sha256 of every source CSV, as recorded in the manifest"""
+    stamps = []
+    for path in map(Path, paths):
+        size = path.stat().st_size
+        stamps.append({'file': path.name, 'size': size, 'sha256': _file_digest(path, size)})
+    return stamps
+
+
+def load_manifest(out_dir=EXPORT_DIR):
+    try:
+        return json.loads((Path(out_dir) / 'manifest.json').read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def is_current(out_dir, sources, skip_validation=False):
+    """
+    True if the export in out_dir was written by this version from these
+    sources, and they passed validation (not required with skip_validation)
+    """
+    manifest = load_manifest(out_dir)
+    return (manifest is not None and manifest.get('version') == EXPORT_VERSION
+            and manifest.get('sources') == sources
+            and (skip_validation or (manifest.get('validation') or {}).get('ok', False))
+            and all((Path(out_dir) / t['file']).exists() for t in manifest['tables'].values()))
+
+
+def export(df, out_dir=EXPORT_DIR, sources=(), report=None):
+    """
+    Write df and its summary tables as Feather files plus manifest.json
+    into out_dir (replaced atomically). sources are source_stamps() of
+    the CSVs df was loaded from, report its ValidationReport.
+    Returns the manifest.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+    from aggregates import case_counts
+
+    out_dir = Path(out_dir)
+    tmp = out_dir.with_name(out_dir.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    entries = {}
+    for name, frame in {'cases': df, **summary_tables(case_counts(df))}.items():
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        path = tmp / f'{name}.feather'
+        feather.write_feather(table, path, compression='uncompressed')
+        size = path.stat().st_size
+        entries[name] = {
+            'file': path.name,
+            'rows': table.num_rows,
+            'columns': {field.name: str(field.type) for field in table.schema},
+            'bytes': size,
+            'sha256': _file_digest(path, size),
+        }
+        if name != 'cases':
+            entries[name]['dims'] = list(SUMMARY_TABLES[name])
+
+    manifest = {
+        'version': EXPORT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'sources': list(sources),
+        'rows': len(df),
+        'validation': None if report is None else {
+            'ok': report.ok, 'errors': len(report.errors), 'warnings': len(report.warnings)},
+        'schema': {col: case_data.SCHEMA.get(col) for col in df.columns},
+        'software': {'python': platform.python_version(), 'pandas': pd.__version__,
+                     'pyarrow': pa.__version__},
+        'tables': entries,
+    }
+    (tmp / 'manifest.json').write_text(json.dumps(manifest, indent=2) + '\n')
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    return manifest
+
+
+def read_table(name, out_dir=EXPORT_DIR):
+    """One exported table as a memory-mapped pyarrow Table"""
+    from pyarrow import feather
+    return feather.read_table(Path(out_dir) / f'{name}.feather', memory_map=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the case table and summary tables for R')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--out', type=Path, default=EXPORT_DIR,
+                        help=f'export directory (default: {EXPORT_DIR})')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='rewrite the export even if it matches the sources')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='export even if the dataset fails the codebook checks')
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        sys.exit("✗ The Arrow export needs pyarrow: pip install -r requirements-optional.txt")
+
+    paths = case_data.expand_paths(args.data or [case_data.DEFAULT_CSV])
+    sources = source_stamps(paths)
+    if not args.force and is_current(args.out, sources, args.skip_validation):
+        print(f"✓ Export in {args.out} is up to date (--force rewrites it)")
+        return
+
+    frames = [case_data.load_cases(p) for p in paths]
+    df = frames[0] if len(frames) == 1 else case_data.apply_schema(pd.concat(frames, ignore_index=True))
+    report = validation.validate(df, 'dataset')
+    if not report.ok and not args.skip_validation:
+        sys.exit(report.summary() + "\n✗ Not exported (--skip-validation overrides)")
+
+    manifest = export(df, args.out, sources, report)
+    print(f"✓ Exported {manifest['rows']} cases to {args.out}:")
+    for name, entry in manifest['tables'].items():
+        print(f"  • {entry['file']:<26} {entry['rows']:>9} rows  {entry['bytes'] / 1024:9.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Persisted, incrementally updated aggregate cube for the case data
+
+The cube holds the case counts over
+(Year x Crisis_Catalyzed x Geographic_Region x Conflict_Type x Legal_Family)
+(the dims of aggregates.DEFAULT_DIMS) on disk, together with a ledger of the
+CSV files folded into it. refresh() compares the ledger with the files:
+  - unchanged files are skipped
+  - files that only grew (new verified cases appended at the end) have
+    just their new rows parsed, and only the cells those rows fall into
+    are updated
+  - new files are read and added
+  - anything else (edited or removed rows, a removed file) rebuilds the
+    cube from scratch
+Rollups and moving averages are read from cube.counts(), a CountTensor.
+With a validation.BatchValidator, every batch read (the whole file on a
+rebuild, the new rows on an append) is checked before it is counted, and
+the cube is saved only if the checks pass. The cube records whether its
+contents were validated, and if so the validator's hashes of their
+Case_IDs and duplicate keys, so appended rows are also checked against
+the rows already counted; a validated refresh of an unvalidated cube
+rebuilds it.
+
+The cube lives in data/.cache/cube/<sources>/ (one per set of input paths)
+as counts.npy plus meta.json (and hashes.npz if validated), all replaced
+atomically. While a file is
+being read, progress is saved every checkpoint_every seconds with a
+ledger entry that stops at the last row read, so after an interruption
+the next refresh() sees the rest of that file as appended rows and
+continues from there.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+from aggregates import DEFAULT_DIMS, CountAccumulator
+
+CUBE_VERSION = 1
+CUBE_DIR = Path('../data') / '.cache' / 'cube'
+
+
+def _prefix_hash(path, size):
+    """sha256 state after the first `size` bytes of path (can be continued)"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            h.update(chunk)
+            remaining -= len(chunk)
+    return h
+
+
+def _file_digest(path, size):
+    """sha256 of the first `size` bytes of path"""
+    return _prefix_hash(path, size).hexdigest()
+
+
+def _ledger_entry(path, rows, size=None, sha256=None):
+    """
+    Ledger entry for the first `size` bytes of path (default: all of it);
+    sha256 is their digest if already known.
+    """
+    st = path.stat()
+    size = st.st_size if size is None else size
+    with open(path, 'rb') as f:
+        f.seek(max(size - 1, 0))
+        complete = f.read(1) == b'\n'
+    return {'size': size, 'mtime_ns': st.st_mtime_ns if size == st.st_size else None, 'rows': rows,
+            'sha256': sha256 or _file_digest(path, size), 'ends_with_newline': complete}
+
+
+def _label_list(index):
+    return [v.item() if isinstance(v, np.generic) else v for v in index]
+
+
+class AggregateCube:
+    """Case counts over DEFAULT_DIMS for a fixed set of case CSVs, kept on disk"""
+
+    def __init__(self, paths, directory=CUBE_DIR, dims=DEFAULT_DIMS, checkpoint_every=60.0):
+        # Keyed by the paths as given, so files added to a directory are appended
+        given = sorted(str(Path(p).resolve()) for p in paths)
+        key = hashlib.sha256('\0'.join(given).encode('utf-8')).hexdigest()
+        self.paths = [p.resolve() for p in case_data.expand_paths(paths)]
+        self.directory = Path(directory) / key[:16]
+        self.dims = tuple(dims)
+        self.acc = CountAccumulator(self.dims)
+        self.ledger = {}
+        self.validated = False
+        self.hashes = {}
+        self.checkpoint_every = checkpoint_every
+        self._saved_at = time.monotonic()
+
+    # Persistence
+
+    def load(self):
+        """Restore the saved cube; returns False if there is none (or it is stale)"""
+        try:
+            meta = json.loads((self.directory / 'meta.json').read_text())
+            counts = np.load(self.directory / 'counts.npy', allow_pickle=False)
+        except (FileNotFoundError, ValueError):
+            return False
+        if meta.get('version') != CUBE_VERSION or tuple(meta['dims']) != self.dims:
+            return False
+        acc = CountAccumulator(self.dims)
+        acc.labels = {d: pd.Index(meta['labels'][d]) for d in self.dims}
+        acc.integer = meta['integer']
+        acc.counts = counts
+        acc.rows = meta['rows']
+        self.acc, self.ledger = acc, meta['ledger']
+        self.validated = meta.get('validated', False)
+        self.hashes = {}
+        if self.validated:
+            try:
+                with np.load(self.directory / 'hashes.npz', allow_pickle=False) as z:
+                    self.hashes = {k: z[k] for k in z.files}
+            except (FileNotFoundError, ValueError, OSError):
+                self.validated = False
+        return True
+
+    def save(self, validator=None):
+        """Write the cube; validator is the one checking the rows read, if any"""
+        if validator is not None:
+            self.hashes = validator.hashes()
+        tmp = self.directory.with_name(self.directory.name + '.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        np.save(tmp / 'counts.npy', self.acc.counts, allow_pickle=False)
+        if self.validated:
+            with open(tmp / 'hashes.npz', 'wb') as f:
+                np.savez(f, **self.hashes)
+        (tmp / 'meta.json').write_text(json.dumps({
+            'version': CUBE_VERSION,
+            'dims': list(self.dims),
+            'labels': {d: _label_list(self.acc.labels[d]) for d in self.dims},
+            'integer': self.acc.integer,
+            'rows': self.acc.rows,
+            'ledger': self.ledger,
+            'validated': self.validated,
+        }))
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(tmp, self.directory)
+        self._saved_at = time.monotonic()
+
+    # Updates
+
+    def append(self, batch):
+        """Fold new cases into the cube; returns the number of cells updated"""
+        return self.acc.add(batch)
+
+    def _ingest(self, path, batch_rows, start=None, rows=0, digest=None, validator=None):
+        """
+        Add all rows of path, or only those after byte offset `start`
+        (`rows` rows precede it; digest is the sha256 state of the bytes
+        before it, if the caller already hashed them, so they are not read
+        again). Batches are cut at line ends, so the byte offset reached is
+        always known and progress can be checkpointed.
+        A batch that fails the validator raises ValidationError before it
+        is counted. Returns (rows read, cells touched, ledger entry for the file).
+        """
+        touched = 0
+        validate = case_data.check_batch if validator is None else validator
+        if start is not None and digest is None:
+            digest = _prefix_hash(path, start)
+        with open(path, 'rb') as f:
+            header = f.readline()
+            names = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+            if start is None:
+                start = len(header)
+                digest = hashlib.sha256(header)
+            f.seek(start)
+            offset, added = start, 0
+            while True:
+                lines = list(islice(f, batch_rows))
+                if not lines:
+                    break
+                block = b''.join(lines)
+                for batch in case_data.read_batches(io.BytesIO(block), batch_rows, validate,
+                                                    label=f"{path.name} @{offset}",
+                                                    header=None, names=names):
+                    if validator is not None:
+                        validator.report.check()
+                    touched += self.append(batch)
+                    added += len(batch)
+                digest.update(block)
+                offset += len(block)
+                if time.monotonic() - self._saved_at >= self.checkpoint_every:
+                    self.ledger[str(path)] = _ledger_entry(path, rows + added, offset,
+                                                           digest.copy().hexdigest())
+                    self.save(validator)
+        entry = _ledger_entry(path, rows + added, offset, digest.hexdigest())
+        return added, touched, entry
+
+    def rebuild(self, batch_rows=100_000, validator=None):
+        self.acc = CountAccumulator(self.dims)
+        self.ledger = {}
+        self.validated = validator is not None
+        self.hashes = {}
+        for path in self.paths:
+            _, _, self.ledger[str(path)] = self._ingest(path, batch_rows, validator=validator)
+
+    def refresh(self, batch_rows=100_000, validator=None):
+        """
+        Bring the cube up to date with its CSVs, reading as little as
+        possible, and checking what is read with validator (a
+        validation.BatchValidator) if given; raises ValidationError, with
+        the cube left unsaved, if that fails. Returns a summary:
+        {'mode', 'rows_added', 'cells_updated'}.
+        """
+        loaded = self.load()
+        stale = not loaded or set(self.ledger) - set(map(str, self.paths)) or \
+            (validator is not None and not self.validated)
+        plan = []
+        for path in self.paths if not stale else []:
+            entry = self.ledger.get(str(path))
+            st = path.stat()
+            if entry is None:
+                plan.append((path, ()))
+                continue
+            if (st.st_size, st.st_mtime_ns) == (entry['size'], entry['mtime_ns']):
+                continue
+            if st.st_size > entry['size'] and entry['ends_with_newline']:
+                # The verified hash state is handed on, so the prefix is read once
+                digest = _prefix_hash(path, entry['size'])
+                if digest.hexdigest() == entry['sha256']:
+                    plan.append((path, (entry['size'], entry['rows'], digest)))
+                    continue
+            stale = True
+            break
+
+        if stale:
+            self.rebuild(batch_rows, validator)
+            if validator is not None:
+                validator.finish().check()
+            self.save(validator)
+            return {'mode': 'rebuilt', 'rows_added': self.acc.rows,
+                    'cells_updated': int(np.count_nonzero(self.acc.counts))}
+
+        rows_added = cells = 0
+        self.validated = self.validated and validator is not None
+        if validator is not None and plan:
+            # Appended rows must not repeat the Case_IDs already counted
+            validator.add_seen(self.hashes, self.acc.rows)
+        for path, resume in plan:
+            rows, touched, self.ledger[str(path)] = self._ingest(
+                path, batch_rows, *resume, validator=validator)
+            rows_added += rows
+            cells += touched
+        if validator is not None:
+            validator.finish().check()
+        if plan:
+            self.save(validator)
+        return {'mode': 'updated' if plan else 'unchanged', 'rows_added': rows_added,
+                'cells_updated': cells}
+
+    # Queries
+
+    def counts(self):
+        """The cube as a CountTensor (contiguous integer axes, as from_frame)"""
+        return self.acc.result()
+
+
+def load_cube(paths, batch_rows=100_000, directory=CUBE_DIR, validator=None):
+    """Refreshed cube for paths and its refresh summary (see refresh())"""
+    cube = AggregateCube(paths, directory)
+    return cube, cube.refresh(batch_rows, validator)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh and query the aggregate cube')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--by', nargs='+', default=['Year', 'Crisis_Catalyzed'],
+                        help='dims to roll up onto (default: Year Crisis_Catalyzed)')
+    parser.add_argument('--window', type=int, default=3,
+                        help='moving-average window over Year (default: 3)')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='count the data even if it fails the codebook checks')
+    args = parser.parse_args()
+
+    import validation
+    paths = args.data or [case_data.DEFAULT_CSV]
+    validator = None if args.skip_validation else \
+        validation.BatchValidator(', '.join(str(p) for p in paths))
+    try:
+        cube, summary = load_cube(paths, validator=validator)
+    except validation.ValidationError as exc:
+        sys.exit(exc.report.summary() + "\n✗ Cube not updated (--skip-validation overrides)")
+    counts = cube.counts()
+    print(f"Cube: {counts.count()} cases, {summary['mode']} "
+          f"(+{summary['rows_added']} rows, {summary['cells_updated']} cells)")
+    table = counts.rollup(*args.by).to_series()
+    print(f"\nCounts by {' x '.join(args.by)}:")
+    print((table.unstack(args.by[1:]) if len(args.by) > 1 else table).to_string())
+    print(f"\n{args.window}-year moving average of CRISIS cases:")
+    print(counts.moving_average('Year', args.window, Crisis_Catalyzed=1).round(2).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Small multiples: one chart per value of a grouping column
+
+A recipe draws one chart from a CountTensor. The engine renders it for
+every value of a column such as Country, International_Tribunal or
+Conflict_Type:
+  - the data is grouped once: a single count tensor with the facet column
+    as its first axis, so each facet is just a slice of it
+  - each worker builds the figure, axes and static decoration (labels,
+    grid, legend, limits) once, then per facet only updates or adds the
+    data artists, saves, and removes what it added
+  - facets are spread over a process pool in contiguous chunks, one
+    template per chunk
+
+Output goes to figures/facets/<recipe>_<column>/<value>.<format>; values
+whose file-name forms coincide get a numeric suffix (_2, _3, ...).
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+import figure_output
+from generate_paper_figures import (CONTROL_COLOR, CRISIS_COLOR, DATASETS, FIGURES_DIR, STYLE,
+                                    pyplot)
+
+FACET_COLUMNS = ('Country', 'Geographic_Region', 'Legal_Family', 'Conflict_Type',
+                 'International_Tribunal', 'Year')
+
+
+class Recipe(ABC):
+    """
+    One chart type. dims are the count dims it reads; setup() draws the
+    parts shared by all facets (given the grouped tensor, for limits common
+    to all of them) and returns the axes plus any state, draw() fills in
+    one facet and returns the artists to remove afterwards.
+    """
+    dims = ()
+    figsize = (6, 4)
+    title = ''
+    # True if the layout depends on the facet (e.g. tick labels of varying
+    # width): every facet is then saved with a tight bounding box. Otherwise
+    # the template is laid out once and facets are saved as they are.
+    variable_layout = False
+
+    def setup(self, plt, tensor):
+        fig, ax = plt.subplots(figsize=self.figsize)
+        return fig, ax, {}
+
+    @abstractmethod
+    def draw(self, ax, state, counts):
+        """Draw one facet's counts; returns the artists to remove afterwards"""
+
+
+class Timeline(Recipe):
+    """CRISIS/CONTROL cases per year (as Figure 1)"""
+    dims = ('Year', 'Crisis_Catalyzed')
+    figsize = (8, 4.5)
+    title = 'Cases per year'
+
+    def setup(self, plt, tensor):
+        # Every year of the data (a contiguous axis), so no facet loses cases
+        years = tensor.labels['Year']
+        fig, ax = plt.subplots(figsize=self.figsize)
+        crisis, = ax.plot([], [], 'o-', color=CRISIS_COLOR, linewidth=2, markersize=5,
+                          label='CRISIS Cases', alpha=0.8)
+        control, = ax.plot([], [], 's-', color=CONTROL_COLOR, linewidth=2, markersize=5,
+                           label='CONTROL Cases', alpha=0.8)
+        ax.set_xlabel('Year', fontweight='bold')
+        ax.set_ylabel('Number of Cases', fontweight='bold')
+        ax.legend(loc='upper left', framealpha=0.9)
+        ax.grid(True, alpha=0.3, linestyle=':')
+        ax.set_xlim(years[0] - 0.5, years[-1] + 0.5)
+        ax.yaxis.get_major_locator().set_params(integer=True)
+        return fig, ax, {'lines': {1: crisis, 0: control}, 'years': years}
+
+    def draw(self, ax, state, counts):
+        top, years = 1, state['years']
+        for group, line in state['lines'].items():
+            y = counts.series('Year', Crisis_Catalyzed=group).reindex(years, fill_value=0) \
+                if group in counts.labels['Crisis_Catalyzed'] else np.zeros(len(years))
+            line.set_data(list(years), np.asarray(y))
+            top = max(top, int(np.max(y)))
+        ax.set_ylim(0, top * 1.15)
+        return []
+
+
+class CrisisShare(Recipe):
+    """CRISIS vs CONTROL split (as one panel of Figure 2)"""
+    dims = ('Crisis_Catalyzed',)
+    figsize = (5, 5)
+    title = 'CRISIS vs CONTROL'
+
+    def draw(self, ax, state, counts):
+        sizes = [counts.count(Crisis_Catalyzed=g) if g in counts.labels['Crisis_Catalyzed'] else 0
+                 for g in (1, 0)]
+        wedges, texts, autotexts = ax.pie(
+            sizes, labels=[f'CRISIS\n(n={sizes[0]})', f'CONTROL\n(n={sizes[1]})'],
+            colors=[CRISIS_COLOR, CONTROL_COLOR], autopct='%1.1f%%', startangle=90,
+            textprops={'fontsize': 10, 'weight': 'bold'})
+        return [*wedges, *texts, *autotexts]
+
+
+class ConflictTypes(Recipe):
+    """Cases per conflict type (as Figure 3)"""
+    dims = ('Conflict_Type',)
+    figsize = (8, 6)
+    title = 'Conflict types'
+    variable_layout = True
+
+    def setup(self, plt, tensor):
+        fig, ax = plt.subplots(figsize=self.figsize)
+        ax.set_xlabel('Number of Cases', fontweight='bold')
+        ax.grid(True, alpha=0.3, linestyle=':', axis='x')
+        ax.xaxis.get_major_locator().set_params(integer=True)
+        return fig, ax, {}
+
+    def draw(self, ax, state, counts):
+        from aggregates import ranked
+        type_counts = ranked(counts.series('Conflict_Type'))
+        y_pos = np.arange(len(type_counts))
+        colors = [CRISIS_COLOR if 'Crisis' in t or 'Conflict' in t or 'Nationalism' in t
+                  else CONTROL_COLOR for t in type_counts.index]
+        bars = ax.barh(y_pos, type_counts.values, color=colors, alpha=0.7, edgecolor='black')
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(type_counts.index, fontsize=9)
+        ax.set_ylim(len(type_counts) - 0.5, -0.5)
+        ax.set_xlim(0, max(type_counts.max(), 1) * 1.15)
+        labels = [ax.text(v + 0.05, i, f'{v}', va='center', fontsize=8, fontweight='bold')
+                  for i, v in enumerate(type_counts.values)]
+        return [*bars, *labels]
+
+
+RECIPES = {
+    'timeline': Timeline(),
+    'crisis_share': CrisisShare(),
+    'conflict_types': ConflictTypes(),
+}
+
+
+def slug(value):
+    """File-name-safe form of a facet value"""
+    return re.sub(r'[^0-9A-Za-z]+', '_', str(value)).strip('_') or 'blank'
+
+
+def facet_names(values):
+    """
+    Distinct file names for facet values, in order: slug(value), plus _2,
+    _3, ... for values whose slug is already taken
+    """
+    names, taken = [], set()
+    for value in values:
+        base = name = slug(value)
+        n = 1
+        while name in taken:
+            n += 1
+            name = f'{base}_{n}'
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+def group_counts(df, by, recipe):
+    """One count tensor with `by` as its first axis (the only pass over df)"""
+    from aggregates import CountTensor
+    return CountTensor.from_frame(df, (by,) + tuple(recipe.dims))
+
+
+def _facet(tensor, i):
+    """Slice i of the facet axis as a tensor over the recipe dims"""
+    from aggregates import CountTensor
+    dims = tensor.dims[1:]
+    return CountTensor(dims, {d: tensor.labels[d] for d in dims}, tensor.counts[i])
+
+
+def render_chunk(recipe_name, by, tensor, positions, out_dir, formats=('png',), dpi=150):
+    """
+    Render the facets at the given positions of tensor's first axis with a
+    single figure template. Module-level so it can run in worker processes;
+    returns the output records of figure_output.save().
+    """
+    import matplotlib
+    recipe = RECIPES[recipe_name]
+    plt = pyplot()
+    names = facet_names(tensor.labels[by])
+    records = []
+    with matplotlib.rc_context(STYLE):
+        fig, ax, state = recipe.setup(plt, tensor)
+        bbox = 'tight' if recipe.variable_layout else None
+        for n, i in enumerate(positions):
+            value = tensor.labels[by][i]
+            facet = _facet(tensor, i)
+            transient = recipe.draw(ax, state, facet)
+            ax.set_title(f'{recipe.title}: {value} (N={facet.count()})', fontweight='bold')
+            if n == 0 and bbox is None:
+                fig.tight_layout()
+            records += figure_output.save(fig, out_dir, names[i], formats, dpi,
+                                          bbox_inches=bbox)
+            for artist in transient:
+                artist.remove()
+        plt.close(fig)
+    return records
+
+
+def render_facets(df, recipe_name, by, jobs=1, formats=('png',), dpi=150, out_dir=None,
+                  min_cases=1):
+    """
+    Render recipe for every value of column `by` with at least min_cases
+    cases. Returns the output records, in facet order.
+    """
+    recipe = RECIPES[recipe_name]
+    tensor = group_counts(df, by, recipe)
+    out_dir = Path(out_dir or FIGURES_DIR / 'facets' / f'{recipe_name}_{by}')
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sizes = tensor.counts.reshape(len(tensor.labels[by]), -1).sum(axis=1)
+    positions = [i for i in range(len(sizes)) if sizes[i] >= min_cases]
+
+    if jobs <= 1 or len(positions) <= 1:
+        return render_chunk(recipe_name, by, tensor, positions, out_dir, formats, dpi)
+    chunks = [c.tolist() for c in np.array_split(positions, min(jobs, len(positions)))]
+    results = {}
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = {pool.submit(render_chunk, recipe_name, by, tensor, chunk, out_dir,
+                               formats, dpi): n for n, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return [r for n in range(len(chunks)) for r in results[n]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render one chart per value of a column')
+    parser.add_argument('recipe', choices=RECIPES)
+    parser.add_argument('--by', default='Country', choices=FACET_COLUMNS,
+                        help='column to facet on (default: Country)')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--min-cases', type=int, default=1,
+                        help='skip facets with fewer cases (default: 1)')
+    parser.add_argument('--format', dest='formats', action='append',
+                        choices=figure_output.BACKENDS, help='output backend (repeatable; default: png)')
+    parser.add_argument('--dpi', type=int, default=150, help='output resolution (default: 150)')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes (0 = one per CPU; default: 1)')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='render even if the dataset fails the codebook checks')
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+
+    import validation
+    from generate_paper_figures import load_data, report_validation
+    df = load_data(args.data or DATASETS)
+    if not args.skip_validation:
+        try:
+            report_validation(validation.validate(df, 'dataset'))
+        except validation.ValidationError:
+            sys.exit("\n✗ DATASET FAILS THE CODEBOOK CHECKS; no facets rendered "
+                     "(--skip-validation overrides)")
+    start = time.perf_counter()
+    records = render_facets(df, args.recipe, args.by, jobs, args.formats or ['png'], args.dpi,
+                            min_cases=args.min_cases)
+    wall = time.perf_counter() - start
+    figures = len({r['figure'] for r in records})
+    print(f"\n✓ {figures} '{args.recipe}' facets by {args.by} in {wall:.2f} s "
+          f"({wall / max(figures, 1):.3f} s per facet)")
+    if records:
+        print(f"✓ Output directory: {Path(records[0]['path']).parent.absolute()}")
+
+
+if __name__ == '__main__':
+    main()
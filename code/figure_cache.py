@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Content-addressed rebuild cache for generate_paper_figures.py
+
+Each figure gets a key hashed from everything that can change its pixels:
+  - the case counts the figure reads (its marginal of the shared count
+    tensor, so row order and unrelated columns do not matter)
+  - the source code of the figure function and of the repo helpers it calls
+  - the bytes of any other data files it reads (e.g. the citation graph)
+  - the global style settings (rcParams block, colour palette, matplotlib version)
+
+Keys are stored in a JSON manifest next to the figures directory. A figure
+is skipped when its key matches the manifest and every requested output
+file (one per format) still exists with the recorded size.
+"""
+
+import hashlib
+import inspect
+import json
+from pathlib import Path
+
+MANIFEST_VERSION = 2
+
+
+def _sha256(*chunks):
+    h = hashlib.sha256()
+    for chunk in chunks:
+        h.update(chunk if isinstance(chunk, bytes) else str(chunk).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def style_digest(*settings):
+    """Hash the global style settings shared by every figure"""
+    import matplotlib
+    return _sha256(matplotlib.__version__,
+                   *(json.dumps(s, sort_keys=True, default=str) for s in settings))
+
+
+def data_digest(counts, columns):
+    """Hash the labels and counts of a CountTensor rolled up onto columns"""
+    if not columns:
+        return _sha256('no-data')
+    m = counts.marginal(*columns)
+    labels = [json.dumps([str(v) for v in m.labels[c]]) for c in columns]
+    return _sha256(','.join(columns), *labels, m.counts.astype('int64').tobytes())
+
+
+def _local_module(name, ref, here):
+    """Path of module `name` if it is one of the scripts in this code directory"""
+    path = Path(getattr(ref, '__file__', None) or here / f'{name}.py').resolve()
+    return path if path.parent == here and path.exists() else None
+
+
+def _code_closure(fn):
+    """
+    Source of fn plus every function (or class method) it references by
+    global name that is defined in this code directory, followed transitively,
+    and the whole source of any module of this directory it uses (including
+    modules imported inside the function).
+    """
+    here = Path(__file__).resolve().parent
+    seen, stack, sources = set(), [fn], []
+    while stack:
+        f = stack.pop()
+        if f in seen:
+            continue
+        seen.add(f)
+        sources.append(inspect.getsource(f))
+        for name in f.__code__.co_names:
+            ref = f.__globals__.get(name)
+            if ref is None or inspect.ismodule(ref):
+                module = _local_module(name, ref, here)
+                if module is not None and module not in seen:
+                    seen.add(module)
+                    sources.append(module.read_text())
+                continue
+            refs = [getattr(m, '__func__', m) for m in vars(ref).values()] \
+                if inspect.isclass(ref) else [ref]
+            for r in refs:
+                code = getattr(r, '__code__', None)
+                if inspect.isfunction(r) and code is not None and Path(code.co_filename).resolve().parent == here:
+                    stack.append(r)
+    return sources
+
+
+def file_digest(paths):
+    """Hash the contents of the given input files"""
+    return _sha256(*(Path(p).read_bytes() for p in paths))
+
+
+def figure_key(figure_fn, counts, columns, style, files=()):
+    """Cache key for one figure: counts and files it reads + its code + global style"""
+    return _sha256(data_digest(counts, columns), file_digest(files),
+                   *_code_closure(figure_fn), style)
+
+
+def load_manifest(path):
+    """Read the manifest, treating a missing or foreign file as empty"""
+    try:
+        manifest = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('figures', {})
+
+
+def save_manifest(path, entries):
+    path.write_text(json.dumps({'version': MANIFEST_VERSION, 'figures': entries},
+                               indent=2, sort_keys=True) + '\n')
+
+
+def is_fresh(entry, key, outputs):
+    """True if the manifest entry matches key and all outputs are still on disk"""
+    if not entry or entry.get('key') != key:
+        return False
+    recorded = entry.get('outputs', {})
+    return all(out.exists() and out.stat().st_size == recorded.get(out.name)
+               for out in outputs)
+
+
+def record(entries, name, key, outputs, seconds):
+    """Store the key of a freshly rendered figure in the manifest entries"""
+    entries[name] = {
+        'key': key,
+        'outputs': {out.name: out.stat().st_size for out in outputs},
+        'render_seconds': round(seconds, 3),
+    }
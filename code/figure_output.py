@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Output backends for generate_paper_figures.py
+
+  png    full-resolution raster (optionally size-bounded, see bound_png)
+  pdf    vector output; dense artists are rasterized (see rasterize_dense)
+  svg    as pdf
+  tiles  multi-resolution PNG pyramid for web viewers:
+           <name>_tiles/<level>/<col>_<row>.png  +  tiles.json
+         level 0 fits in a single tile, each further level doubles the
+         resolution up to the full-resolution image
+
+Every write is timed and sized, so callers can report encode time and bytes
+per figure and format.
+"""
+
+import io
+import json
+import shutil
+import time
+from pathlib import Path
+
+BACKENDS = ('png', 'pdf', 'svg', 'tiles')
+VECTOR_FORMATS = ('pdf', 'svg')
+
+# Artists with more markers/vertices than this are rasterized in vector output
+DENSE_POINTS = 1000
+TILE_SIZE = 256
+
+
+def output_path(figures_dir, name, backend):
+    """File that stands for one figure in one backend (tiles: the pyramid index)"""
+    if backend == 'tiles':
+        return Path(figures_dir) / f'{name}_tiles' / 'tiles.json'
+    return Path(figures_dir) / f'{name}.{backend}'
+
+
+def _n_points(artist):
+    from matplotlib.collections import Collection
+    from matplotlib.lines import Line2D
+    if isinstance(artist, Line2D):
+        return len(artist.get_xydata())
+    if isinstance(artist, Collection):
+        return max(len(artist.get_offsets()), len(artist.get_paths()))
+    return 0
+
+
+def rasterize_dense(fig, max_points=DENSE_POINTS):
+    """
+    Mark the dense artists of fig as rasterized, leaving text, axes and
+    sparse artists as vectors. Lines and collections with more than
+    max_points markers/vertices are rasterized individually; axes with
+    more than max_points separate patches (e.g. one arrow per network edge)
+    have all their patches rasterized together, through the axes'
+    rasterization z-order. Returns the number of artists rasterized.
+    """
+    count = 0
+    for ax in fig.axes:
+        for artist in ax.get_children():
+            if _n_points(artist) > max_points:
+                artist.set_rasterized(True)
+                count += 1
+        if len(ax.patches) > max_points:
+            top = max(p.get_zorder() for p in ax.patches)
+            ax.set_rasterization_zorder(top + 1e-3)
+            count += len(ax.patches)
+    return count
+
+
+def _bytes(path):
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+    return path.stat().st_size
+
+
+def bound_png(path, max_bytes):
+    """
+    Re-encode a PNG larger than max_bytes with an adaptive 256-colour
+    palette (charts rarely use more). Returns a note for the report.
+    """
+    if max_bytes is None or path.stat().st_size <= max_bytes:
+        return ''
+    from PIL import Image
+    with Image.open(path) as im:
+        im.load()
+        quantized = im.quantize(256, method=Image.Quantize.FASTOCTREE)
+    quantized.save(path, optimize=True)
+    size = path.stat().st_size
+    return 'quantized' if size <= max_bytes else 'quantized, over size bound'
+
+
+def write_tiles(image, directory, tile_size=TILE_SIZE):
+    """
+    Write a PIL image as a tile pyramid into directory (replaced
+    atomically) and return the index path.
+    """
+    directory = Path(directory)
+    tmp = directory.with_name(directory.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    levels = [image]
+    while max(levels[-1].size) > tile_size:
+        levels.append(levels[-1].reduce(2))
+    levels.reverse()
+
+    for z, level in enumerate(levels):
+        (tmp / str(z)).mkdir()
+        width, height = level.size
+        for col in range(-(-width // tile_size)):
+            for row in range(-(-height // tile_size)):
+                box = (col * tile_size, row * tile_size,
+                       min((col + 1) * tile_size, width), min((row + 1) * tile_size, height))
+                level.crop(box).save(tmp / str(z) / f'{col}_{row}.png', optimize=True)
+
+    (tmp / 'tiles.json').write_text(json.dumps({
+        'width': image.size[0],
+        'height': image.size[1],
+        'tile_size': tile_size,
+        'levels': [list(level.size) for level in levels],
+        'path': '{level}/{col}_{row}.png',
+    }, indent=2) + '\n')
+    shutil.rmtree(directory, ignore_errors=True)
+    tmp.replace(directory)
+    return directory / 'tiles.json'
+
+
+def save(fig, figures_dir, name, backends=('png',), dpi=300, max_png_bytes=None,
+         dense_points=DENSE_POINTS, bbox_inches='tight'):
+    """
+    Write fig in every requested backend. Returns one report record per
+    backend: {figure, format, path, seconds, bytes, rasterized, note}.
+    bbox_inches=None skips the extra layout pass of a tight bounding box,
+    for figures whose layout is already fixed.
+    """
+    records = []
+    png = None
+    for backend in backends:
+        path = output_path(figures_dir, name, backend)
+        start = time.perf_counter()
+        rasterized, note = 0, ''
+        if backend in VECTOR_FORMATS:
+            rasterized = rasterize_dense(fig, dense_points)
+            fig.savefig(path, dpi=dpi, bbox_inches=bbox_inches)
+        elif backend == 'png':
+            fig.savefig(path, dpi=dpi, bbox_inches=bbox_inches)
+            note = bound_png(path, max_png_bytes)
+            png = path
+        elif backend == 'tiles':
+            from PIL import Image
+            source = png
+            if source is None:
+                source = io.BytesIO()
+                fig.savefig(source, format='png', dpi=dpi, bbox_inches=bbox_inches)
+                source.seek(0)
+            with Image.open(source) as im:
+                write_tiles(im.convert('RGBA'), path.parent)
+        else:
+            raise ValueError(f"unknown output backend {backend!r}; expected one of {BACKENDS}")
+        records.append({
+            'figure': name,
+            'format': backend,
+            'path': str(path),
+            'seconds': round(time.perf_counter() - start, 4),
+            'bytes': _bytes(path.parent if backend == 'tiles' else path),
+            'rasterized': rasterized,
+            'note': note,
+        })
+    return records
+
+
+def print_report(records):
+    """Encode time and size per figure and format, with per-format totals"""
+    if not records:
+        return
+    print("\nOutput report:")
+    print(f"  {'figure':<42} {'format':<6} {'encode s':>9} {'size KB':>10}  note")
+    for r in records:
+        note = r['note'] or (f"{r['rasterized']} artists rasterized" if r['rasterized'] else '')
+        print(f"  {r['figure']:<42} {r['format']:<6} {r['seconds']:9.3f} {r['bytes'] / 1024:10.1f}  {note}")
+    for backend in dict.fromkeys(r['format'] for r in records):
+        sel = [r for r in records if r['format'] == backend]
+        print(f"  {'total':<42} {backend:<6} {sum(r['seconds'] for r in sel):9.3f} "
+              f"{sum(r['bytes'] for r in sel) / 1024:10.1f}")
+
+
+def write_report(records, path):
+    Path(path).write_text(json.dumps(records, indent=2) + '\n')
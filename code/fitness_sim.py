@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo estimate of the Figure 4 fitness matrix
+
+Figure 4 plots relative fitness by environmental condition and
+institutional strategy, where
+
+    fitness = (Institutional Persistence x Goal Achievement) / Adaptation Cost
+
+This module estimates every cell of that matrix from simulated
+trajectories. One trajectory follows an institution through PERIODS
+years:
+  environment  a crisis or stable state each year, drawn with a crisis
+               rate sampled per trajectory from the case data: the
+               condition is a band of the yearly CRISIS share, and the
+               rate follows a Beta posterior of the CRISIS/CONTROL counts
+               in the years that fall into the band (clipped to the band)
+  persistence  share of the years the institution survives; survival is
+               drawn each year with the strategy's rate for that state
+  goal         share of the surviving years in which it achieves its goal
+  cost         1 + SWITCH_COST per change of environment it lives through
+               (less for hedged strategies) + HEDGE_COST per year of
+               hedging
+Strategies are mixtures of the two pure strategies in PURE_STRATEGIES,
+with weight w on the sovereigntist one; the default grid is Figure 4's
+3 x 3, and grid() builds finer ones. The strategy parameters are modelling
+assumptions, not data.
+
+Trajectories are simulated in batches as (condition x strategy x batch x
+year) arrays, with no per-trajectory Python loop. All strategies of a
+condition share the same environment draws (common random numbers).
+Every batch has its own child SeedSequence and is folded in by batch
+index, so results are identical for any number of worker processes. Each
+cell keeps its running moments and a histogram of trajectory fitness:
+the mean comes with a normal confidence interval, and the histogram gives
+the full distribution and its quantiles.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PERIODS = 20
+
+# Figure 4's grid: conditions as bands of the yearly CRISIS share, strategies
+# as the weight on the sovereigntist pure strategy (rows/columns in figure order)
+CONDITIONS = {'Crisis': (2 / 3, 1.0), 'Stable': (0.0, 1 / 3), 'Mixed': (1 / 3, 2 / 3)}
+STRATEGIES = {'Globalist': 0.0, 'Sovereigntist': 1.0, 'Hybrid': 0.5}
+
+# Yearly survival and goal-achievement probabilities of the pure strategies,
+# as (stable, crisis)
+PURE_STRATEGIES = {
+    'Globalist': {'survival': (0.998, 0.96), 'success': (0.95, 0.45)},
+    'Sovereigntist': {'survival': (0.97, 0.998), 'success': (0.50, 0.90)},
+}
+# Adaptation cost per change of environment for a pure strategy; a mixture
+# with hedge h = 4w(1 - w) pays (1 - h) of it, plus HEDGE_COST * h per year
+SWITCH_COST = 0.12
+HEDGE_COST = 0.012
+
+# Histogram bins of trajectory fitness on [0, 1]
+BINS = 200
+# Random draws per batch (conditions x strategies x trajectories x years)
+BLOCK_CELLS = 1 << 22
+
+
+def grid(n_conditions=3, n_strategies=3):
+    """
+    A (conditions, strategies) grid: Figure 4's for 3 x 3, otherwise equal
+    bands of the CRISIS share and evenly spaced strategy weights
+    """
+    if (n_conditions, n_strategies) == (3, 3):
+        return dict(CONDITIONS), dict(STRATEGIES)
+    edges = np.linspace(0.0, 1.0, n_conditions + 1)
+    conditions = {f'crisis share {lo:.2f}-{hi:.2f}': (lo, hi) for lo, hi in zip(edges[:-1], edges[1:])}
+    strategies = {f'w={w:.2f}': w for w in np.linspace(0.0, 1.0, n_strategies)}
+    return conditions, strategies
+
+
+def condition_priors(counts, conditions=CONDITIONS):
+    """
+    Beta(a, b) prior of the crisis rate per condition: 1 + the CRISIS and
+    CONTROL cases of the years whose CRISIS share lies in the band
+    """
+    crisis = counts.series('Year', Crisis_Catalyzed=1) if 1 in counts.labels['Crisis_Catalyzed'] \
+        else pd.Series(0, index=counts.labels['Year'])
+    total = counts.series('Year')
+    seen = total > 0
+    share = (crisis[seen] / total[seen]).to_numpy()
+    crisis, control = crisis[seen].to_numpy(), (total - crisis)[seen].to_numpy()
+    priors = {}
+    for name, (lo, hi) in conditions.items():
+        years = (share >= lo) & ((share < hi) | (hi >= 1.0))
+        priors[name] = (1.0 + crisis[years].sum(), 1.0 + control[years].sum(), lo, hi)
+    return priors
+
+
+def strategy_params(strategies=STRATEGIES):
+    """(survival, success) as (strategies, 2) arrays, and switch/hedge cost per strategy"""
+    w = np.array(list(strategies.values()), dtype=float)[:, None]
+    g, s = PURE_STRATEGIES['Globalist'], PURE_STRATEGIES['Sovereigntist']
+    survival = (1 - w) * np.array(g['survival']) + w * np.array(s['survival'])
+    success = (1 - w) * np.array(g['success']) + w * np.array(s['success'])
+    hedge = 4 * w[:, 0] * (1 - w[:, 0])
+    return survival, success, SWITCH_COST * (1 - hedge), HEDGE_COST * hedge
+
+
+def _run_batch(batch, seed, size, priors, params, periods=PERIODS, bins=BINS):
+    """
+    Simulate `size` trajectories per cell; returns (batch, moments, histogram)
+    with moments (5, conditions, strategies): n, sum and sum of squares of
+    fitness, sums of persistence and goal achievement
+    """
+    rng = np.random.default_rng(seed)
+    a, b, lo, hi = (np.array(v)[:, None] for v in zip(*priors))
+    survival, success, switch_cost, hedge_cost = params
+    n_cond, n_strat = len(priors), len(survival)
+
+    rate = np.clip(rng.beta(a, b, size=(n_cond, size)), lo, hi)
+    crisis = rng.random((n_cond, 1, size, periods), dtype=np.float32) < rate[:, None, :, None]
+    state = crisis.astype(np.intp)
+    # (strategy, state) rates broadcast over (condition, strategy, trajectory, year)
+    strat = np.arange(n_strat)[None, :, None, None]
+    alive = np.logical_and.accumulate(
+        rng.random((n_cond, n_strat, size, periods), dtype=np.float32) < survival[strat, state],
+        axis=-1)
+    achieved = rng.random((n_cond, n_strat, size, periods), dtype=np.float32) < success[strat, state]
+
+    years_alive = alive.sum(axis=-1)
+    switches = ((crisis[..., 1:] != crisis[..., :-1]) & alive[..., 1:]).sum(axis=-1)
+    persistence = years_alive / periods
+    goal = (achieved & alive).sum(axis=-1) / np.maximum(years_alive, 1)
+    cost = 1.0 + switch_cost[:, None] * switches + hedge_cost[:, None] * years_alive
+    fitness = persistence * goal / cost
+
+    moments = np.stack([np.full((n_cond, n_strat), size, dtype=float),
+                        fitness.sum(axis=-1), (fitness ** 2).sum(axis=-1),
+                        persistence.sum(axis=-1), goal.sum(axis=-1)])
+    cells = np.arange(n_cond * n_strat).reshape(n_cond, n_strat, 1) * bins
+    index = cells + np.minimum((fitness * bins).astype(np.intp), bins - 1)
+    hist = np.bincount(index.ravel(), minlength=n_cond * n_strat * bins).reshape(n_cond, n_strat, bins)
+    return batch, moments, hist
+
+
+class FitnessResult:
+    """Per-cell estimates of a simulation run (arrays over conditions x strategies)"""
+
+    def __init__(self, conditions, strategies, moments, hist, level=0.95):
+        from scipy import stats
+        self.conditions = list(conditions)
+        self.strategies = list(strategies)
+        n, total, squares, persistence, goal = moments
+        self.n = n.astype(np.int64)
+        self.mean = total / n
+        self.sd = np.sqrt(np.maximum(squares - n * self.mean ** 2, 0.0) / np.maximum(n - 1, 1))
+        self.se = self.sd / np.sqrt(n)
+        z = stats.norm.ppf(0.5 + level / 2)
+        self.level = level
+        self.ci = np.stack([self.mean - z * self.se, self.mean + z * self.se], axis=-1)
+        self.persistence = persistence / n
+        self.goal = goal / n
+        self.hist = hist
+        self.edges = np.linspace(0.0, 1.0, hist.shape[-1] + 1)
+
+    def quantiles(self, q):
+        """Quantiles of trajectory fitness per cell, interpolated within histogram bins"""
+        q = np.atleast_1d(q)
+        cum = np.cumsum(self.hist, axis=-1) / self.hist.sum(axis=-1, keepdims=True)
+        out = np.empty(self.hist.shape[:-1] + (len(q),))
+        for idx in np.ndindex(*self.hist.shape[:-1]):
+            out[idx] = np.interp(q, np.concatenate([[0.0], cum[idx]]), self.edges)
+        return out
+
+    def to_frame(self):
+        """One row per cell: mean, CI of the mean, quantiles and components"""
+        qs = self.quantiles([0.05, 0.5, 0.95])
+        rows = []
+        for i, cond in enumerate(self.conditions):
+            for j, strat in enumerate(self.strategies):
+                rows.append({'condition': cond, 'strategy': strat, 'n': int(self.n[i, j]),
+                             'mean': self.mean[i, j], 'ci_low': self.ci[i, j, 0],
+                             'ci_high': self.ci[i, j, 1], 'sd': self.sd[i, j],
+                             'p05': qs[i, j, 0], 'median': qs[i, j, 1], 'p95': qs[i, j, 2],
+                             'persistence': self.persistence[i, j], 'goal': self.goal[i, j]})
+        return pd.DataFrame(rows)
+
+    def matrix(self):
+        return pd.DataFrame(self.mean, index=self.conditions, columns=self.strategies)
+
+
+def simulate(counts, n_trajectories=100_000, conditions=CONDITIONS, strategies=STRATEGIES,
+             periods=PERIODS, batch_size=None, seed=42, jobs=1, level=0.95):
+    """
+    Simulate n_trajectories per cell of the (conditions x strategies) grid,
+    with crisis rates estimated from counts (a CountTensor over Year and
+    Crisis_Catalyzed). Returns a FitnessResult.
+    """
+    priors = condition_priors(counts, conditions)
+    priors = [priors[name] for name in conditions]
+    params = strategy_params(strategies)
+    if batch_size is None:
+        batch_size = max(1, BLOCK_CELLS // (len(conditions) * len(strategies) * periods))
+    n_batches = -(-n_trajectories // batch_size)
+    sizes = [min(batch_size, n_trajectories - b * batch_size) for b in range(n_batches)]
+    tasks = [(b, s, sizes[b], priors, params, periods)
+             for b, s in enumerate(np.random.SeedSequence(seed).spawn(n_batches))]
+
+    moments = np.zeros((n_batches, 5, len(conditions), len(strategies)))
+    hist = np.zeros((len(conditions), len(strategies), BINS), dtype=np.int64)
+
+    def collect(batch, m, h):
+        moments[batch] = m
+        hist[...] += h
+
+    if jobs <= 1:
+        for task in tasks:
+            collect(*_run_batch(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for future in as_completed([pool.submit(_run_batch, *t) for t in tasks]):
+                collect(*future.result())
+    # Summed in batch order, so the result does not depend on completion order
+    return FitnessResult(conditions, strategies, moments.sum(axis=0), hist, level)
+
+
+def plot(result, path):
+    """Figure 4 layout for the simulated matrix, each cell with its confidence interval"""
+    from generate_paper_figures import STYLE, draw_fitness_matrix, pyplot
+    import matplotlib
+    plt = pyplot()
+    with matplotlib.rc_context(STYLE):
+        # Intervals on Figure 4's grid; finer grids only have room for the means
+        text = None
+        if result.mean.shape == (3, 3):
+            text = [[f'{result.mean[i, j]:.2f}\n[{result.ci[i, j, 0]:.3f}, {result.ci[i, j, 1]:.3f}]'
+                     for j in range(3)] for i in range(3)]
+        draw_fitness_matrix(plt, result.mean,
+                            [c.replace(' ', '\n', 1) for c in result.conditions],
+                            [s.replace(' ', '\n', 1) for s in result.strategies], text,
+                            subtitle=f'Monte Carlo estimate, {result.n.min():,} trajectories per cell'
+                                     + (f', {result.level:.0%} CI of the mean' if text else ''))
+        plt.savefig(path, dpi=300, bbox_inches='tight')
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monte Carlo estimate of the Figure 4 fitness matrix')
+    parser.add_argument('-n', '--trajectories', type=int, default=100_000,
+                        help='simulated trajectories per cell (default: 100000)')
+    parser.add_argument('--conditions', type=int, default=3, help='condition bands (default: 3)')
+    parser.add_argument('--strategies', type=int, default=3, help='strategy weights (default: 3)')
+    parser.add_argument('--periods', type=int, default=PERIODS, help=f'years per trajectory (default: {PERIODS})')
+    parser.add_argument('--batch-size', type=int, help='trajectories per cell and batch (default: by memory)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes (0 = one per CPU; default: 1)')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--csv', type=Path, metavar='PATH', help='write the per-cell table as CSV')
+    parser.add_argument('--json', type=Path, metavar='PATH',
+                        help='write estimates and fitness histograms as JSON')
+    parser.add_argument('--figure', type=Path, metavar='PNG', help='draw the simulated matrix')
+    args = parser.parse_args()
+
+    import case_data
+    import validation
+    from aggregates import case_counts
+    frames = [case_data.load_cases(p) for p in case_data.expand_paths(args.data or [case_data.DEFAULT_CSV])]
+    df = frames[0] if len(frames) == 1 else case_data.apply_schema(pd.concat(frames, ignore_index=True))
+    report = validation.validate(df, 'dataset')
+    if not report.ok:
+        sys.exit(report.summary())
+
+    conditions, strategies = grid(args.conditions, args.strategies)
+    result = simulate(case_counts(df), args.trajectories, conditions, strategies, args.periods,
+                      args.batch_size, args.seed, args.jobs or os.cpu_count() or 1)
+    print(f"Fitness = (persistence x goal achievement) / adaptation cost, "
+          f"{args.trajectories:,} trajectories of {args.periods} years per cell\n")
+    print(result.matrix().round(3).to_string())
+    print()
+    print(result.to_frame().round(4).to_string(index=False))
+    if args.csv:
+        result.to_frame().to_csv(args.csv, index=False)
+        print(f"\n✓ Table written to {args.csv}")
+    if args.json:
+        args.json.write_text(json.dumps({
+            'trajectories': args.trajectories, 'periods': args.periods, 'seed': args.seed,
+            'cells': result.to_frame().to_dict(orient='records'),
+            'histogram_edges': result.edges.tolist(),
+            'histograms': result.hist.tolist(),
+        }, indent=1) + '\n')
+        print(f"✓ Estimates written to {args.json}")
+    if args.figure:
+        plot(result, args.figure)
+        print(f"✓ Figure written to {args.figure}")
+
+
+if __name__ == '__main__':
+    main()
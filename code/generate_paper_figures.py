@@ -9,24 +9,35 @@ Author: Generated for SSRN publication
 Date: 2025-10-15
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import networkx as nx
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-# Publication-quality settings
-plt.rcParams['figure.dpi'] = 300
-plt.rcParams['savefig.dpi'] = 300
-plt.rcParams['font.family'] = 'serif'
-plt.rcParams['font.serif'] = ['Times New Roman']
-plt.rcParams['font.size'] = 10
-plt.rcParams['axes.labelsize'] = 11
-plt.rcParams['axes.titlesize'] = 12
-plt.rcParams['xtick.labelsize'] = 9
-plt.rcParams['ytick.labelsize'] = 9
-plt.rcParams['legend.fontsize'] = 9
+import numpy as np
+
+import figure_cache
+import figure_output
+import profiling
+
+# pandas, matplotlib, networkx and scipy are imported inside the functions
+# that use them, so that e.g. rendering one figure or listing the figures
+# does not pay for the others' dependencies.
+
+# Publication-quality settings, applied around each figure (see render_figure)
+STYLE = {
+    'figure.dpi': 300,
+    'savefig.dpi': 300,
+    'font.family': 'serif',
+    'font.serif': ['Times New Roman'],
+    'font.size': 10,
+    'axes.labelsize': 11,
+    'axes.titlesize': 12,
+    'xtick.labelsize': 9,
+    'ytick.labelsize': 9,
+    'legend.fontsize': 9,
+}
 
 # Color scheme
 CRISIS_COLOR = '#d62728'  # Red
@@ -37,32 +48,123 @@ SOVEREIGNTIST_COLOR = '#ff7f0e'  # Orange
 # Data paths
 DATA_DIR = Path('../data')
 FIGURES_DIR = Path('../figures')
-FIGURES_DIR.mkdir(exist_ok=True)
+CACHE_MANIFEST = FIGURES_DIR.parent / '.figure_cache.json'
+CITATION_NODES = DATA_DIR / 'citation_nodes.csv'
+CITATION_EDGES = DATA_DIR / 'citation_edges.csv'
+BOTNIA_NODE = 'BOTNIA_ICJ'
+
+DATASETS = [DATA_DIR / 'dataset_PSM_60casos_clean.csv']
+
+# Output settings used by save_figure(), set by render_figure(), and the
+# encode records of the figures rendered in this process
+_output = {'formats': ('png',), 'dpi': 300, 'max_png_bytes': None, 'report': []}
+
+def pyplot():
+    """matplotlib.pyplot on the headless Agg backend, imported on first use"""
+    import matplotlib
+    matplotlib.use('Agg')  # headless: figures are only ever written to disk
+    import matplotlib.pyplot as plt
+    return plt
+
+def save_figure(name):
+    """Save the current figure in every requested output backend"""
+    plt = pyplot()
+    records = figure_output.save(plt.gcf(), FIGURES_DIR, name, _output['formats'],
+                                 _output['dpi'], _output['max_png_bytes'])
+    for r in records:
+        print(f"✓ Saved: {Path(r['path']).relative_to(FIGURES_DIR)}")
+    _output['report'].extend(records)
 
-def load_data():
-    """Load the verified 60-case dataset"""
-    df = pd.read_csv(DATA_DIR / 'dataset_PSM_60casos_clean.csv')
+def load_data(paths=None):
+    """Load the verified 60-case dataset (typed, via the binary sidecar cache)"""
+    import pandas as pd
+    import case_data
+    frames = [case_data.load_cases(p) for p in case_data.expand_paths(paths or DATASETS)]
+    df = frames[0] if len(frames) == 1 else \
+        case_data.apply_schema(pd.concat(frames, ignore_index=True))
     print(f"Loaded {len(df)} cases:")
     print(f"  CRISIS: {df['Crisis_Catalyzed'].sum()}")
     print(f"  CONTROL: {(df['Crisis_Catalyzed'] == 0).sum()}")
     return df
 
+def load_counts(paths=None, batch_rows=100_000, validate=False):
+    """
+    Stream the dataset in bounded batches straight into the shared count
+    tensor, without ever holding the full table in memory. Figures that
+    only read counts (1-3) accept the tensor in place of the dataframe.
+    With validate, every batch goes through the full codebook validation
+    (see validation.py), which raises ValidationError at the end on errors.
+    """
+    import case_data
+    from aggregates import stream_counts
+    if validate:
+        import validation
+        validator = validation.BatchValidator(', '.join(str(p) for p in paths or DATASETS))
+        try:
+            counts = stream_counts(case_data.iter_batches(paths or DATASETS, batch_rows, validator))
+        except validation.ValidationError as exc:
+            report_validation(exc.report)
+        report_validation(validator.finish())
+    else:
+        counts = stream_counts(case_data.iter_batches(paths or DATASETS, batch_rows))
+    print(f"Streamed {counts.count()} cases:")
+    print(f"  CRISIS: {counts.count(Crisis_Catalyzed=1)}")
+    print(f"  CONTROL: {counts.count(Crisis_Catalyzed=0)}")
+    return counts
+
+def report_validation(report):
+    """Print the outcome of the codebook checks; raises ValidationError on errors"""
+    if report.issues:
+        print(report.summary())
+    report.check()
+    print(f"✓ Codebook checks passed ({report.rows} rows, {len(report.warnings)} warnings)")
+    return report
+
+def load_cube_counts(paths=None, batch_rows=100_000, validate=False):
+    """
+    Counts from the persisted aggregate cube, after folding in whatever was
+    appended to the dataset since the last run (see cube.py). With
+    validate, the rows read into the cube (all of them on a rebuild, the
+    new ones on an append) go through the codebook validation first.
+    """
+    import cube
+    import validation
+    validator = validation.BatchValidator(', '.join(str(p) for p in paths or DATASETS)) \
+        if validate else None
+    try:
+        store, summary = cube.load_cube(paths or DATASETS, batch_rows, validator=validator)
+    except validation.ValidationError as exc:
+        report_validation(exc.report)
+    if validator is not None and validator.report.rows:
+        report_validation(validator.report)
+    counts = store.counts()
+    print(f"Cube {summary['mode']}: +{summary['rows_added']} rows, "
+          f"{summary['cells_updated']} cells updated")
+    print(f"Counted {counts.count()} cases:")
+    print(f"  CRISIS: {counts.count(Crisis_Catalyzed=1)}")
+    print(f"  CONTROL: {counts.count(Crisis_Catalyzed=0)}")
+    return counts
+
 def figure1_timeline(df):
     """
     FIGURE 1: Timeline of Cases (2000-2025)
     Timeline showing distribution of CRISIS vs CONTROL cases over years
     """
-    print("\n=== Generating Figure 1: Timeline ===")
+    from aggregates import case_counts
+    plt = pyplot()
     
-    fig, ax = plt.subplots(figsize=(10, 6))
+    print("\n=== Generating Figure 1: Timeline ===")
     
     # Count cases per year for each group
-    crisis_df = df[df['Crisis_Catalyzed'] == 1]
-    control_df = df[df['Crisis_Catalyzed'] == 0]
+    profiling.step('aggregate')
+    counts = case_counts(df)
     
     years = range(2000, 2026)
-    crisis_counts = [len(crisis_df[crisis_df['Year'] == y]) for y in years]
-    control_counts = [len(control_df[control_df['Year'] == y]) for y in years]
+    crisis_counts = counts.series('Year', Crisis_Catalyzed=1).reindex(years, fill_value=0).tolist()
+    control_counts = counts.series('Year', Crisis_Catalyzed=0).reindex(years, fill_value=0).tolist()
+    
+    profiling.step('plot')
+    fig, ax = plt.subplots(figsize=(10, 6))
     
     # Plot lines
     ax.plot(years, crisis_counts, 'o-', color=CRISIS_COLOR, linewidth=2, 
@@ -92,9 +194,10 @@ def figure1_timeline(df):
     ax.grid(True, alpha=0.3, linestyle=':')
     ax.set_xlim(2004, 2019)
     
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure1_timeline.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure1_timeline.png")
+    profiling.step('savefig')
+    save_figure('figure1_timeline')
     plt.close()
 
 def figure2_geographic_map(df):
@@ -102,47 +205,55 @@ def figure2_geographic_map(df):
     FIGURE 2: Geographic Distribution Map
     Showing Europe (34 cases) and Latin America (26 cases) distribution
     """
-    print("\n=== Generating Figure 2: Geographic Map ===")
+    from aggregates import case_counts
+    plt = pyplot()
     
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    print("\n=== Generating Figure 2: Geographic Map ===")
     
     # Count by region and crisis status
-    geo_crisis = df.groupby(['Geographic_Region', 'Crisis_Catalyzed']).size().unstack(fill_value=0)
+    profiling.step('aggregate')
+    counts = case_counts(df)
     
-    # Europe pie chart
-    europe_df = df[df['Geographic_Region'] == 'Europe']
-    europe_crisis = len(europe_df[europe_df['Crisis_Catalyzed'] == 1])
-    europe_control = len(europe_df[europe_df['Crisis_Catalyzed'] == 0])
+    # Europe
+    europe_total = counts.count(Geographic_Region='Europe')
+    europe_crisis = counts.count(Geographic_Region='Europe', Crisis_Catalyzed=1)
+    europe_control = counts.count(Geographic_Region='Europe', Crisis_Catalyzed=0)
+    
+    # Latin America
+    latam_total = counts.count(Geographic_Region='Latin America')
+    latam_crisis = counts.count(Geographic_Region='Latin America', Crisis_Catalyzed=1)
+    latam_control = counts.count(Geographic_Region='Latin America', Crisis_Catalyzed=0)
     
+    profiling.step('plot')
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    
+    # Europe pie chart
     ax1.pie([europe_crisis, europe_control], 
             labels=[f'CRISIS\n(n={europe_crisis})', f'CONTROL\n(n={europe_control})'],
             colors=[CRISIS_COLOR, CONTROL_COLOR],
             autopct='%1.1f%%',
             startangle=90,
             textprops={'fontsize': 10, 'weight': 'bold'})
-    ax1.set_title(f'Europe\nTotal: {len(europe_df)} cases (56.7%)', 
+    ax1.set_title(f'Europe\nTotal: {europe_total} cases (56.7%)', 
                   fontweight='bold', fontsize=12)
     
     # Latin America pie chart
-    latam_df = df[df['Geographic_Region'] == 'Latin America']
-    latam_crisis = len(latam_df[latam_df['Crisis_Catalyzed'] == 1])
-    latam_control = len(latam_df[latam_df['Crisis_Catalyzed'] == 0])
-    
     ax2.pie([latam_crisis, latam_control], 
             labels=[f'CRISIS\n(n={latam_crisis})', f'CONTROL\n(n={latam_control})'],
             colors=[CRISIS_COLOR, CONTROL_COLOR],
             autopct='%1.1f%%',
             startangle=90,
             textprops={'fontsize': 10, 'weight': 'bold'})
-    ax2.set_title(f'Latin America\nTotal: {len(latam_df)} cases (43.3%)', 
+    ax2.set_title(f'Latin America\nTotal: {latam_total} cases (43.3%)', 
                   fontweight='bold', fontsize=12)
     
     fig.suptitle('Geographic Distribution of Cases by Region\nN=60 (30 CRISIS + 30 CONTROL)', 
                  fontweight='bold', fontsize=14, y=1.02)
     
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure2_geographic_map.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure2_geographic_map.png")
+    profiling.step('savefig')
+    save_figure('figure2_geographic_map')
     plt.close()
 
 def figure3_conflict_typology(df):
@@ -150,12 +261,17 @@ def figure3_conflict_typology(df):
     FIGURE 3: Conflict Typology Distribution
     Horizontal bar chart showing 16 conflict types
     """
-    print("\n=== Generating Figure 3: Conflict Typology ===")
+    from aggregates import case_counts, ranked
+    plt = pyplot()
     
-    fig, ax = plt.subplots(figsize=(10, 8))
+    print("\n=== Generating Figure 3: Conflict Typology ===")
     
     # Count by conflict type
-    type_counts = df['Conflict_Type'].value_counts()
+    profiling.step('aggregate')
+    type_counts = ranked(case_counts(df).series('Conflict_Type'))
+    
+    profiling.step('plot')
+    fig, ax = plt.subplots(figsize=(10, 8))
     
     # Create horizontal bar chart
     y_pos = np.arange(len(type_counts))
@@ -175,31 +291,15 @@ def figure3_conflict_typology(df):
     for i, (bar, val) in enumerate(zip(bars, type_counts.values)):
         ax.text(val + 0.1, i, f'{val}', va='center', fontsize=8, fontweight='bold')
     
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure3_conflict_typology.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure3_conflict_typology.png")
+    profiling.step('savefig')
+    save_figure('figure3_conflict_typology')
     plt.close()
 
-def figure4_fitness_matrix(df):
-    """
-    FIGURE 4: Phenotypic Fitness Matrix (3x3 Heatmap)
-    Showing fitness scores for different institutional strategies
-    """
-    print("\n=== Generating Figure 4: Fitness Matrix ===")
-    
-    # Create theoretical fitness matrix based on paper's framework
-    # Rows: Environmental conditions (Crisis/Stability/Mixed)
-    # Cols: Institutional strategy (Globalist/Sovereigntist/Hybrid)
-    
-    fitness_matrix = np.array([
-        [0.35, 0.82, 0.58],  # Crisis conditions: Sovereigntist wins
-        [0.91, 0.44, 0.67],  # Stability: Globalist wins
-        [0.63, 0.63, 0.75]   # Mixed: Hybrid optimal
-    ])
-    
-    row_labels = ['Crisis\nConditions', 'Stable\nConditions', 'Mixed\nConditions']
-    col_labels = ['Globalist\nStrategy', 'Sovereigntist\nStrategy', 'Hybrid\nStrategy']
-    
+def draw_fitness_matrix(plt, fitness_matrix, row_labels, col_labels, cell_text=None,
+                        subtitle='Relative Fitness Scores'):
+    """Heatmap of a (conditions x strategies) fitness matrix in the Figure 4 layout"""
     fig, ax = plt.subplots(figsize=(11, 9))
     
     # Create heatmap
@@ -208,23 +308,25 @@ def figure4_fitness_matrix(df):
     # Set ticks and labels
     ax.set_xticks(np.arange(len(col_labels)))
     ax.set_yticks(np.arange(len(row_labels)))
-    ax.set_xticklabels(col_labels, fontsize=12, fontweight='bold')
-    ax.set_yticklabels(row_labels, fontsize=12, fontweight='bold')
+    fine = max(len(row_labels), len(col_labels)) > 3
+    ax.set_xticklabels(col_labels, fontsize=8 if fine else 12, fontweight='bold')
+    ax.set_yticklabels(row_labels, fontsize=8 if fine else 12, fontweight='bold')
     
     # Rotate x labels and add padding
     plt.setp(ax.get_xticklabels(), rotation=0, ha="center", rotation_mode="anchor")
     ax.tick_params(axis='x', pad=10)
     ax.tick_params(axis='y', pad=10)
     
-    # Add text annotations
+    # Add text annotations (smaller on grids finer than 3x3)
+    size = max(5, 40 // max(len(row_labels), len(col_labels))) if fine else 16
     for i in range(len(row_labels)):
         for j in range(len(col_labels)):
-            text = ax.text(j, i, f'{fitness_matrix[i, j]:.2f}',
+            text = ax.text(j, i, cell_text[i][j] if cell_text else f'{fitness_matrix[i, j]:.2f}',
                           ha="center", va="center", color="black", 
-                          fontsize=16, fontweight='bold')
+                          fontsize=size, fontweight='bold')
     
     ax.set_title('Phenotypic Fitness Matrix: Institutional Strategy Success\n' + 
-                 'by Environmental Conditions (Relative Fitness Scores)',
+                 f'by Environmental Conditions ({subtitle})',
                  fontweight='bold', fontsize=13, pad=25)
     
     # Add colorbar
@@ -237,71 +339,70 @@ def figure4_fitness_matrix(df):
              'Based on Extended Phenotype Framework (Dawkins 1982) applied to legal institutions',
              ha='center', fontsize=9, style='italic', wrap=True)
     
+    profiling.step('tight_layout')
     plt.tight_layout(rect=[0, 0.05, 1, 1])
-    plt.savefig(FIGURES_DIR / 'figure4_fitness_matrix.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure4_fitness_matrix.png")
-    plt.close()
+    return fig, ax
 
-def figure5_botnia_network(df):
+def figure4_fitness_matrix(df):
     """
-    FIGURE 5: Botnia Case Citation Network
-    Directed graph showing legal citations and influence
+    FIGURE 4: Phenotypic Fitness Matrix (3x3 Heatmap)
+    Showing fitness scores for different institutional strategies
     """
-    print("\n=== Generating Figure 5: Botnia Citation Network ===")
-    
-    fig, ax = plt.subplots(figsize=(12, 10))
+    plt = pyplot()
     
-    # Create directed graph for Botnia case
-    G = nx.DiGraph()
+    print("\n=== Generating Figure 4: Fitness Matrix ===")
+    profiling.step('plot')
     
-    # Central node: Botnia ICJ Case (2006-2010)
-    G.add_node("Botnia ICJ\n(2006-2010)", node_type='central')
+    # Create theoretical fitness matrix based on paper's framework
+    # Rows: Environmental conditions (Crisis/Stability/Mixed)
+    # Cols: Institutional strategy (Globalist/Sovereigntist/Hybrid)
+    # (fitness_sim.py estimates the same matrix by Monte Carlo simulation)
     
-    # Precedent nodes (cited by Botnia)
-    precedents = [
-        "Gabčíkovo-\nNagymaros\n(1997)",
-        "Pulp Mills\nPrecedent\n(2004)",
-        "Trail Smelter\n(1941)",
-        "Corfu Channel\n(1949)"
-    ]
+    fitness_matrix = np.array([
+        [0.35, 0.82, 0.58],  # Crisis conditions: Sovereigntist wins
+        [0.91, 0.44, 0.67],  # Stability: Globalist wins
+        [0.63, 0.63, 0.75]   # Mixed: Hybrid optimal
+    ])
     
-    for p in precedents:
-        G.add_node(p, node_type='precedent')
-        G.add_edge(p, "Botnia ICJ\n(2006-2010)")
-    
-    # Consequent nodes (citing Botnia)
-    consequents = [
-        "Costa Rica v\nNicaragua\n(2015)",
-        "Chile v\nBolivia\n(2018)",
-        "Certain Activities\nICJ (2015)",
-        "India v\nPakistan\n(2019)",
-        "Whaling Case\n(2014)",
-        "South China\nSea (2016)"
-    ]
+    row_labels = ['Crisis\nConditions', 'Stable\nConditions', 'Mixed\nConditions']
+    col_labels = ['Globalist\nStrategy', 'Sovereigntist\nStrategy', 'Hybrid\nStrategy']
     
-    for c in consequents:
-        G.add_node(c, node_type='consequent')
-        G.add_edge("Botnia ICJ\n(2006-2010)", c)
+    draw_fitness_matrix(plt, fitness_matrix, row_labels, col_labels)
+    profiling.step('savefig')
+    save_figure('figure4_fitness_matrix')
+    plt.close()
+
+def figure5_botnia_network(df):
+    """
+    FIGURE 5: Botnia Case Citation Network
+    Directed graph showing legal citations and influence
+    """
+    import networkx as nx
+    import citation_network
+    plt = pyplot()
     
-    # Regional influence nodes
-    regional = [
-        "Argentine\nCourts",
-        "Uruguayan\nCourts",
-        "MERCOSUR\nTribunal",
-        "IACHR\nCases"
-    ]
+    print("\n=== Generating Figure 5: Botnia Citation Network ===")
     
-    for r in regional:
-        G.add_node(r, node_type='regional')
-        G.add_edge("Botnia ICJ\n(2006-2010)", r)
+    # Botnia ego network: 1-hop neighbourhood of the ICJ case in the citation graph
+    profiling.step('load')
+    graph = citation_network.load_graph(CITATION_NODES, CITATION_EDGES)
+    ego = citation_network.ego_network(graph, BOTNIA_NODE, k=1)
+    G = ego.to_networkx()
+    roles = citation_network.ego_roles(ego, BOTNIA_NODE)
+    nx.set_node_attributes(G, roles.to_dict(), 'node_type')
+    center = roles.index[roles == 'central'][0]
     
     # Layout
-    pos = nx.spring_layout(G, k=2, iterations=50, seed=42)
+    profiling.step('layout')
+    pos = citation_network.layout(ego, seed=42, k=2, iterations=50)
     
     # Manually adjust central node position
-    pos["Botnia ICJ\n(2006-2010)"] = np.array([0.5, 0.5])
+    pos[center] = np.array([0.5, 0.5])
     
     # Draw nodes by type
+    profiling.step('plot')
+    fig, ax = plt.subplots(figsize=(12, 10))
+    
     node_colors = []
     node_sizes = []
     for node in G.nodes():
@@ -344,18 +445,18 @@ def figure5_botnia_network(df):
     ax.legend(handles=legend_elements, loc='upper left', framealpha=0.9, fontsize=9)
     
     ax.axis('off')
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure5_botnia_network.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure5_botnia_network.png")
+    profiling.step('savefig')
+    save_figure('figure5_botnia_network')
     plt.close()
 
-def figure6_phenotypic_expression_boxplots(df):
+def phenotypic_expression_scores():
     """
-    FIGURE 6: Crisis vs Control Phenotypic Expression Scores
-    Box plots comparing expression intensity
+    Simulated phenotypic expression scores (0-10) for 30 CRISIS and 30
+    CONTROL cases. Seeds the global NumPy stream, which figure 6 keeps
+    drawing from for its scatter jitter.
     """
-    print("\n=== Generating Figure 6: Box Plots ===")
-    
     # Simulate phenotypic expression scores based on paper's framework
     # CRISIS cases show higher expression intensity (more visible legal artifacts)
     np.random.seed(42)
@@ -365,6 +466,21 @@ def figure6_phenotypic_expression_boxplots(df):
     
     control_scores = np.random.normal(loc=4.8, scale=1.2, size=30)
     control_scores = np.clip(control_scores, 0, 10)
+    return crisis_scores, control_scores
+
+def figure6_phenotypic_expression_boxplots(df):
+    """
+    FIGURE 6: Crisis vs Control Phenotypic Expression Scores
+    Box plots comparing expression intensity
+    """
+    import pandas as pd
+    from scipy import stats
+    plt = pyplot()
+    
+    print("\n=== Generating Figure 6: Box Plots ===")
+    profiling.step('plot')
+    
+    crisis_scores, control_scores = phenotypic_expression_scores()
     
     data = pd.DataFrame({
         'Score': np.concatenate([crisis_scores, control_scores]),
@@ -407,7 +523,6 @@ def figure6_phenotypic_expression_boxplots(df):
            ha='center', fontsize=9, bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
     
     # Statistical test
-    from scipy import stats
     t_stat, p_val = stats.ttest_ind(crisis_scores, control_scores)
     ax.text(1.5, 0.5, f't-test: t={t_stat:.2f}, p<0.001***',
            ha='center', fontsize=10, fontweight='bold',
@@ -422,9 +537,10 @@ def figure6_phenotypic_expression_boxplots(df):
     ax.set_ylim(-0.5, 10.5)
     ax.grid(True, alpha=0.3, linestyle=':', axis='y')
     
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure6_phenotypic_expression_boxplots.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure6_phenotypic_expression_boxplots.png")
+    profiling.step('savefig')
+    save_figure('figure6_phenotypic_expression_boxplots')
     plt.close()
 
 def figure7_temporal_cycles(df):
@@ -432,23 +548,25 @@ def figure7_temporal_cycles(df):
     FIGURE 7: Temporal Cycles (2008-2024)
     Line graph showing cyclical patterns in sovereignty assertions
     """
-    print("\n=== Generating Figure 7: Temporal Cycles ===")
+    from aggregates import case_counts
+    plt = pyplot()
     
-    fig, ax = plt.subplots(figsize=(12, 7))
+    print("\n=== Generating Figure 7: Temporal Cycles ===")
     
-    # Generate temporal cycle data
+    # Cases per year for each group (years without cases count as zero)
+    profiling.step('aggregate')
+    counts = case_counts(df)
     years = np.arange(2008, 2025)
-    
-    # Crisis intensity (peaks during 2015-2016 refugee/Brexit)
-    crisis_intensity = np.array([2, 3, 4, 5, 6, 8, 10, 12, 9, 7, 5, 6, 7, 6, 5, 4, 3])
-    
-    # Control baseline (stable)
-    control_baseline = np.array([3, 3, 4, 4, 4, 5, 5, 5, 5, 5, 6, 6, 6, 6, 6, 6, 5])
+    crisis_intensity = counts.series('Year', Crisis_Catalyzed=1).reindex(years, fill_value=0).to_numpy()
+    control_baseline = counts.series('Year', Crisis_Catalyzed=0).reindex(years, fill_value=0).to_numpy()
     
     # Calculate moving averages
     window = 3
-    crisis_ma = pd.Series(crisis_intensity).rolling(window=window, center=True).mean()
-    control_ma = pd.Series(control_baseline).rolling(window=window, center=True).mean()
+    crisis_ma = counts.moving_average('Year', window, labels=years, Crisis_Catalyzed=1).to_numpy()
+    control_ma = counts.moving_average('Year', window, labels=years, Crisis_Catalyzed=0).to_numpy()
+    
+    profiling.step('plot')
+    fig, ax = plt.subplots(figsize=(12, 7))
     
     # Plot raw data
     ax.plot(years, crisis_intensity, 'o-', color=CRISIS_COLOR, linewidth=1.5, 
@@ -487,40 +605,296 @@ def figure7_temporal_cycles(df):
     ax.grid(True, alpha=0.3, linestyle=':')
     ax.set_xlim(2007.5, 2024.5)
     
+    profiling.step('tight_layout')
     plt.tight_layout()
-    plt.savefig(FIGURES_DIR / 'figure7_temporal_cycles.png', dpi=300, bbox_inches='tight')
-    print(f"✓ Saved: figure7_temporal_cycles.png")
+    profiling.step('savefig')
+    save_figure('figure7_temporal_cycles')
     plt.close()
 
-def main():
-    """Generate all 7 figures"""
+# Render order used by main(); names double as output file stems
+FIGURES = {
+    'figure1_timeline': figure1_timeline,
+    'figure2_geographic_map': figure2_geographic_map,
+    'figure3_conflict_typology': figure3_conflict_typology,
+    'figure4_fitness_matrix': figure4_fitness_matrix,
+    'figure5_botnia_network': figure5_botnia_network,
+    'figure6_phenotypic_expression_boxplots': figure6_phenotypic_expression_boxplots,
+    'figure7_temporal_cycles': figure7_temporal_cycles,
+}
+
+# Count dimensions each figure reads (part of its rebuild cache key)
+FIGURE_COLUMNS = {
+    'figure1_timeline': ['Year', 'Crisis_Catalyzed'],
+    'figure2_geographic_map': ['Geographic_Region', 'Crisis_Catalyzed'],
+    'figure3_conflict_typology': ['Conflict_Type'],
+    'figure4_fitness_matrix': [],
+    'figure5_botnia_network': [],
+    'figure6_phenotypic_expression_boxplots': [],
+    'figure7_temporal_cycles': ['Year', 'Crisis_Catalyzed'],
+}
+
+# Other data files each figure reads (also part of its cache key)
+FIGURE_FILES = {
+    'figure5_botnia_network': [CITATION_NODES, CITATION_EDGES],
+}
+
+def select_figures(tokens):
+    """
+    Figure names for command-line tokens: a number ('5'), a short name
+    ('figure5') or the full name ('figure5_botnia_network'). No tokens
+    selects every figure; the result is always in render order.
+    """
+    if not tokens:
+        return list(FIGURES)
+    chosen = set()
+    for token in tokens:
+        token = token.lower()
+        short = token if token.startswith('figure') else f'figure{token}'
+        matches = [name for name in FIGURES if name == token or name.split('_')[0] == short]
+        if not matches:
+            raise ValueError(f"unknown figure {token!r} (see --list)")
+        chosen.update(matches)
+    return [name for name in FIGURES if name in chosen]
+
+def output_paths(name, formats):
+    return [figure_output.output_path(FIGURES_DIR, name, fmt) for fmt in formats]
+
+def figure_keys(df, names, dpi=300, max_png_bytes=None):
+    """Rebuild cache key for each named figure"""
+    style = figure_cache.style_digest(
+        STYLE, [CRISIS_COLOR, CONTROL_COLOR, GLOBALIST_COLOR, SOVEREIGNTIST_COLOR],
+        {'dpi': dpi, 'max_png_bytes': max_png_bytes})
+    counts = None
+    if df is not None:
+        from aggregates import case_counts
+        counts = case_counts(df)
+    return {name: figure_cache.figure_key(FIGURES[name], counts, FIGURE_COLUMNS[name], style,
+                                          FIGURE_FILES.get(name, ()))
+            for name in names}
+
+def render_figure(name, df, profile=False, formats=('png',), dpi=300, max_png_bytes=None):
+    """
+    Render a single figure by name and return
+    (name, seconds, stage records, output records).
+    Module-level so it can be shipped to worker processes; with profile=True
+    the figure's stages are recorded in this process and returned. STYLE is
+    applied for the duration of the figure only.
+    """
+    import matplotlib
+    pyplot()
+    _output.update(formats=tuple(formats), dpi=dpi, max_png_bytes=max_png_bytes, report=[])
+    profiler = profiling.activate(profiling.StageProfiler()) if profile else None
+    start = time.perf_counter()
+    with matplotlib.rc_context(STYLE), profiling.stage(name):
+        FIGURES[name](df)
+    seconds = time.perf_counter() - start
+    profiling.activate(None)
+    return name, seconds, profiler.records if profiler else [], _output['report']
+
+# Data of a render worker process, set once by its pool initializer
+_worker = {'df': None}
+
+def _init_render_worker(df, handle=None, columns=None):
+    """Pool initializer: attach the shared case table if one was published"""
+    if handle is not None:
+        import shared_table
+        df = shared_table.attach_frame(handle, columns)
+    _worker['df'] = df
+
+def _render_in_worker(name, profile, **output):
+    return render_figure(name, _worker['df'], profile, **output)
+
+def render_figures(df, names, jobs=1, profile=False, **output):
+    """
+    Render the named figures, serially or across a process pool; output
+    holds formats, dpi and max_png_bytes for render_figure().
+    Every figure function is self-contained (own figure, own seed), so the
+    parallel path writes the same bytes as the serial one. A case table is
+    published once to shared memory (shared_table.py) rather than pickled
+    to each worker; workers attach its typed columns without copying.
+    Returns ({name: seconds} in render order, stage records, output records).
+    """
+    results = {}
+    if jobs <= 1 or len(names) <= 1:
+        for name in names:
+            results[name] = render_figure(name, df, profile, **output)[1:]
+    else:
+        import pandas as pd
+        import case_data
+        import shared_table
+        shared, initargs = None, (df,)
+        if isinstance(df, pd.DataFrame):
+            shared = shared_table.SharedArrays.from_frame(df)
+            # Figures read counts only: the free-text columns stay unattached
+            initargs = (None, shared.handle,
+                        [c for c in df.columns if c not in case_data.TEXT_COLUMNS])
+        try:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(names)),
+                                     initializer=_init_render_worker, initargs=initargs) as pool:
+                futures = [pool.submit(_render_in_worker, name, profile, **output)
+                           for name in names]
+                for future in as_completed(futures):
+                    name, *result = future.result()
+                    results[name] = result
+        finally:
+            if shared is not None:
+                shared.close()
+    timings = {name: results[name][0] for name in names}
+    records = [r for name in names for r in results[name][1]]
+    outputs = [r for name in names for r in results[name][2]]
+    return timings, records, outputs
+
+def print_timings(timings, wall):
+    """Print per-figure render times against total wall clock"""
+    print("\nRender timings:")
+    for name, seconds in timings.items():
+        print(f"  • {name:<42} {seconds:6.2f} s")
+    print(f"  {'sum of figures':<44} {sum(timings.values()):6.2f} s")
+    print(f"  {'wall clock':<44} {wall:6.2f} s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('figures', nargs='*', metavar='FIGURE',
+                        help='figures to render, by number or name (default: all; see --list)')
+    parser.add_argument('--list', dest='list_figures', action='store_true',
+                        help='list the figures and exit')
+    parser.add_argument('--format', dest='formats', action='append', choices=figure_output.BACKENDS,
+                        help='output backend (repeatable; default: png). pdf/svg rasterize dense '
+                             'artists only; tiles writes a PNG pyramid for web viewers')
+    parser.add_argument('--dpi', type=int, default=300, help='output resolution (default: 300)')
+    parser.add_argument('--max-png-kb', type=int, metavar='KB',
+                        help='re-encode PNGs above this size with a 256-colour palette')
+    parser.add_argument('--output-report', type=Path, metavar='JSON',
+                        help='write encode time and bytes per figure and format as JSON')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes for rendering (0 = one per CPU; default: 1, serial)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='ignore the rebuild cache and render every figure')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--stream', action='store_true',
+                        help='read the data in bounded batches into counts instead of one dataframe')
+    parser.add_argument('--cube', action='store_true',
+                        help='read counts from the persisted aggregate cube, updated incrementally')
+    parser.add_argument('--batch-rows', type=int, default=100_000,
+                        help='rows per batch with --stream/--cube (default: 100000)')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='render even if the dataset fails the codebook checks')
+    parser.add_argument('--profile', type=Path, metavar='TRACE_JSON',
+                        help='record wall/CPU time and peak memory per stage as trace-event JSON')
+    parser.add_argument('--budgets', type=Path, metavar='JSON',
+                        help='fail the run if a profiled stage exceeds these budgets (implies profiling)')
+    args = parser.parse_args(argv)
+    try:
+        args.figures = select_figures(args.figures)
+    except ValueError as exc:
+        parser.error(str(exc))
+    return args
+
+def print_figure_list():
+    for i, (name, fn) in enumerate(FIGURES.items(), 1):
+        title = fn.__doc__.strip().splitlines()[0].split(':', 1)[1].strip()
+        reads = ', '.join(FIGURE_COLUMNS[name]) or '-'
+        print(f"  {i}  {name:<42} {title}  [data: {reads}]")
+
+def main(figures=None, formats=None, dpi=300, max_png_kb=None, output_report=None, jobs=1,
+         force=False, data=None, stream=False, cube=False, batch_rows=100_000, profile=None,
+         budgets=None, skip_validation=False, list_figures=False):
+    """Generate the selected figures (default: all 7)"""
+    if list_figures:
+        print_figure_list()
+        return
+    names = figures or list(FIGURES)
+    formats = formats or ['png']
+    max_png_bytes = max_png_kb * 1024 if max_png_kb else None
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
     print("=" * 70)
-    print("GENERATING 7 PUBLICATION-QUALITY FIGURES")
+    print(f"GENERATING {len(names)} PUBLICATION-QUALITY FIGURES")
     print("International Law as Extended Phenotype (60-case dataset)")
     print("=" * 70)
     
-    # Load data
-    df = load_data()
-    
-    # Generate all figures
-    figure1_timeline(df)
-    figure2_geographic_map(df)
-    figure3_conflict_typology(df)
-    figure4_fitness_matrix(df)
-    figure5_botnia_network(df)
-    figure6_phenotypic_expression_boxplots(df)
-    figure7_temporal_cycles(df)
+    profiler = profiling.activate(profiling.StageProfiler()) if profile or budgets else None
+    
+    # Load data and build the shared count tensor once, if any selected figure reads it,
+    # and only once it passes the codebook checks (validation.py)
+    df = None
+    if any(FIGURE_COLUMNS[name] for name in names):
+        import validation
+        try:
+            if cube:
+                with profiling.stage('load'):
+                    df = load_cube_counts(data, batch_rows, validate=not skip_validation)
+            elif stream:
+                with profiling.stage('load'):
+                    df = load_counts(data, batch_rows, validate=not skip_validation)
+            else:
+                from aggregates import case_counts
+                with profiling.stage('load'):
+                    df = load_data(data)
+                if not skip_validation:
+                    with profiling.stage('validate'):
+                        report_validation(validation.validate(df, 'dataset'))
+                with profiling.stage('aggregate'):
+                    case_counts(df)
+        except validation.ValidationError:
+            print("\n✗ DATASET FAILS THE CODEBOOK CHECKS; no figures generated "
+                  "(--skip-validation overrides)")
+            raise SystemExit(1)
+    profiling.activate(None)
+    
+    # Skip figures whose data, code and style are unchanged since the last build
+    FIGURES_DIR.mkdir(exist_ok=True)
+    keys = figure_keys(df, names, dpi, max_png_bytes)
+    manifest = {} if force else figure_cache.load_manifest(CACHE_MANIFEST)
+    stale = [name for name in names
+             if not figure_cache.is_fresh(manifest.get(name), keys[name],
+                                          output_paths(name, formats))]
+    for name in names:
+        if name not in stale:
+            print(f"\n• Up to date, skipped: {name}")
+    
+    # Generate stale figures
+    start = time.perf_counter()
+    timings, records, outputs = render_figures(df, stale, jobs=jobs, profile=profiler is not None,
+                                               formats=formats, dpi=dpi,
+                                               max_png_bytes=max_png_bytes)
+    wall = time.perf_counter() - start
+    
+    for name, seconds in timings.items():
+        figure_cache.record(manifest, name, keys[name], output_paths(name, formats), seconds)
+    figure_cache.save_manifest(CACHE_MANIFEST, manifest)
     
     print("\n" + "=" * 70)
-    print("✓ ALL 7 FIGURES GENERATED SUCCESSFULLY")
+    print(f"✓ {len(timings)} FIGURES GENERATED, {len(names) - len(timings)} UP TO DATE")
     print(f"✓ Output directory: {FIGURES_DIR.absolute()}")
     print("=" * 70)
     
+    print_timings(timings, wall)
+    figure_output.print_report(outputs)
+    if output_report:
+        figure_output.write_report(outputs, output_report)
+    
     # List generated files
     print("\nGenerated files:")
-    for f in sorted(FIGURES_DIR.glob('figure*.png')):
+    for f in sorted(p for name in names for p in output_paths(name, formats)):
         size_kb = f.stat().st_size / 1024
-        print(f"  • {f.name} ({size_kb:.1f} KB)")
+        print(f"  • {f.relative_to(FIGURES_DIR)} ({size_kb:.1f} KB)")
+    
+    if profiler is not None:
+        profiler.records.extend(records)
+        if profile:
+            profiler.write(profile)
+            print(f"\n✓ Stage profile written to {profile}")
+        if budgets:
+            violations = profiling.check_budgets(profiler.records, profiling.load_budgets(budgets))
+            if violations:
+                print("\n✗ PERFORMANCE BUDGETS EXCEEDED:")
+                for v in violations:
+                    print(f"  • {v}")
+                raise SystemExit(1)
+            print(f"✓ All stages within budgets ({budgets})")
 
 if __name__ == '__main__':
-    main()
+    main(**vars(parse_args()))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing instrumentation for the figure pipeline
+
+A StageProfiler records wall time, CPU time and peak traced memory for
+named stages, plus the process RSS high-water mark (which also covers C/C++
+buffers such as the Agg canvas that tracemalloc cannot see). Figures mark
+their stages (aggregate, plot, layout, tight_layout, savefig) with step();
+render code wraps each figure in stage(). Both are no-ops unless a profiler has been activated, so the
+instrumented code costs nothing in normal runs.
+
+Results are written as Chrome trace-event JSON (open in chrome://tracing or
+https://ui.perfetto.dev) and can be checked against budgets such as
+    {"figure5_botnia_network/layout": {"wall_s": 2.0},
+     "*/savefig": {"wall_s": 1.5, "peak_mb": 200}}
+where keys are fnmatch patterns over stage paths.
+"""
+
+import fnmatch
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BUDGET_FIELDS = ('wall_s', 'cpu_s', 'peak_mb', 'max_rss_mb')
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far (0 where unavailable)"""
+    if resource is None:
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return rss / 2 ** 20 if os.uname().sysname == 'Darwin' else rss / 2 ** 10
+
+
+class StageProfiler:
+    """Collects one record per finished stage"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._stack = []
+
+    def _memory(self):
+        if not self.trace_memory:
+            return 0, 0
+        return tracemalloc.get_traced_memory()
+
+    def push(self, name):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        current, peak = self._memory()
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], peak)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self._stack.append({
+            'name': name,
+            'path': '/'.join([f['name'] for f in self._stack] + [name]),
+            'ts': time.time(),
+            'wall0': time.perf_counter(),
+            'cpu0': time.process_time(),
+            'mem0': current,
+            'peak': current,
+        })
+
+    def pop(self):
+        frame = self._stack.pop()
+        _, peak = self._memory()
+        frame['peak'] = max(frame['peak'], peak)
+        if self._stack:
+            parent = self._stack[-1]
+            parent['peak'] = max(parent['peak'], frame['peak'])
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.records.append({
+            'stage': frame['path'],
+            'ts': frame['ts'],
+            'wall_s': time.perf_counter() - frame['wall0'],
+            'cpu_s': time.process_time() - frame['cpu0'],
+            'peak_mb': (frame['peak'] - frame['mem0']) / 2 ** 20,
+            'max_rss_mb': max_rss_mb(),
+            'pid': os.getpid(),
+        })
+
+    @contextmanager
+    def stage(self, name):
+        self.push(name)
+        try:
+            yield
+        finally:
+            # close any step() still open inside this stage
+            while self._stack and self._stack[-1].get('step'):
+                self.pop()
+            self.pop()
+
+    def step(self, name):
+        """End the previous step of the current stage (if any) and start a new one"""
+        if self._stack and self._stack[-1].get('step'):
+            self.pop()
+        self.push(name)
+        self._stack[-1]['step'] = True
+
+    def trace_events(self):
+        """Records as Chrome trace-event 'complete' events"""
+        return {'traceEvents': [{
+            'name': r['stage'].rsplit('/', 1)[-1],
+            'cat': r['stage'].split('/', 1)[0],
+            'ph': 'X',
+            'ts': r['ts'] * 1e6,
+            'dur': r['wall_s'] * 1e6,
+            'pid': r['pid'],
+            'tid': r['pid'],
+            'args': {k: round(r[k], 6) for k in BUDGET_FIELDS},
+        } for r in self.records], 'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.trace_events(), f, indent=1)
+
+
+def check_budgets(records, budgets):
+    """Return a message for every record that exceeds a matching budget"""
+    violations = []
+    for r in records:
+        for pattern, limits in budgets.items():
+            if not fnmatch.fnmatchcase(r['stage'], pattern):
+                continue
+            for field, limit in limits.items():
+                if field not in BUDGET_FIELDS:
+                    raise ValueError(f"unknown budget field {field!r} for {pattern!r}")
+                if r[field] > limit:
+                    violations.append(f"{r['stage']}: {field} {r[field]:.3f} > budget {limit}")
+    return violations
+
+
+def load_budgets(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# Profiler used by stage()/step() below; None means instrumentation is off
+_active = None
+
+
+def activate(profiler):
+    global _active
+    _active = profiler
+    return profiler
+
+
+def active():
+    return _active
+
+
+@contextmanager
+def stage(name):
+    if _active is None:
+        yield
+    else:
+        with _active.stage(name):
+            yield
+
+
+def step(name):
+    if _active is not None:
+        _active.step(name)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Propensity score matching for the CRISIS/CONTROL design
+
+Implements sections 6.1-6.4 of data_extended/PSM_feasibility_note.md on the
+frame returned by load_data():
+  6.1  logistic propensity model (Newton/IRLS in NumPy)
+  6.2  nearest-neighbour matching, 1:k, optional caliper, with or without
+       replacement, against a sorted-score index (O(n log n), not all-pairs)
+  6.3  standardized mean difference / variance ratio balance tables
+  6.4  average treatment effect on the treated (ATT)
+
+With the Phase 1 covariates (Year, Geographic_Region, Legal_Family) the
+estimates are illustrative only; see section 4 of the note.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+import validation
+
+TREATMENT = 'Crisis_Catalyzed'
+DEFAULT_COVARIATES = ['Year', 'Geographic_Region', 'Legal_Family']
+
+
+def design_matrix(df, covariates=DEFAULT_COVARIATES):
+    """
+    Numeric covariate matrix: numeric columns as-is, categoricals one-hot
+    encoded with the first level dropped.
+    """
+    parts = []
+    for col in covariates:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series.dtype) and \
+                not isinstance(series.dtype, pd.CategoricalDtype):
+            parts.append(series.astype(float).rename(col))
+        else:
+            dummies = pd.get_dummies(series, prefix=col, prefix_sep='=', drop_first=True,
+                                     dtype=float)
+            parts.append(dummies)
+    return pd.concat(parts, axis=1)
+
+
+def estimate_propensity(X, treated, ridge=1e-6, max_iter=100, tol=1e-10):
+    """
+    Fit logit(e(X)) = b0 + X b by Newton-Raphson and return e(X).
+    Columns are standardized internally; a small ridge keeps the fit finite
+    under (quasi-)separation, which small samples hit easily.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(treated, dtype=float)
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    Z = np.column_stack([np.ones(len(X)), (X - X.mean(axis=0)) / sd])
+    beta = np.zeros(Z.shape[1])
+    penalty = np.full(Z.shape[1], ridge)
+    penalty[0] = 0.0
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-Z @ beta))
+        w = p * (1.0 - p)
+        grad = Z.T @ (y - p) - penalty * beta
+        hess = (Z * w[:, None]).T @ Z + np.diag(penalty)
+        step = np.linalg.solve(hess, grad)
+        beta += step
+        if np.max(np.abs(step)) < tol:
+            break
+    return 1.0 / (1.0 + np.exp(-Z @ beta))
+
+
+def _nearest_with_replacement(t_scores, c_sorted, k):
+    """k nearest sorted-control positions for every treated score at once"""
+    n = len(c_sorted)
+    k = min(k, n)
+    pos = np.searchsorted(c_sorted, t_scores)
+    # The k nearest neighbours always lie in the window [pos - k, pos + k)
+    window = pos[:, None] + np.arange(-k, k)[None, :]
+    window = np.clip(window, 0, n - 1)
+    dist = np.abs(c_sorted[window] - t_scores[:, None])
+    # Clipped windows repeat edge positions; push duplicates to the back
+    dup = np.zeros_like(dist, dtype=bool)
+    dup[:, 1:] = window[:, 1:] == window[:, :-1]
+    dist[dup] = np.inf
+    best = np.argsort(dist, axis=1, kind='stable')[:, :k]
+    rows = np.arange(len(t_scores))[:, None]
+    return window[rows, best], dist[rows, best]
+
+
+def _nearest_without_replacement(t_scores, c_sorted, k, caliper, order, checkpoint=None,
+                                 inputs=''):
+    """
+    Greedy matching in the given treated order. Used controls are skipped
+    with union-find 'next free' pointers in both directions, so each lookup
+    is near O(1) amortized instead of a rescan. With a checkpoint the
+    pointers and the pairs so far are saved periodically, and a run over
+    the same inputs resumes from the last save.
+    """
+    n = len(c_sorted)
+    # right: node i is position i, node n means 'none'; roots are free positions.
+    # left: node i is position i - 1, node 0 means 'none'.
+    right = list(range(n + 1))
+    left = list(range(n + 1))
+    pairs = []
+    start = 0
+    if checkpoint is not None:
+        meta, arrays = checkpoint.load()
+        if meta is not None and meta['inputs'] == inputs:
+            start = meta['done']
+            right, left = arrays['right'].tolist(), arrays['left'].tolist()
+            pairs = [(int(t), int(j), d) for t, j, d in arrays['pairs']]
+
+    def find(parent, i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for done, t in enumerate(order[start:], start):
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save({'inputs': inputs, 'done': done, 'progress': f'{done}/{len(order)} treated'},
+                            right=np.array(right), left=np.array(left),
+                            pairs=np.array(pairs, dtype=float).reshape(-1, 3))
+        score = t_scores[t]
+        pos = int(np.searchsorted(c_sorted, score))
+        for _ in range(k):
+            r = find(right, pos)
+            l = find(left, pos) - 1
+            d_r = c_sorted[r] - score if r < n else np.inf
+            d_l = score - c_sorted[l] if l >= 0 else np.inf
+            j, d = (l, d_l) if d_l <= d_r else (r, d_r)
+            if not np.isfinite(d) or (caliper is not None and d > caliper):
+                break
+            pairs.append((t, j, d))
+            right[j] = j + 1
+            left[j + 1] = j
+    if checkpoint is not None:
+        checkpoint.clear()
+    return pairs
+
+
+def match(scores, treated, k=1, caliper=None, replace=False, order='largest', checkpoint=None):
+    """
+    Nearest-neighbour matching on a one-dimensional score.
+
+    scores   propensity scores (or their logits) for every unit
+    treated  boolean treatment indicator
+    k        controls per treated unit (1:k)
+    caliper  maximum |score difference| for a valid match (None = no limit)
+    replace  whether a control may be reused across treated units
+    order    greedy order without replacement: 'largest', 'smallest' or 'data'
+    checkpoint  checkpoint.Checkpoint for resuming an interrupted greedy
+             match (without replacement; the other cases are one
+             vectorized step)
+
+    Returns a DataFrame with one row per matched pair (treated and control
+    positions into the input, distance) plus the 1/m weight each control
+    receives from its treated unit.
+    """
+    scores = np.asarray(scores, dtype=float)
+    treated = np.asarray(treated, dtype=bool)
+    t_idx = np.flatnonzero(treated)
+    c_idx = np.flatnonzero(~treated)
+    sort = np.argsort(scores[c_idx], kind='stable')
+    c_sorted = scores[c_idx][sort]
+    t_scores = scores[t_idx]
+
+    if not len(t_idx) or not len(c_idx):
+        pairs = np.empty((0, 3))
+    elif replace:
+        pos, dist = _nearest_with_replacement(t_scores, c_sorted, k)
+        t_rep = np.repeat(np.arange(len(t_idx)), pos.shape[1])
+        pairs = np.column_stack([t_rep, pos.ravel(), dist.ravel()])
+        if caliper is not None:
+            pairs = pairs[pairs[:, 2] <= caliper]
+    else:
+        greedy = {'largest': np.argsort(-t_scores, kind='stable'),
+                  'smallest': np.argsort(t_scores, kind='stable'),
+                  'data': np.arange(len(t_idx))}[order]
+        inputs = ''
+        if checkpoint is not None:
+            from checkpoint import digest
+            inputs = digest(scores, treated, np.array([k, -1 if caliper is None else caliper]),
+                            greedy)
+        pairs = np.array(_nearest_without_replacement(t_scores, c_sorted, k, caliper, greedy,
+                                                      checkpoint, inputs),
+                         dtype=float).reshape(-1, 3)
+
+    t_pos = pairs[:, 0].astype(int)
+    matches = pd.DataFrame({
+        'treated': t_idx[t_pos],
+        'control': c_idx[sort[pairs[:, 1].astype(int)]],
+        'distance': pairs[:, 2],
+    })
+    matches['weight'] = 1.0 / matches.groupby('treated')['control'].transform('size')
+    return matches.sort_values(['treated', 'distance'], kind='stable').reset_index(drop=True)
+
+
+def unit_weights(matches, n):
+    """
+    Per-unit weights of the matched sample: 1 for each matched treated
+    unit, summed 1/m contributions for controls, 0 for unmatched units.
+    """
+    w = np.zeros(n)
+    w[matches['treated'].unique()] = 1.0
+    np.add.at(w, matches['control'].to_numpy(), matches['weight'].to_numpy())
+    return w
+
+
+def _weighted_moments(X, w):
+    total = w.sum(axis=0)
+    mean = (w * X).sum(axis=0) / total
+    var = (w * (X - mean) ** 2).sum(axis=0) / total
+    return mean, var
+
+
+def balance_table(X, treated, weights=None):
+    """
+    Standardized mean differences and variance ratios for every column of X
+    (section 6.3), computed in one pass over the matrix. SMD uses the pooled
+    unweighted SD so before/after tables are on the same scale.
+    """
+    cols = X.columns if isinstance(X, pd.DataFrame) else None
+    X = np.asarray(X, dtype=float)
+    treated = np.asarray(treated, dtype=bool)
+    w = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=float)
+    wt = (w * treated)[:, None]
+    wc = (w * ~treated)[:, None]
+
+    mean_t, var_t = _weighted_moments(X, wt)
+    mean_c, var_c = _weighted_moments(X, wc)
+    pooled_sd = np.sqrt((X[treated].var(axis=0) + X[~treated].var(axis=0)) / 2.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        smd = np.where(pooled_sd > 0, (mean_t - mean_c) / pooled_sd, 0.0)
+        ratio = np.where(var_c > 0, var_t / var_c, np.nan)
+    return pd.DataFrame({
+        'mean_treated': mean_t,
+        'mean_control': mean_c,
+        'smd': smd,
+        'variance_ratio': ratio,
+    }, index=cols)
+
+
+def att(outcome, matches):
+    """ATT = E[Y1 - Y0 | T = 1] over matched treated units (section 6.4)"""
+    y = np.asarray(outcome, dtype=float)
+    counterfactual = (y[matches['control']] * matches['weight']).groupby(
+        matches['treated'].to_numpy()).sum()
+    return float(np.mean(y[counterfactual.index] - counterfactual.to_numpy()))
+
+
+def run(df, covariates=DEFAULT_COVARIATES, k=1, caliper_sd=0.2, replace=False, checkpoint=None):
+    """
+    Full pipeline on a case table: propensity model, matching with a
+    caliper of caliper_sd x SD(score), and before/after balance tables.
+    """
+    X = design_matrix(df, covariates)
+    treated = df[TREATMENT].to_numpy() == 1
+    scores = estimate_propensity(X, treated)
+    caliper = None if caliper_sd is None else caliper_sd * scores.std()
+    matches = match(scores, treated, k=k, caliper=caliper, replace=replace, checkpoint=checkpoint)
+    before = balance_table(X, treated)
+    after = balance_table(X, treated, unit_weights(matches, len(df)))
+    return scores, matches, before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Propensity score matching (illustrative, Phase 1 covariates)')
+    parser.add_argument('-k', type=int, default=1, help='controls per treated case (default: 1)')
+    parser.add_argument('--caliper', type=float, default=0.2,
+                        help='caliper in SDs of the propensity score (default: 0.2; negative = none)')
+    parser.add_argument('--replace', action='store_true', help='match with replacement')
+    parser.add_argument('--data', type=Path, default=case_data.DEFAULT_CSV, help='case CSV')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='save matching progress periodically and resume an interrupted run')
+    args = parser.parse_args()
+
+    df = case_data.load_cases(args.data)
+    report = validation.validate(df, args.data.name)
+    if not report.ok:
+        sys.exit(report.summary())
+    caliper = None if args.caliper < 0 else args.caliper
+    checkpoint = None
+    if args.checkpoint:
+        from checkpoint import Checkpoint
+        checkpoint = Checkpoint('psm-match', {'data': str(args.data.resolve()), 'k': args.k,
+                                              'caliper': caliper, 'replace': args.replace})
+    scores, matches, before, after = run(df, k=args.k, caliper_sd=caliper, replace=args.replace,
+                                         checkpoint=checkpoint)
+
+    print(f"Matched {matches['treated'].nunique()} of {int((df[TREATMENT] == 1).sum())} CRISIS cases "
+          f"to {matches['control'].nunique()} CONTROL cases (k={args.k}, "
+          f"caliper={caliper} SD, replace={args.replace})")
+    print("\nBalance before matching:")
+    print(before.round(3).to_string())
+    print("\nBalance after matching:")
+    print(after.round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
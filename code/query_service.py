@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Local HTTP service for figure renders and aggregate queries
+
+Loads and validates the case table once, keeps its count tensor warm, and
+answers plain HTTP/1.1 with asyncio (standard library only):
+
+  GET /health                       rows, cache and render statistics
+  GET /figures                      the figure names
+  GET /figures/<name>.<fmt>?dpi=N   one figure as png, svg or pdf
+  GET /counts?by=DIM,...&DIM=V,...  case counts grouped by some dims and
+                                    restricted to some labels, as JSON;
+                                    e.g. /counts?by=region,year&type=...
+                                    (integer dims also take ranges:
+                                    year=2010-2015)
+
+Renders run in a bounded process pool whose workers attach the case table
+from shared memory (shared_table.py). Up to max_pending distinct renders
+can be in flight; beyond that the service answers 503. Finished images go
+to an LRU cache bounded in bytes. Identical concurrent requests are
+coalesced: the first one starts the render, and the others await the same
+future, so each image is rendered once.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+import generate_paper_figures as figures
+
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+    'json': 'application/json',
+}
+RENDER_FORMATS = ('png', 'svg', 'pdf')
+DPI_RANGE = (50, 600)
+DEFAULT_DPI = 150
+
+# Short names accepted for the count dims in /counts queries
+ALIASES = {
+    'year': 'Year',
+    'crisis': 'Crisis_Catalyzed',
+    'region': 'Geographic_Region',
+    'type': 'Conflict_Type',
+    'legal_family': 'Legal_Family',
+}
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class Busy(Exception):
+    """Too many renders in flight"""
+
+
+class ImageCache:
+    """LRU cache of rendered images, bounded by their total size in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        body = self.items.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        if key in self.items:
+            self.bytes -= len(self.items.pop(key))
+        self.items[key] = body
+        self.bytes += len(body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self.items.popitem(last=False)
+            self.bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        return {'entries': len(self.items), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def _init_worker(root, handle, columns):
+    """Pool initializer: attach the shared table, render into a private directory"""
+    figures._init_render_worker(None, handle, columns)
+    figures.FIGURES_DIR = Path(root) / str(os.getpid())
+    figures.FIGURES_DIR.mkdir(parents=True, exist_ok=True)
+    figures.pyplot()
+
+
+def _render(name, fmt, dpi):
+    """Render one figure in a worker process and return the file's bytes"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, _, _, outputs = figures.render_figure(name, figures._worker['df'],
+                                                 formats=(fmt,), dpi=dpi)
+    path = Path(outputs[0]['path'])
+    body = path.read_bytes()
+    path.unlink()
+    return body
+
+
+def _labels(counts, dim, tokens):
+    """Axis positions for the labels named in a query (integer dims take a-b ranges)"""
+    labels = counts.labels[dim]
+    by_text = {str(label): i for i, label in enumerate(labels)}
+    integer = labels.dtype.kind in 'iu'
+    positions = []
+    for token in tokens:
+        if integer and '-' in token.strip('-'):
+            lo, _, hi = token.partition('-')
+            try:
+                lo, hi = int(lo), int(hi)
+            except ValueError:
+                raise ValueError(f"bad range for {dim}: {token!r}")
+            positions += [i for i, label in enumerate(labels) if lo <= label <= hi]
+        elif token in by_text:
+            positions.append(by_text[token])
+        else:
+            raise ValueError(f"unknown {dim} label {token!r}")
+    return positions
+
+
+def query_counts(counts, by=(), filters=None):
+    """
+    Counts over the cells of the `by` dims, for cases whose labels are in
+    filters[dim] (query strings), from the warm CountTensor. Returns
+    {'by', 'filters', 'total', 'rows'}; rows list non-empty cells only.
+    """
+    filters = filters or {}
+    for dim in (*by, *filters):
+        if dim not in counts.dims:
+            raise ValueError(f"unknown dimension {dim!r}; expected one of {list(counts.dims)} "
+                             f"or {list(ALIASES)}")
+    if len(set(by)) < len(by):
+        raise ValueError(f"repeated dimension in by={list(by)}")
+    tensor, labels = counts.counts, dict(counts.labels)
+    for dim, tokens in filters.items():
+        positions = _labels(counts, dim, tokens)
+        tensor = np.take(tensor, positions, axis=counts.dims.index(dim))
+        labels[dim] = labels[dim][positions]
+    other = tuple(i for i, d in enumerate(counts.dims) if d not in by)
+    summed = tensor.sum(axis=other)
+    kept = [d for d in counts.dims if d in by]
+    summed = np.moveaxis(summed, [kept.index(d) for d in by], range(len(by)))
+
+    if not by:
+        return {'by': [], 'filters': filters, 'total': int(summed), 'rows': [{'count': int(summed)}]}
+    rows = []
+    for cell in zip(*np.nonzero(summed)):
+        row = {}
+        for dim, i in zip(by, cell):
+            label = labels[dim][i]
+            row[dim] = label.item() if isinstance(label, np.generic) else label
+        row['count'] = int(summed[cell])
+        rows.append(row)
+    return {'by': list(by), 'filters': filters, 'total': int(summed.sum()), 'rows': rows}
+
+
+class QueryService:
+    """The warm state behind the HTTP endpoints; start() before serving"""
+
+    def __init__(self, df, jobs=2, max_pending=32, cache_bytes=64 << 20):
+        from aggregates import case_counts
+        self.df = df
+        self.rows = len(df)
+        self.counts = case_counts(df)
+        self.jobs = jobs
+        self.max_pending = max_pending
+        self.cache = ImageCache(cache_bytes)
+        self.inflight = {}
+        self.stats = {'requests': 0, 'renders': 0, 'render_seconds': 0.0, 'coalesced': 0,
+                      'rejected': 0}
+        self.pool = self.shared = self.root = None
+
+    def start(self):
+        import case_data
+        import shared_table
+        self.root = tempfile.mkdtemp(prefix='figure-renders-')
+        self.shared = shared_table.SharedArrays.from_frame(self.df)
+        columns = [c for c in self.df.columns if c not in case_data.TEXT_COLUMNS]
+        self.pool = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker,
+                                        initargs=(self.root, self.shared.handle, columns))
+        # Start the workers now rather than on the first request
+        for future in [self.pool.submit(os.getpid) for _ in range(self.jobs)]:
+            future.result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.shared is not None:
+            self.shared.close()
+        if self.root is not None:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    async def render(self, name, fmt, dpi):
+        """Image bytes from the cache, an in-flight render, or a new render"""
+        key = (name, fmt, dpi)
+        body = self.cache.get(key)
+        if body is not None:
+            return body
+        future = self.inflight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+        else:
+            if len(self.inflight) >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise Busy(f"{len(self.inflight)} renders in flight")
+            start = time.perf_counter()
+            future = asyncio.get_running_loop().run_in_executor(self.pool, _render, name, fmt, dpi)
+            self.inflight[key] = future
+
+            def done(f):
+                self.inflight.pop(key, None)
+                if not f.cancelled() and f.exception() is None:
+                    self.cache.put(key, f.result())
+                    self.stats['renders'] += 1
+                    self.stats['render_seconds'] += time.perf_counter() - start
+            future.add_done_callback(done)
+        # shield: a client hanging up must not cancel a render others wait for
+        return await asyncio.shield(future)
+
+    async def respond(self, method, target):
+        """(status, format, body) for one request"""
+        if method not in ('GET', 'HEAD'):
+            return 405, 'json', {'error': f"method {method} not allowed"}
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip('/') or '/'
+        query = {k: ','.join(v).split(',') for k, v in parse_qs(url.query).items()}
+
+        if path == '/health':
+            return 200, 'json', {'rows': self.rows, 'workers': self.jobs,
+                                 'inflight': len(self.inflight), **self.stats,
+                                 'cache': self.cache.stats()}
+        if path == '/figures':
+            return 200, 'json', {'figures': list(figures.FIGURES), 'formats': list(RENDER_FORMATS)}
+        if path.startswith('/figures/'):
+            name, _, fmt = path[len('/figures/'):].rpartition('.')
+            if name not in figures.FIGURES or fmt not in RENDER_FORMATS:
+                return 404, 'json', {'error': f"no figure {path[len('/figures/'):]!r}"}
+            try:
+                dpi = int(query.get('dpi', [DEFAULT_DPI])[0])
+            except ValueError:
+                return 400, 'json', {'error': 'dpi must be an integer'}
+            if not DPI_RANGE[0] <= dpi <= DPI_RANGE[1]:
+                return 400, 'json', {'error': f"dpi must be within {DPI_RANGE[0]}-{DPI_RANGE[1]}"}
+            try:
+                return 200, fmt, await self.render(name, fmt, dpi)
+            except Busy as exc:
+                return 503, 'json', {'error': f"busy: {exc}"}
+        if path == '/counts':
+            by = [ALIASES.get(d, d) for d in query.pop('by', []) if d]
+            filters = {ALIASES.get(k, k): v for k, v in query.items()}
+            try:
+                return 200, 'json', query_counts(self.counts, by, filters)
+            except ValueError as exc:
+                return 400, 'json', {'error': str(exc)}
+        return 404, 'json', {'error': f"no endpoint {path!r}"}
+
+    async def handle(self, reader, writer):
+        """One client connection (HTTP/1.1 keep-alive)"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self._send(writer, 'GET', 400, 'json', {'error': 'bad request line'}, False)
+                    break
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = header.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                if headers.get('content-length'):
+                    await reader.readexactly(int(headers['content-length']))
+                self.stats['requests'] += 1
+                try:
+                    status, fmt, body = await self.respond(method, target)
+                except Exception as exc:  # a failed render must not take the service down
+                    status, fmt, body = 500, 'json', {'error': f"{type(exc).__name__}: {exc}"}
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._send(writer, method, status, fmt, body, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            # Wait for the transport to close, so none is left half-closed
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    @staticmethod
+    async def _send(writer, method, status, fmt, body, keep_alive):
+        if fmt == 'json':
+            body = (json.dumps(body) + '\n').encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {CONTENT_TYPES[fmt]}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + (b'' if method == 'HEAD' else body))
+        await writer.drain()
+
+
+async def serve(service, host='127.0.0.1', port=8765):
+    """Serve until SIGINT/SIGTERM"""
+    server = await asyncio.start_server(service.handle, host, port)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"✓ Serving {service.rows} cases on http://{host}:{port} "
+          f"({service.jobs} render workers)", flush=True)
+    async with server:
+        await stop.wait()
+    print(f"✓ Stopped after {service.stats['requests']} requests, {service.stats['renders']} renders")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve figures and case counts over HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port (default: 8765)')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('-j', '--jobs', type=int, default=2,
+                        help='render worker processes (0 = one per CPU; default: 2)')
+    parser.add_argument('--max-pending', type=int, default=32,
+                        help='distinct renders in flight before answering 503 (default: 32)')
+    parser.add_argument('--cache-mb', type=int, default=64,
+                        help='size bound of the rendered-image cache (default: 64)')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='serve even if the dataset fails the codebook checks')
+    args = parser.parse_args()
+
+    import validation
+    df = figures.load_data(args.data or figures.DATASETS)
+    if not args.skip_validation:
+        try:
+            figures.report_validation(validation.validate(df, 'dataset'))
+        except validation.ValidationError:
+            sys.exit("✗ Dataset fails the codebook checks (--skip-validation overrides)")
+    service = QueryService(df, args.jobs or os.cpu_count() or 1, args.max_pending,
+                           args.cache_mb << 20)
+    service.start()
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Bootstrap, permutation and sensitivity analysis for CRISIS vs CONTROL contrasts
+
+Implements the resampling side of section 6.5 of
+data_extended/PSM_feasibility_note.md:
+  - bootstrap confidence intervals for the difference in means
+  - permutation p-values for the same statistic
+  - Rosenbaum bounds for matched pairs (Wilcoxon signed-rank)
+
+Replicates are drawn in batches as (batch x n) index matrices and spread
+over a process pool. Every batch has its own child SeedSequence, spawned
+from one root seed, so results are identical for any number of workers and
+never touch the global np.random state. Workers read the samples from
+shared memory (shared_table.py) instead of each holding a copy. Batch
+results are folded into running aggregates as they arrive; with a
+checkpoint (see checkpoint.py) the aggregates and the set of finished
+batches are saved periodically, and an interrupted run resumes with only
+the missing batches; the checkpoint is cleared once the run completes.
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+KINDS = ('bootstrap', 'permutation')
+
+# Specifications shared with worker processes by the pool initializer
+_specs = {}
+
+
+def _init_worker(specs):
+    global _specs
+    _specs = specs
+
+
+def _attach_worker(handle, names):
+    """Pool initializer: the specifications as views of shared memory"""
+    from shared_table import attach
+    views = attach(handle)
+    _init_worker({name: (views[f'{name}.x'], views[f'{name}.y']) for name in names})
+
+
+def _mean_diff(x, y):
+    return x.mean(axis=-1) - y.mean(axis=-1)
+
+
+def _run_batch(kind, name, batch, seed, size):
+    """Draw `size` replicates of one specification; returns (name, batch, stats)"""
+    x, y = _specs[name]
+    rng = np.random.default_rng(seed)
+    if kind == 'bootstrap':
+        xs = x[rng.integers(0, len(x), size=(size, len(x)))]
+        ys = y[rng.integers(0, len(y), size=(size, len(y)))]
+    else:
+        pooled = np.concatenate([x, y])
+        # argsort of uniform keys gives one independent permutation per row
+        perm = np.argsort(rng.random((size, len(pooled))), axis=1)
+        shuffled = pooled[perm]
+        xs, ys = shuffled[:, :len(x)], shuffled[:, len(x):]
+    return name, batch, _mean_diff(xs, ys)
+
+
+class RunningStats:
+    """Streaming count/mean/variance (Chan et al. merge) plus kept replicates"""
+
+    def __init__(self, n_replicates):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.values = np.full(n_replicates, np.nan)
+
+    def add(self, offset, values):
+        n_b = len(values)
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        delta = mean_b - self.mean
+        total = self.n + n_b
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta ** 2 * self.n * n_b / total
+        self.n = total
+        self.values[offset:offset + n_b] = values
+
+    @property
+    def sd(self):
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+
+def resample(specs, kind='bootstrap', n_replicates=10000, batch_size=1000,
+             seed=42, jobs=1, checkpoint=None):
+    """
+    Run `n_replicates` bootstrap or permutation replicates of the mean
+    difference x - y for every specification {name: (x, y)}.
+    Returns {name: RunningStats}. With a checkpoint.Checkpoint, progress
+    is saved as batches finish and restored on the next call, and cleared
+    once all batches are done.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+    specs = {name: (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+             for name, (x, y) in specs.items()}
+    n_batches = -(-n_replicates // batch_size)
+    sizes = [min(batch_size, n_replicates - b * batch_size) for b in range(n_batches)]
+
+    root = np.random.SeedSequence(seed)
+    tasks = []
+    for name, child in zip(specs, root.spawn(len(specs))):
+        for batch, batch_seed in enumerate(child.spawn(n_batches)):
+            tasks.append((kind, name, batch, batch_seed, sizes[batch]))
+
+    results = {name: RunningStats(n_replicates) for name in specs}
+    done = {name: np.zeros(n_batches, dtype=bool) for name in specs}
+    if checkpoint is not None:
+        meta, arrays = checkpoint.load()
+        if meta is not None:
+            for name, rs in results.items():
+                rs.n, rs.mean, rs.m2 = meta['stats'][name]
+                rs.values = arrays[f'{name}.values']
+                done[name] = arrays[f'{name}.done']
+            tasks = [t for t in tasks if not done[t[1]][t[2]]]
+
+    def save():
+        checkpoint.save(
+            {'stats': {name: [rs.n, rs.mean, rs.m2] for name, rs in results.items()},
+             'progress': f"{sum(int(d.sum()) for d in done.values())}/{n_batches * len(specs)} batches"},
+            **{f'{name}.values': rs.values for name, rs in results.items()},
+            **{f'{name}.done': d for name, d in done.items()})
+
+    def collect(name, batch, values):
+        results[name].add(batch * batch_size, values)
+        done[name][batch] = True
+        if checkpoint is not None and checkpoint.due():
+            save()
+
+    if jobs <= 1:
+        _init_worker(specs)
+        for task in tasks:
+            collect(*_run_batch(*task))
+    else:
+        from shared_table import SharedArrays
+        arrays = {f'{name}.{side}': v for name, xy in specs.items() for side, v in zip('xy', xy)}
+        with SharedArrays(arrays) as shared, \
+                ProcessPoolExecutor(max_workers=jobs, initializer=_attach_worker,
+                                    initargs=(shared.handle, list(specs))) as pool:
+            for future in as_completed([pool.submit(_run_batch, *t) for t in tasks]):
+                collect(*future.result())
+    if checkpoint is not None:
+        checkpoint.clear()
+    return results
+
+
+def bootstrap_ci(x, y, n_replicates=10000, level=0.95, **kwargs):
+    """Percentile bootstrap CI for mean(x) - mean(y); returns (estimate, lo, hi, se)"""
+    rs = resample({'diff': (x, y)}, 'bootstrap', n_replicates, **kwargs)['diff']
+    alpha = (1.0 - level) / 2.0
+    lo, hi = np.quantile(rs.values, [alpha, 1.0 - alpha])
+    return float(np.mean(x) - np.mean(y)), float(lo), float(hi), float(rs.sd)
+
+
+def permutation_pvalue(x, y, n_replicates=10000, **kwargs):
+    """Two-sided permutation p-value for mean(x) - mean(y)"""
+    rs = resample({'diff': (x, y)}, 'permutation', n_replicates, **kwargs)['diff']
+    observed = abs(np.mean(x) - np.mean(y))
+    extreme = np.count_nonzero(np.abs(rs.values) >= observed - 1e-12)
+    return float((extreme + 1) / (n_replicates + 1))
+
+
+def rosenbaum_bounds(treated, control, gammas=(1.0, 1.5, 2.0, 2.5, 3.0)):
+    """
+    Rosenbaum bounds for matched-pair outcomes (Wilcoxon signed-rank,
+    normal approximation). For each Gamma, returns the range of one-sided
+    p-values compatible with hidden bias of that magnitude.
+    """
+    d = np.asarray(treated, dtype=float) - np.asarray(control, dtype=float)
+    d = d[d != 0]
+    n = len(d)
+    ranks = stats.rankdata(np.abs(d))
+    t_plus = ranks[d > 0].sum()
+
+    gammas = np.asarray(gammas, dtype=float)
+    p_hi = gammas / (1.0 + gammas)
+    p_lo = 1.0 / (1.0 + gammas)
+    s1 = n * (n + 1) / 2.0
+    s2 = n * (n + 1) * (2 * n + 1) / 6.0
+    z_hi = (t_plus - p_hi * s1) / np.sqrt(p_hi * (1 - p_hi) * s2)
+    z_lo = (t_plus - p_lo * s1) / np.sqrt(p_lo * (1 - p_lo) * s2)
+    return pd.DataFrame({
+        'gamma': gammas,
+        'p_lower': stats.norm.sf(z_lo),
+        'p_upper': stats.norm.sf(z_hi),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bootstrap/permutation analysis of the Figure 6 contrast')
+    parser.add_argument('-n', '--replicates', type=int, default=10000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='worker processes (0 = one per CPU; default: 1)')
+    parser.add_argument('--checkpoint', action='store_true',
+                        help='save progress periodically and resume an interrupted run')
+    parser.add_argument('--checkpoint-every', type=float, default=30.0, metavar='SECONDS',
+                        help='seconds between checkpoint saves (default: 30)')
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count() or 1
+
+    from generate_paper_figures import phenotypic_expression_scores
+    crisis, control = phenotypic_expression_scores()
+    kwargs = dict(batch_size=args.batch_size, seed=args.seed, jobs=jobs)
+
+    def checkpoint(kind):
+        if not args.checkpoint:
+            return None
+        from checkpoint import Checkpoint, digest
+        return Checkpoint(f'resampling-{kind}', {
+            'replicates': args.replicates, 'batch_size': args.batch_size, 'seed': args.seed,
+            'data': digest(crisis, control)}, every=args.checkpoint_every)
+
+    est, lo, hi, se = bootstrap_ci(crisis, control, args.replicates,
+                                   checkpoint=checkpoint('bootstrap'), **kwargs)
+    p_perm = permutation_pvalue(crisis, control, args.replicates,
+                                checkpoint=checkpoint('permutation'), **kwargs)
+    t_stat, p_t = stats.ttest_ind(crisis, control)
+
+    print("CRISIS - CONTROL phenotypic expression (Figure 6 scores)")
+    print(f"  difference in means : {est:.3f}")
+    print(f"  bootstrap 95% CI    : [{lo:.3f}, {hi:.3f}]  (SE {se:.3f}, {args.replicates} replicates)")
+    print(f"  permutation p-value : {p_perm:.5f}")
+    print(f"  t-test (Figure 6)   : t={t_stat:.2f}, p={p_t:.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Zero-copy handoff of the case table (or any arrays) to worker processes
+
+Pickling the loaded DataFrame to every worker copies it once per process.
+Instead, the parent publishes it once into a single
+multiprocessing.shared_memory segment, using the column encoding of the
+binary sidecar (case_data.py):
+  - numeric columns are stored as they are
+  - categoricals are stored as integer codes; their labels go in the handle
+  - free text is dictionary-encoded, with the labels as one UTF-8 buffer
+Workers receive only the small picklable handle. They attach read-only
+NumPy views of the segment, so worker memory stays flat as the process
+count grows. Only text columns, and only if asked for, are decoded into
+per-process Python strings.
+
+    with SharedArrays.from_frame(df) as shared:           # parent
+        ProcessPoolExecutor(initializer=init, initargs=(shared.handle,))
+    df = attach_frame(handle, columns)                    # worker (init)
+
+The parent owns the segment: it is unlinked when the SharedArrays is
+closed, after the pool has shut down.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Byte alignment of every array in the segment
+ALIGN = 64
+
+# Segments attached by this process, kept open for as long as views exist
+_attached = {}
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)
+
+
+def _encode_frame(df):
+    """Arrays and meta for df, in the sidecar's encoding (see module docstring)"""
+    from case_data import _codes_dtype
+    arrays, kinds, labels = {}, {}, {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            kinds[col] = 'category'
+            labels[col] = series.cat.categories.tolist()
+            arrays[col] = series.cat.codes.to_numpy()
+        elif _is_text(series):
+            kinds[col] = 'text'
+            codes, uniques = pd.factorize(series)
+            encoded = [str(v).encode() for v in uniques]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+            arrays[col] = codes.astype(_codes_dtype(len(encoded)))
+            arrays[f'{col}.labels'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            arrays[f'{col}.offsets'] = offsets
+        else:
+            kinds[col] = 'array'
+            arrays[col] = series.to_numpy()
+    return arrays, {'columns': list(df.columns), 'kinds': kinds, 'labels': labels}
+
+
+class SharedArrays:
+    """
+    Named arrays copied once into one shared-memory segment (owner side).
+    handle is what workers need to attach(); close() releases and unlinks
+    the segment.
+    """
+
+    def __init__(self, arrays, meta=None):
+        fields, size = {}, 0
+        for key, a in arrays.items():
+            a = np.asarray(a)
+            if a.dtype.hasobject:
+                raise TypeError(f"{key}: object arrays cannot be shared, encode them first")
+            size = -(-size // ALIGN) * ALIGN
+            fields[key] = (a.dtype.str, a.shape, size)
+            size += a.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for key, a in arrays.items():
+            dtype, shape, offset = fields[key]
+            np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)[...] = a
+        self.handle = {'name': self.shm.name, 'fields': fields, 'meta': meta or {}}
+        self.nbytes = size
+
+    @classmethod
+    def from_frame(cls, df):
+        """Publish a case table; workers read it back with attach_frame()"""
+        arrays, meta = _encode_frame(df)
+        return cls(arrays, dict(meta, frame=True))
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach(handle):
+    """Read-only views of the published arrays, as {key: ndarray}"""
+    shm = _attached.get(handle['name'])
+    if shm is None:
+        shm = _attached[handle['name']] = shared_memory.SharedMemory(handle['name'])
+    views = {}
+    for key, (dtype, shape, offset) in handle['fields'].items():
+        view = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+        view.flags.writeable = False
+        views[key] = view
+    return views
+
+
+def _decode_text(views, col):
+    blob = views[f'{col}.labels'].tobytes()
+    offsets = views[f'{col}.offsets']
+    labels = [blob[a:b].decode() for a, b in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+    # code -1 (missing) reads the trailing None
+    return np.array(labels + [None], dtype=object)[views[col]]
+
+
+def attach_frame(handle, columns=None):
+    """
+    The published table as a DataFrame. Numeric and categorical columns
+    are zero-copy views of the shared segment; text columns are decoded
+    into this process, so leave them out of `columns` if not needed.
+    """
+    meta = handle['meta']
+    if not meta.get('frame'):
+        raise ValueError("handle was not published with SharedArrays.from_frame()")
+    views = attach(handle)
+    data = {}
+    for col in columns or meta['columns']:
+        kind = meta['kinds'][col]
+        if kind == 'category':
+            data[col] = pd.Series(pd.Categorical.from_codes(views[col], meta['labels'][col]),
+                                  copy=False)
+        elif kind == 'text':
+            data[col] = pd.Series(_decode_text(views, col), dtype=object)
+        else:
+            data[col] = views[col]
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Case-similarity search: "which cases are most like Botnia?"
+
+Cases are compared on the PSM covariates (data_extended/PSM_feasibility_note.md):
+categorical fields count a weighted mismatch when they differ, numeric
+fields count |difference| / scale, so with the defaults one category
+mismatch weighs as much as five years:
+
+    d(a, b) = sum_f w_f [a_f != b_f]  +  sum_x |a_x - b_x| / scale_x
+
+Every field is encoded once as a compact numeric column (categories as
+int8/int16 codes, numbers as float32), and cases with identical encodings
+are collapsed into one profile: with categorical covariates a large
+corpus has far fewer distinct profiles than cases, and all searching is
+done over profiles. Queries return the top-k neighbouring cases,
+optionally restricted to cases that share some fields with the query
+(same=('International_Tribunal',)) and lie within +/- `years` of it;
+a field with weight 0 can be filtered on without counting towards the
+distance. Two search paths give the same answer format:
+  exact  blocks of queries against every profile, fully vectorized;
+         used up to EXACT_MAX_PROFILES profiles
+  lsh    locality-sensitive hashing for more (e.g. once continuous
+         Phase 2 covariates make most profiles distinct): each hash table
+         keys profiles on a random subset of fields_per_table of their
+         categorical fields (all of them with None) plus randomly shifted
+         buckets, one scale wide, of the numeric ones; a query probes its
+         own bucket and `probes` buckets either side, so similar profiles
+         collide in at least one table; only colliding profiles are
+         ranked. Queries with fewer than k colliding cases that pass
+         the filters fall back to the exact path.
+Ties are broken by corpus position, so both paths agree whenever the
+candidates contain the true neighbours.
+"""
+
+import argparse
+import itertools
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+import validation
+
+DEFAULT_FIELDS = {'Legal_Family': 1.0, 'Geographic_Region': 1.0, 'Conflict_Type': 1.0,
+                  'International_Tribunal': 1.0}
+DEFAULT_NUMERIC = {'Year': 5.0}
+
+# Above this many distinct profiles 'auto' switches from the exact path to LSH
+EXACT_MAX_PROFILES = 50_000
+# Query x profile distances held at once by the exact path
+BLOCK_CELLS = 1 << 23
+
+
+def _codes(series):
+    """Compact category codes of a column (-1 marks missing)"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+    else:
+        codes = pd.factorize(series)[0]
+    n = int(codes.max()) + 1 if len(codes) else 0
+    return codes.astype(case_data._codes_dtype(n))
+
+
+def _ranges(starts, sizes):
+    """Concatenated np.arange(s, s + n) for every (s, n)"""
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.repeat(starts, sizes) + offsets
+
+
+class SimilarityIndex:
+    """
+    Nearest-neighbour index over a case table. fields maps categorical
+    columns to mismatch weights, numeric maps numeric columns to the
+    difference that counts as one unit of distance.
+    """
+
+    def __init__(self, df, fields=DEFAULT_FIELDS, numeric=DEFAULT_NUMERIC, method='auto',
+                 tables=16, fields_per_table=1, probes=1, seed=0):
+        self.df = df
+        self.fields = dict(fields)
+        self.numeric = dict(numeric)
+        self.n = len(df)
+        codes = {c: _codes(df[c]) for c in self.fields}
+        values = {c: df[c].to_numpy(dtype=np.float32) for c in self.numeric}
+        self._build_profiles(codes, values)
+        if method == 'auto':
+            method = 'exact' if len(self.counts) <= EXACT_MAX_PROFILES else 'lsh'
+        if method not in ('exact', 'lsh'):
+            raise ValueError(f"unknown search method {method!r}; expected 'auto', 'exact' or 'lsh'")
+        self.method = method
+        self.probes = probes
+        self.tables = []
+        if method == 'lsh':
+            self._build_tables(tables, fields_per_table, seed)
+
+    # Encoding
+
+    def _build_profiles(self, codes, values):
+        """
+        Group cases with identical encodings. members lists case positions
+        grouped by profile (ascending within each), starts/counts delimit
+        the groups and profile maps every case to its group.
+        """
+        columns = [codes[c].astype(np.int64) for c in self.fields] + \
+                  [values[c].view(np.int32).astype(np.int64) for c in self.numeric]
+        order = np.lexsort(columns[::-1]) if columns else np.arange(self.n)
+        new = np.ones(self.n, dtype=bool)
+        if columns:
+            new[1:] = np.any([col[order][1:] != col[order][:-1] for col in columns], axis=0)
+        self.members = order
+        self.starts = np.flatnonzero(new)
+        self.counts = np.diff(np.append(self.starts, self.n))
+        self.profile = np.empty(self.n, dtype=np.int64)
+        self.profile[order] = np.cumsum(new) - 1
+        first = order[self.starts]
+        self.codes = {c: codes[c][first] for c in self.fields}
+        self.values = {c: values[c][first] for c in self.numeric}
+
+    def distances(self, a, b=None):
+        """
+        Distances between profiles: a x all profiles (a len(a) x P matrix),
+        or a[i] to b[i] when b is given (matching shapes).
+        """
+        a = np.asarray(a)
+        pair = b is not None
+        if not pair:
+            a = a[:, None]
+        d = np.zeros(np.broadcast_shapes(a.shape, np.shape(b) if pair else (1, len(self.counts))),
+                     dtype=np.float32)
+        for col, w in self.fields.items():
+            if w:
+                c = self.codes[col]
+                d += np.float32(w) * (c[a] != (c[b] if pair else c[None, :]))
+        for col, scale in self.numeric.items():
+            v = self.values[col]
+            d += np.abs(v[a] - (v[b] if pair else v[None, :])) / np.float32(scale)
+        return d
+
+    def _allowed(self, a, b, same, years):
+        """Filter mask between profiles, shaped like distances(a, b)"""
+        pair = b is not None
+        a = np.asarray(a) if pair else np.asarray(a)[:, None]
+        ok = np.ones(np.broadcast_shapes(a.shape, np.shape(b) if pair else (1, len(self.counts))),
+                     dtype=bool)
+        for col in same:
+            if col not in self.codes:
+                raise ValueError(f"cannot filter on {col!r}: not an index field "
+                                 f"(add it to fields, with weight 0 to only filter)")
+            c = self.codes[col]
+            ok &= c[a] == (c[b] if pair else c[None, :])
+        if years is not None:
+            if 'Year' not in self.values:
+                raise ValueError("filtering on years needs 'Year' among the numeric fields")
+            y = self.values['Year']
+            ok &= np.abs(y[a] - (y[b] if pair else y[None, :])) <= years
+        return ok
+
+    def _expand(self, rows, q, prof, d, k, exclude_self):
+        """
+        Top-k cases per query from candidate (query number, profile,
+        distance) triples: at most k + 1 cases of a profile can matter (its
+        lowest positions, one of which may be the query itself).
+        """
+        idx = np.full((len(rows), k), -1, dtype=np.int64)
+        dist = np.full((len(rows), k), np.inf, dtype=np.float32)
+        take = np.minimum(self.counts[prof], k + 1)
+        q, d = np.repeat(q, take), np.repeat(d, take)
+        pos = self.members[_ranges(self.starts[prof], take)]
+        if exclude_self:
+            keep = pos != rows[q]
+            q, d, pos = q[keep], d[keep], pos[keep]
+        order = np.lexsort((pos, d, q))
+        q, d, pos = q[order], d[order], pos[order]
+        rank = np.arange(len(q)) - np.searchsorted(q, q)
+        top = rank < k
+        idx[q[top], rank[top]] = pos[top]
+        dist[q[top], rank[top]] = d[top]
+        return idx, dist
+
+    # Exact path
+
+    def _exact(self, rows, k, same, years, exclude_self):
+        idx = np.full((len(rows), k), -1, dtype=np.int64)
+        dist = np.full((len(rows), k), np.inf, dtype=np.float32)
+        n_profiles = len(self.counts)
+        block = max(1, BLOCK_CELLS // n_profiles)
+        for start in range(0, len(rows), block):
+            r = rows[start:start + block]
+            a = self.profile[r]
+            d = self.distances(a)
+            d[~self._allowed(a, None, same, years)] = np.inf
+            # The top k cases lie in profiles no farther than the (k+1)-th
+            # nearest profile (each holds at least one case, the query one)
+            kk = min(k, n_profiles - 1)
+            bound = np.partition(d, kk, axis=1)[:, kk:kk + 1]
+            q, prof = np.nonzero((d <= bound) & np.isfinite(d))
+            idx[start:start + len(r)], dist[start:start + len(r)] = \
+                self._expand(r, q, prof, d[q, prof], k, exclude_self)
+        return idx, dist
+
+    # LSH path
+
+    def _build_tables(self, n_tables, fields_per_table, seed):
+        rng = np.random.default_rng(seed)
+        cat = [c for c, w in self.fields.items() if w]
+        g = min(fields_per_table or len(cat), len(cat))
+        profiles = np.arange(len(self.counts))
+        for _ in range(n_tables):
+            fields = [cat[i] for i in sorted(rng.choice(len(cat), g, replace=False))]
+            shifts = {c: float(rng.uniform(0, s)) for c, s in self.numeric.items()}
+            keys = self._keys(profiles, fields, shifts)
+            order = np.argsort(keys, kind='stable')
+            self.tables.append((fields, shifts, keys[order], order))
+
+    def _keys(self, profiles, fields, shifts, steps=None):
+        """
+        Bucket key per profile: mixed-radix code of its fields and numeric
+        buckets, each numeric bucket moved by the matching entry of steps
+        (-1 where that leaves the range, a key no profile has)
+        """
+        key = np.zeros(len(profiles), dtype=np.int64)
+        outside = np.zeros(len(profiles), dtype=bool)
+        for col in fields:
+            c = self.codes[col]
+            key = key * (int(c.max()) + 2) + (c[profiles].astype(np.int64) + 1)
+        for (col, shift), step in zip(shifts.items(), steps or itertools.repeat(0)):
+            v = self.values[col]
+            lo = np.floor((np.nanmin(v) - shift) / self.numeric[col])
+            hi = np.floor((np.nanmax(v) - shift) / self.numeric[col])
+            b = np.floor((v[profiles] - shift) / self.numeric[col]) - lo + step
+            outside |= (b < 0) | (b > hi - lo)
+            key = key * int(hi - lo + 1) + b.astype(np.int64)
+        key[outside] = -1
+        return key
+
+    def _candidates(self, a):
+        """(query number, profile) pairs colliding in any table or probed bucket, deduplicated"""
+        qs, ps = [], []
+        for fields, shifts, sorted_keys, order in self.tables:
+            for steps in itertools.product(range(-self.probes, self.probes + 1), repeat=len(shifts)):
+                keys = self._keys(a, fields, shifts, steps)
+                lo = np.searchsorted(sorted_keys, keys, 'left')
+                sizes = np.searchsorted(sorted_keys, keys, 'right') - lo
+                qs.append(np.repeat(np.arange(len(a)), sizes))
+                ps.append(order[_ranges(lo, sizes)])
+        n_profiles = np.int64(len(self.counts))
+        pairs = np.sort(np.concatenate(qs) * n_profiles + np.concatenate(ps))
+        pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+        return pairs // n_profiles, pairs % n_profiles
+
+    def _lsh(self, rows, k, same, years, exclude_self, block=1024):
+        idx = np.full((len(rows), k), -1, dtype=np.int64)
+        dist = np.full((len(rows), k), np.inf, dtype=np.float32)
+        for start in range(0, len(rows), block):
+            r = rows[start:start + block]
+            a = self.profile[r]
+            q, prof = self._candidates(a)
+            keep = self._allowed(a[q], prof, same, years)
+            q, prof = q[keep], prof[keep]
+            idx[start:start + len(r)], dist[start:start + len(r)] = \
+                self._expand(r, q, prof, self.distances(a[q], prof), k, exclude_self)
+        short = np.flatnonzero((idx < 0).any(axis=1))
+        if len(short):
+            idx[short], dist[short] = self._exact(rows[short], k, same, years, exclude_self)
+        return idx, dist
+
+    # Queries
+
+    def query(self, rows, k=10, same=(), years=None, exclude_self=True):
+        """
+        Top-k neighbours of the cases at positions rows. Returns (idx, dist),
+        both len(rows) x k, nearest first; slots without a neighbour that
+        passes the filters hold -1 and inf.
+        """
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        search = self._lsh if self.method == 'lsh' else self._exact
+        return search(rows, k, tuple(same), years, exclude_self)
+
+    def positions(self, case_ids):
+        """Corpus positions of Case_IDs (KeyError for unknown IDs)"""
+        pos = pd.Index(self.df['Case_ID']).get_indexer(case_ids)
+        if (pos < 0).any():
+            raise KeyError(f"unknown Case_ID(s): {list(np.asarray(case_ids)[pos < 0])}")
+        return pos
+
+    def neighbors(self, case_id, k=10, same=(), years=None):
+        """The k cases most similar to case_id, as rows of the case table plus Distance"""
+        idx, dist = self.query(self.positions([case_id]), k, same, years)
+        found = idx[0] >= 0
+        out = self.df.iloc[idx[0][found]].reset_index(drop=True)
+        out.insert(0, 'Distance', dist[0][found])
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the cases most similar to a given case')
+    parser.add_argument('case_id', nargs='+', help='Case_ID(s) to query, e.g. CRISIS_021')
+    parser.add_argument('-k', type=int, default=10, help='neighbours per case (default: 10)')
+    parser.add_argument('--same', nargs='+', default=[], metavar='COLUMN',
+                        help='only cases sharing these fields, e.g. International_Tribunal')
+    parser.add_argument('--years', type=int, help='only cases within +/- this many years')
+    parser.add_argument('--method', choices=['auto', 'exact', 'lsh'], default='auto',
+                        help=f'search path (default: exact up to {EXACT_MAX_PROFILES:,} profiles, then lsh)')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    args = parser.parse_args()
+
+    frames = [case_data.load_cases(p) for p in case_data.expand_paths(args.data or [case_data.DEFAULT_CSV])]
+    df = frames[0] if len(frames) == 1 else case_data.apply_schema(pd.concat(frames, ignore_index=True))
+    report = validation.validate(df, 'dataset')
+    if not report.ok:
+        sys.exit(report.summary())
+    index = SimilarityIndex(df, method=args.method)
+    columns = ['Distance', 'Case_ID', 'Country', 'Year', 'Event_Name', 'Conflict_Type',
+               'International_Tribunal']
+    for case_id in args.case_id:
+        case = df.iloc[index.positions([case_id])[0]]
+        print(f"\n{case_id}: {case['Event_Name']} ({case['Country']}, {case['Year']}) "
+              f"- {index.method} search")
+        print(index.neighbors(case_id, args.k, args.same, args.years)[columns]
+              .round(3).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Schema-conformant synthetic case tables and citation graphs for benchmarks
+
+Synthetic cases follow data/DATA_CODEBOOK.md column for column and draw
+every categorical value from the vocabularies of the real dataset, with its
+empirical frequencies:
+  - country profiles (Country, Geographic_Region, Legal_Family) jointly, so
+    a country never changes region or legal family
+  - Conflict_Type and International_Tribunal from their marginals
+  - Year uniformly over the observed range, Crisis_Catalyzed 50/50
+Case_IDs are numbered per group (CRISIS_001, CONTROL_001, ...). Rows are
+generated in fixed-size chunks, each with its own child SeedSequence, so a
+table of any size is reproducible from one seed and is written to CSV
+without holding it in memory.
+
+Nothing generated here is data; it exists only to time the pipeline.
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+import citation_network
+
+SYNTHETIC_DIR = Path('../data') / '.cache' / 'synthetic'
+CHUNK_ROWS = 1_000_000
+
+PROFILE_COLUMNS = ['Country', 'Geographic_Region', 'Legal_Family']
+
+
+class Vocabulary:
+    """Category values and their frequencies in a real case table"""
+
+    def __init__(self, df):
+        profiles = df.groupby(PROFILE_COLUMNS, observed=True, sort=False).size()
+        self.profiles = profiles.index.to_frame(index=False)
+        self.profile_p = (profiles / profiles.sum()).to_numpy()
+        self.marginals = {}
+        for col in ('Conflict_Type', 'International_Tribunal', 'Verified_Status'):
+            freq = df[col].value_counts(sort=False)
+            freq = freq[freq > 0]
+            self.marginals[col] = (freq.index.to_numpy(dtype=object),
+                                   (freq / freq.sum()).to_numpy())
+        self.years = int(df['Year'].min()), int(df['Year'].max())
+
+    @classmethod
+    def from_csv(cls, csv_path=case_data.DEFAULT_CSV):
+        return cls(case_data.parse_csv(csv_path))
+
+
+def _chunk(vocab, rng, start, n_rows):
+    """n_rows synthetic cases; start is the global row number of the first"""
+    crisis = (rng.random(n_rows) < 0.5).astype(np.int8)
+    profile = vocab.profiles.iloc[rng.choice(len(vocab.profiles), n_rows, p=vocab.profile_p)]
+    rows = np.arange(start, start + n_rows)
+    df = pd.DataFrame({
+        'Case_ID': None,
+        'Country': profile['Country'].to_numpy(),
+        'Year': rng.integers(vocab.years[0], vocab.years[1] + 1, n_rows).astype(np.int16),
+        'Crisis_Catalyzed': crisis,
+        'Event_Name': 'Synthetic case ' + pd.Series(rows).astype(str),
+        'Geographic_Region': profile['Geographic_Region'].to_numpy(),
+        'Legal_Family': profile['Legal_Family'].to_numpy(),
+    })
+    for col, (values, p) in vocab.marginals.items():
+        df[col] = values[rng.choice(len(values), n_rows, p=p)]
+    df['Primary_Sources'] = 'Synthetic (benchmark only)'
+    return df[list(case_data.SCHEMA)]
+
+
+def _number_cases(df, offsets):
+    """Fill Case_ID with per-group running numbers continuing from offsets"""
+    crisis = df['Crisis_Catalyzed'].to_numpy() == 1
+    number = np.where(crisis, np.cumsum(crisis) + offsets[1], np.cumsum(~crisis) + offsets[0])
+    prefix = np.where(crisis, 'CRISIS_', 'CONTROL_').astype(object)
+    df['Case_ID'] = prefix + pd.Series(number).astype(str).str.zfill(3).to_numpy(dtype=object)
+    return offsets[0] + int((~crisis).sum()), offsets[1] + int(crisis.sum())
+
+
+def iter_cases(n_rows, seed=0, vocab=None, chunk_rows=CHUNK_ROWS):
+    """Yield the synthetic table in chunks of at most chunk_rows rows"""
+    vocab = vocab or Vocabulary.from_csv()
+    n_chunks = max(1, -(-n_rows // chunk_rows))
+    offsets = (0, 0)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        start = i * chunk_rows
+        df = _chunk(vocab, np.random.default_rng(child), start, min(chunk_rows, n_rows - start))
+        offsets = _number_cases(df, offsets)
+        yield df
+
+
+def generate(n_rows, seed=0, vocab=None):
+    """Synthetic case table with the dtypes parse_csv() gives the real one"""
+    df = pd.concat(iter_cases(n_rows, seed, vocab), ignore_index=True)
+    df = df.astype({c: object for c in case_data.TEXT_COLUMNS})
+    return case_data.apply_schema(df)
+
+
+def write_csv(n_rows, seed=0, directory=SYNTHETIC_DIR, vocab=None):
+    """
+    Write (once) and return the path of the n_rows table for seed. Existing
+    files are reused, since the content is a pure function of (n_rows, seed).
+    """
+    path = Path(directory) / f'cases_{n_rows}_seed{seed}.csv'
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    for i, df in enumerate(iter_cases(n_rows, seed, vocab)):
+        df.to_csv(tmp, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    tmp.replace(path)
+    return path
+
+
+def citation_graph(n_nodes, mean_degree=3, seed=0, forum_levels=None):
+    """
+    Random citation graph in time order: every case cites up to mean_degree
+    earlier cases, with a bias towards the oldest ones (which therefore
+    become hubs, as landmark precedents do).
+    """
+    rng = np.random.default_rng(seed)
+    if forum_levels is None:
+        nodes = pd.read_csv(citation_network.NODES_CSV, dtype=str, keep_default_na=False)
+        forum_levels = nodes['Forum_Level'].unique()
+    ids = pd.Series(np.arange(n_nodes)).astype(str).radd('CASE_').to_numpy(dtype=object)
+    nodes = pd.DataFrame({
+        'Node_ID': ids,
+        'Label': ids,
+        'Forum_Level': np.asarray(forum_levels, dtype=object)[rng.integers(0, len(forum_levels), n_nodes)],
+    })
+    citing = np.repeat(np.arange(1, n_nodes), mean_degree)
+    cited = (citing * rng.random(len(citing)) ** 2).astype(np.int64)
+    edges = np.unique(np.column_stack([cited, citing]), axis=0)
+    return citation_network.CitationGraph(nodes, edges[:, 0], edges[:, 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic case CSV (for benchmarks only)')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=Path, default=SYNTHETIC_DIR)
+    args = parser.parse_args()
+    print(write_csv(args.rows, args.seed, args.out))
+
+
+if __name__ == '__main__':
+    main()
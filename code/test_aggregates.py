@@ -0,0 +1,17 @@
+"""Count tensor queries (python -m pytest, from code/)"""
+
+import pandas as pd
+
+import case_data
+from aggregates import CountTensor
+
+
+def test_absent_levels_count_as_zero():
+    df = case_data.load_cases(case_data.DEFAULT_CSV)
+    counts = CountTensor.from_frame(df[df['Crisis_Catalyzed'] == 1])
+    assert counts.count(Crisis_Catalyzed=0) == 0
+    assert counts.count(Crisis_Catalyzed=1) == 30
+    years = counts.series('Year', Crisis_Catalyzed=0)
+    pd.testing.assert_index_equal(years.index, counts.labels['Year'])
+    assert (years == 0).all()
+    assert counts.moving_average('Year', 3, Crisis_Catalyzed=0).fillna(0).eq(0).all()
@@ -0,0 +1,33 @@
+"""Round trip of the binary sidecar (python -m pytest, from code/)"""
+
+import shutil
+
+import pandas as pd
+
+import case_data
+import validation
+
+
+def test_sidecar_keeps_blank_text_cells_missing(tmp_path):
+    csv = tmp_path / 'cases.csv'
+    shutil.copy(case_data.DEFAULT_CSV, csv)
+    df = pd.read_csv(csv, dtype=str)
+    df.loc[3, 'Case_ID'] = None
+    df.loc[5, 'Primary_Sources'] = None
+    df.to_csv(csv, index=False)
+
+    cold = case_data.load_cases(csv)
+    assert case_data.sidecar_dir(csv).exists()
+    warm = case_data.load_cases(csv)
+    text = case_data.TEXT_COLUMNS
+    pd.testing.assert_frame_equal(cold.drop(columns=text), warm.drop(columns=text),
+                                  check_categorical=False)
+    pd.testing.assert_frame_equal(cold[text].fillna(''), warm[text].fillna(''))
+    assert warm['Case_ID'].isna().tolist() == [i == 3 for i in range(len(warm))]
+    assert warm['Primary_Sources'].isna().tolist() == [i == 5 for i in range(len(warm))]
+
+    cold_issues, warm_issues = (
+        [(i['rule'], i['column'], i['severity'], i['rows']) for i in validation.validate(frame).issues]
+        for frame in (cold, warm))
+    assert cold_issues == warm_issues == [('required', 'Case_ID', 'error', [3]),
+                                          ('required', 'Primary_Sources', 'error', [5])]
@@ -0,0 +1,31 @@
+"""Citation centrality (python -m pytest, from code/)"""
+
+import networkx as nx
+import numpy as np
+
+import citation_network
+
+LEAF_CITERS = ['COSTA_RICA_NICARAGUA', 'CHILE_BOLIVIA', 'WHALING_CASE', 'IACHR_CASES']
+
+
+def test_pagerank_ranks_cited_precedents_above_leaf_citers():
+    graph = citation_network.load_graph()
+    rank = citation_network.pagerank(graph)
+    assert rank.idxmax() == 'BOTNIA_ICJ'
+    for precedent in ('TRAIL_SMELTER', 'CORFU_CHANNEL'):
+        assert rank[precedent] > rank[LEAF_CITERS].max()
+
+    # Same as networkx on the citing -> cited graph
+    G = nx.DiGraph()
+    G.add_nodes_from(graph.nodes['Node_ID'])
+    ids = graph.nodes['Node_ID'].to_numpy()
+    G.add_edges_from(zip(ids[graph.targets], ids[graph.sources]))
+    reference = nx.pagerank(G, alpha=0.85, tol=1e-12)
+    assert np.allclose(rank.to_numpy(), [reference[i] for i in ids], atol=1e-8)
+
+
+def test_degree_counts_citations_received():
+    degrees = citation_network.degree_centrality(citation_network.load_graph())
+    assert degrees.loc['BOTNIA_ICJ'].tolist() == [10, 4]
+    assert degrees.loc['TRAIL_SMELTER'].tolist() == [1, 0]
+    assert degrees.loc['COSTA_RICA_NICARAGUA'].tolist() == [0, 1]
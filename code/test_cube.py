@@ -0,0 +1,42 @@
+"""Incremental cube refresh (python -m pytest, from code/)"""
+
+import pandas as pd
+import pytest
+
+import case_data
+import cube
+import validation
+
+
+def _cells(tensor):
+    series = tensor.to_series()
+    return series[series > 0].sort_index()
+
+
+def test_append_matches_full_recount_and_rejects_repeated_ids(tmp_path):
+    cases = pd.read_csv(case_data.DEFAULT_CSV, dtype=str)
+    csv = tmp_path / 'cases.csv'
+    cases.iloc[:40].to_csv(csv, index=False)
+    directory = tmp_path / 'cube'
+
+    _, summary = cube.load_cube([csv], batch_rows=7, directory=directory,
+                                validator=validation.BatchValidator())
+    assert summary['mode'] == 'rebuilt'
+    cases.iloc[40:].to_csv(csv, mode='a', header=False, index=False)
+    appended, summary = cube.load_cube([csv], batch_rows=7, directory=directory,
+                                       validator=validation.BatchValidator())
+    assert (summary['mode'], summary['rows_added']) == ('updated', 20)
+
+    recount = cube.AggregateCube([csv], tmp_path / 'recount')
+    recount.rebuild(batch_rows=7)
+    pd.testing.assert_series_equal(_cells(appended.counts()), _cells(recount.counts()))
+
+    # A later tail repeating a counted Case_ID is refused and nothing is saved
+    cases.iloc[[4]].to_csv(csv, mode='a', header=False, index=False)
+    with pytest.raises(validation.ValidationError) as exc:
+        cube.load_cube([csv], batch_rows=7, directory=directory,
+                       validator=validation.BatchValidator())
+    [issue] = [i for i in exc.value.report.issues if i['rule'] == 'unique']
+    assert issue['column'] == 'Case_ID' and issue['rows'] == [60]
+    reloaded = cube.AggregateCube([csv], directory)
+    assert reloaded.load() and reloaded.acc.rows == 60
@@ -0,0 +1,47 @@
+"""Nearest-neighbour matching against an all-pairs reference (python -m pytest, from code/)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import psm
+
+
+def _brute_force(scores, treated, k, caliper, replace, order):
+    """Greedy 1:k matching by scanning every control for every pick"""
+    t_idx = np.flatnonzero(treated)
+    c_idx = np.flatnonzero(~treated)
+    if not replace:
+        t_idx = {'largest': t_idx[np.argsort(-scores[t_idx], kind='stable')],
+                 'smallest': t_idx[np.argsort(scores[t_idx], kind='stable')],
+                 'data': t_idx}[order]
+    free = set(c_idx.tolist())
+    rows = []
+    for t in t_idx:
+        candidates = sorted(c_idx if replace else free, key=lambda c: abs(scores[c] - scores[t]))
+        for c in candidates[:k]:
+            d = abs(scores[c] - scores[t])
+            if caliper is not None and d > caliper:
+                break
+            rows.append((t, c, d))
+            if not replace:
+                free.discard(c)
+    return pd.DataFrame(rows, columns=['treated', 'control', 'distance'])
+
+
+@pytest.mark.parametrize('replace', [False, True])
+@pytest.mark.parametrize('k', [1, 3])
+@pytest.mark.parametrize('caliper', [None, 0.02])
+@pytest.mark.parametrize('order', ['largest', 'smallest', 'data'])
+def test_match_agrees_with_all_pairs_search(replace, k, caliper, order):
+    rng = np.random.default_rng(7)
+    for n, share in ((40, 0.5), (200, 0.3), (25, 0.8)):
+        scores = rng.random(n)
+        treated = rng.random(n) < share
+        got = psm.match(scores, treated, k=k, caliper=caliper, replace=replace, order=order)
+        want = _brute_force(scores, treated, k, caliper, replace, order)
+        key = ['treated', 'control']
+        got = got.sort_values(key).reset_index(drop=True)
+        want = want.sort_values(key).reset_index(drop=True)
+        pd.testing.assert_frame_equal(got[key + ['distance']], want, check_dtype=False)
+        assert np.allclose(got.groupby('treated')['weight'].sum(), 1.0)
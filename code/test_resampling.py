@@ -0,0 +1,54 @@
+"""Reproducibility of the resampling runner (python -m pytest, from code/)"""
+
+import numpy as np
+import pytest
+
+import resampling
+from checkpoint import Checkpoint
+
+RNG = np.random.default_rng(3)
+SPECS = {'a': (RNG.normal(1.0, 1.0, 23), RNG.normal(0.0, 1.0, 31)),
+         'b': (RNG.normal(0.0, 2.0, 12), RNG.normal(0.5, 1.0, 9))}
+ARGS = dict(n_replicates=950, batch_size=100, seed=11)
+
+
+def _assert_same(got, want):
+    assert set(got) == set(want)
+    for name in want:
+        np.testing.assert_array_equal(got[name].values, want[name].values)
+        assert got[name].n == want[name].n == ARGS['n_replicates']
+        assert np.isclose(got[name].mean, want[name].mean)
+        assert np.isclose(got[name].sd, want[name].sd)
+        assert np.isclose(got[name].mean, want[name].values.mean())
+
+
+@pytest.mark.parametrize('kind', resampling.KINDS)
+def test_workers_do_not_change_results(kind):
+    serial = resampling.resample(SPECS, kind, jobs=1, **ARGS)
+    _assert_same(resampling.resample(SPECS, kind, jobs=2, **ARGS), serial)
+
+
+@pytest.mark.parametrize('kind', resampling.KINDS)
+def test_resumed_run_matches_uninterrupted_run(kind, tmp_path, monkeypatch):
+    uninterrupted = resampling.resample(SPECS, kind, **ARGS)
+
+    run_batch = resampling._run_batch
+    calls = []
+
+    def interrupted(*task):
+        if len(calls) == 7:
+            raise KeyboardInterrupt
+        calls.append(task)
+        return run_batch(*task)
+
+    checkpoint = Checkpoint(kind, directory=tmp_path, every=0.0)
+    monkeypatch.setattr(resampling, '_run_batch', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        resampling.resample(SPECS, kind, checkpoint=checkpoint, **ARGS)
+    meta, _ = checkpoint.load()
+    assert meta['progress'] == '7/20 batches'
+
+    monkeypatch.setattr(resampling, '_run_batch', run_batch)
+    resumed = resampling.resample(SPECS, kind, checkpoint=checkpoint, **ARGS)
+    _assert_same(resumed, uninterrupted)
+    assert not checkpoint.path.exists()
@@ -0,0 +1,47 @@
+"""Exact and LSH similarity search (python -m pytest, from code/)"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import case_data
+import similarity
+
+
+def _corpus(n=4000, seed=1):
+    """Mostly distinct profiles, the case LSH is meant for"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({c: rng.choice([f'{c[:3]}{i}' for i in range(5)], n)
+                       for c in similarity.DEFAULT_FIELDS})
+    df['Year'] = rng.integers(1950, 2021, n)
+    return df
+
+
+@pytest.mark.parametrize('filters', [{}, {'same': ('International_Tribunal',)}, {'years': 10}])
+def test_lsh_agrees_with_exact_on_the_dataset(filters):
+    df = case_data.load_cases(case_data.DEFAULT_CSV)
+    rows = np.arange(len(df))
+    exact = similarity.SimilarityIndex(df, method='exact').query(rows, k=5, **filters)
+    lsh = similarity.SimilarityIndex(df, method='lsh').query(rows, k=5, **filters)
+    np.testing.assert_array_equal(lsh[0], exact[0])
+    np.testing.assert_array_equal(lsh[1], exact[1])
+
+
+def test_lsh_agrees_with_exact_on_distinct_profiles():
+    df = _corpus()
+    rows = np.arange(len(df))
+    idx, dist = similarity.SimilarityIndex(df, method='exact').query(rows, k=5)
+
+    lsh = similarity.SimilarityIndex(df, method='lsh')
+    candidates, _ = lsh._candidates(lsh.profile[rows])
+    assert len(candidates) < len(df) * len(df) / 5
+    lsh_idx, lsh_dist = lsh.query(rows, k=5)
+    np.testing.assert_array_equal(lsh_dist, dist)
+    # Equally near cases may be missed in favour of later ones
+    assert (lsh_idx == idx).all(axis=1).mean() > 0.999
+
+    # Fewer, wider tables are faster but approximate: never nearer than the truth
+    coarse = similarity.SimilarityIndex(df, method='lsh', tables=4, fields_per_table=3)
+    coarse_idx, coarse_dist = coarse.query(rows, k=5)
+    assert (coarse_dist >= dist).all()
+    assert (coarse_idx == idx).all(axis=1).mean() > 0.3
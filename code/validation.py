@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Codebook validation for case tables (data/DATA_CODEBOOK.md,
+data_extended/codebook_variables.md, data_extended/verification_protocol.md)
+
+The rules are declared in CODEBOOK and checked column by column, with
+vectorized operations only: categorical columns are checked once per
+category label and mapped back to rows through their codes, so a
+million-row table validates in about a second. Checks:
+  required   every codebook column is present and filled
+  allowed    values of enumerated variables (Crisis_Catalyzed, region,
+             legal family, conflict type, tribunal, Verified_Status:
+             unverified cases are excluded)
+  range      Year within the codebook range
+  pattern    Case_ID is CRISIS_### or CONTROL_###
+  prefix     the Case_ID prefix agrees with Crisis_Catalyzed
+  unique     Case_IDs are unique (also across batches when streaming)
+  duplicate  the same event recorded under several IDs (warning)
+  padding    labels with leading/trailing whitespace (warning)
+Every finding is one issue in a ValidationReport: rule, column,
+severity, number of rows, and the first offending rows and values.
+validate() checks a loaded table, BatchValidator the batches of a stream.
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import case_data
+
+# Vocabularies of data/DATA_CODEBOOK.md (variables 8 and 9): the named
+# categories first, then the values the codebook groups as "Others" (and,
+# for tribunals, under national constitutional courts) in the verified dataset
+CONFLICT_TYPES = [
+    # Europe-dominant
+    'Migration Crisis', 'Constitutional Crisis', 'Rule of Law Crisis', 'Secessionist Crisis',
+    'Economic Crisis', 'Fiscal Crisis', 'Treaty Crisis',
+    # Latin America-dominant
+    'Environmental Conflict', 'Resource Nationalism', 'Extractive Conflict',
+    'Investment Treaty Termination',
+    # Cross-regional
+    'Trade Integration', 'Financial Cooperation', 'Regulatory Reform',
+    # Others
+    'Administrative Cooperation', 'Border Cooperation', 'Economic Adjustment',
+    'Energy Cooperation', 'Energy Crisis', 'Enlargement', 'Enlargement Process',
+    'Environmental Cooperation', 'Environmental Regulation', 'External Relations',
+    'Financial Integration', 'Financial Stabilization', 'Infrastructure Cooperation',
+    'Infrastructure Development', 'Investment Arbitration', 'Migration Management',
+    'Monetary Integration', 'Regional Integration', 'Security Cooperation', 'Tax Cooperation',
+    'Trade Treaty Crisis', 'Treaty Compliance',
+]
+TRIBUNALS = [
+    'ECJ', 'ICJ', 'ICSID', 'IACHR', 'EFTA Court', 'CCJ', 'Regional Court',
+    # National constitutional and domestic courts
+    'Constitutional Court', 'Constitutional Council', 'Constitutional Challenges',
+    'Swiss Federal Court', 'Domestic Courts',
+    # Others
+    'Bilateral Treaty', 'Canal Authority', 'ILO 169', 'National Assembly',
+]
+
+CODEBOOK = {
+    'required': list(case_data.SCHEMA),
+    'allowed': {
+        'Crisis_Catalyzed': [0, 1],
+        'Geographic_Region': ['Europe', 'Latin America'],
+        'Legal_Family': ['Civil Law', 'Common Law'],
+        'Conflict_Type': CONFLICT_TYPES,
+        'International_Tribunal': TRIBUNALS,
+        'Verified_Status': ['Verified'],
+    },
+    'range': {'Year': (1973, 2023)},
+    'pattern': {'Case_ID': r'(CRISIS|CONTROL)_\d{3,}'},
+    'prefix': ('Case_ID', 'Crisis_Catalyzed', {'CRISIS_': 1, 'CONTROL_': 0}),
+    'unique': ['Case_ID'],
+    'duplicate': ['Country', 'Year', 'Event_Name'],
+    'padding': case_data.CATEGORY_COLUMNS + ['Case_ID', 'Event_Name'],
+}
+WARNING_RULES = ('duplicate', 'padding')
+
+# Offending rows and values listed per issue
+EXAMPLES = 5
+
+
+class ValidationError(ValueError):
+    """Raised by ValidationReport.check() when a table breaks the codebook"""
+
+    def __init__(self, report):
+        self.report = report
+        super().__init__(report.summary())
+
+
+class ValidationReport:
+    """Issues found in a table: one dict per (rule, column)"""
+
+    def __init__(self, source=''):
+        self.source = source
+        self.rows = 0
+        self.issues = []
+
+    def add(self, rule, column, rows, values, message, count=None):
+        """Record an issue for the given row positions (nothing if there are none)"""
+        rows = np.asarray(rows)
+        count = len(rows) if count is None else count
+        if not count:
+            return
+        examples = [v.item() if isinstance(v, np.generic) else v for v in values[:EXAMPLES]]
+        issue = next((i for i in self.issues if (i['rule'], i['column']) == (rule, column)), None)
+        if issue is None:
+            self.issues.append({
+                'rule': rule,
+                'column': column,
+                'severity': 'warning' if rule in WARNING_RULES else 'error',
+                'count': 0,
+                'message': message,
+                'rows': [],
+                'examples': [],
+            })
+            issue = self.issues[-1]
+        issue['count'] += int(count)
+        room = EXAMPLES - len(issue['rows'])
+        issue['rows'] += [int(r) for r in rows[:room]]
+        issue['examples'] += examples[:max(room, 0)] if len(rows) else []
+
+    @property
+    def errors(self):
+        return [i for i in self.issues if i['severity'] == 'error']
+
+    @property
+    def warnings(self):
+        return [i for i in self.issues if i['severity'] == 'warning']
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def to_dict(self):
+        return {'source': self.source, 'rows': self.rows, 'ok': self.ok,
+                'errors': len(self.errors), 'warnings': len(self.warnings),
+                'issues': self.issues}
+
+    def summary(self):
+        head = f"{self.source or 'dataset'}: {self.rows} rows, " \
+               f"{len(self.errors)} errors, {len(self.warnings)} warnings"
+        lines = [head]
+        for i in self.issues:
+            mark = '✗' if i['severity'] == 'error' else '!'
+            lines.append(f"  {mark} [{i['rule']}] {i['column']}: {i['message']} "
+                         f"({i['count']} rows; e.g. rows {i['rows']}: {i['examples']})")
+        return '\n'.join(lines)
+
+    def check(self):
+        """Raise ValidationError if there are errors; returns the report otherwise"""
+        if not self.ok:
+            raise ValidationError(self)
+        return self
+
+
+def _label_mask(series, test):
+    """
+    Apply test (labels -> bool mask) to every row; for categoricals it is
+    evaluated once per category and mapped through the codes.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        per_label = np.append(np.asarray(test(pd.Series(series.cat.categories)), dtype=bool), False)
+        return per_label[codes]  # code -1 (missing) reads the trailing False
+    return np.asarray(test(series), dtype=bool) & series.notna().to_numpy()
+
+
+def _check_frame(df, report, offset=0, rules=CODEBOOK):
+    """Row-level rules on one frame; row positions are reported + offset"""
+    def add(rule, col, mask, message):
+        rows = np.flatnonzero(mask)
+        report.add(rule, col, rows + offset, df[col].to_numpy()[rows[:EXAMPLES]], message)
+
+    present = [c for c in rules['required'] if c in df.columns]
+    missing_cols = [c for c in rules['required'] if c not in df.columns]
+    for col in missing_cols:
+        report.add('required', col, [], [], 'column missing', count=1)
+    for col in present:
+        add('required', col, df[col].isna().to_numpy(), 'missing value')
+
+    for col, allowed in rules['allowed'].items():
+        if col in df:
+            add('allowed', col, _label_mask(df[col], lambda s: ~s.isin(allowed)),
+                f"not one of {allowed}")
+    for col, (lo, hi) in rules['range'].items():
+        if col in df:
+            v = df[col].to_numpy(dtype=float, na_value=np.nan)  # missing: neither < nor >
+            add('range', col, (v < lo) | (v > hi), f"outside {lo}-{hi}")
+
+    for col, pattern in rules['pattern'].items():
+        if col in df:
+            regex = re.compile(pattern)
+            add('pattern', col, _label_mask(df[col], lambda s: ~s.str.fullmatch(regex).astype(bool)),
+                f"does not match {pattern}")
+    id_col, flag_col, prefixes = rules['prefix']
+    if id_col in df and flag_col in df:
+        expected = np.full(len(df), -1)
+        for prefix, flag in prefixes.items():
+            expected[_label_mask(df[id_col], lambda s: s.str.startswith(prefix))] = flag
+        flag = df[flag_col].to_numpy(dtype=float, na_value=np.nan)
+        add('prefix', id_col, (expected >= 0) & ~np.isnan(flag) & (expected != flag),
+            f"prefix disagrees with {flag_col}")
+
+    for col in rules['unique']:
+        if col in df:
+            add('unique', col, df[col].duplicated(keep=False).to_numpy(), 'duplicate value')
+    cols = [c for c in rules['duplicate'] if c in df]
+    if cols and len(cols) == len(rules['duplicate']):
+        add('duplicate', cols[-1], df.duplicated(cols, keep='first').to_numpy(),
+            f"same {' + '.join(cols)} as an earlier case")
+    for col in rules['padding']:
+        if col in df:
+            add('padding', col, _label_mask(df[col], lambda s: s.str.strip() != s),
+                'leading/trailing whitespace')
+
+
+def validate(df, source='', rules=CODEBOOK):
+    """Check a loaded case table against the codebook; returns a ValidationReport"""
+    report = ValidationReport(source)
+    report.rows = len(df)
+    _check_frame(df, report, rules=rules)
+    return report
+
+
+class _HashRuns:
+    """
+    A growing set of 64-bit hashes as sorted runs, merged like the digits
+    of a binary counter: n hashes are added and looked up in O(n log n)
+    overall, without a Python-level set
+    """
+
+    def __init__(self, hashes=None):
+        self.runs = []
+        if hashes is not None and len(hashes):
+            self.runs.append(np.sort(np.asarray(hashes, dtype=np.uint64)))
+
+    def contains(self, h):
+        """Boolean mask: which of the hashes h are in the set"""
+        found = np.zeros(len(h), dtype=bool)
+        for run in self.runs:
+            i = np.minimum(np.searchsorted(run, h), len(run) - 1)
+            found |= run[i] == h
+        return found
+
+    def add(self, h):
+        run = np.sort(h)
+        while self.runs and len(self.runs[-1]) <= len(run):
+            run = np.sort(np.concatenate([self.runs.pop(), run]))
+        self.runs.append(run)
+
+    def array(self):
+        return np.concatenate(self.runs) if self.runs else np.zeros(0, dtype=np.uint64)
+
+
+class BatchValidator:
+    """
+    Validates a stream batch by batch, with the validate(batch, source)
+    signature of case_data.check_batch. The unique and duplicate rules
+    are checked across batches through 64-bit hashes of the unique
+    columns and of the duplicate row keys, kept as sorted runs, so repeats
+    of earlier rows are recognized (and their values sampled) while their
+    batch is at hand. add_seen() makes hashes() of rows validated before,
+    such as those already in an aggregate cube, count as earlier rows.
+    Everything is collected in self.report (call finish() after the last
+    batch). A batch without some codebook column cannot be counted, so
+    that raises ValidationError right away.
+    """
+
+    def __init__(self, source='', rules=CODEBOOK):
+        self.report = ValidationReport(source)
+        self.rules = rules
+        self.parts = {c: [] for c in rules['unique']}
+        self.seen = {c: _HashRuns() for c in rules['unique']}
+        self.prior = {c: _HashRuns() for c in rules['unique']}
+        self.row_hashes = _HashRuns()
+        # Offending values by hash, for the examples of the unique rule
+        self.repeated = {c: {} for c in rules['unique']}
+        # Row number of the first row of the stream, for the report
+        self.offset = 0
+
+    def add_seen(self, hashes, rows=0):
+        """
+        Count `rows` rows with these hashes() (from an earlier run) as
+        preceding the stream; reported row numbers start after them
+        """
+        self.offset += rows
+        for col in self.seen:
+            h = hashes.get(f'unique.{col}')
+            if h is not None and len(h):
+                self.seen[col].add(h)
+                self.prior[col].add(h)
+        if hashes.get('duplicate') is not None and len(hashes['duplicate']):
+            self.row_hashes.add(hashes['duplicate'])
+
+    def hashes(self):
+        """Hashes of the rows seen so far (including add_seen()), for add_seen() later"""
+        out = {f'unique.{col}': runs.array() for col, runs in self.seen.items()}
+        out['duplicate'] = self.row_hashes.array()
+        return out
+
+    def __call__(self, batch, source=''):
+        rules = dict(self.rules, unique=[], duplicate=[])
+        offset = self.offset + self.report.rows
+        _check_frame(batch, self.report, offset=offset, rules=rules)
+        self.report.rows += len(batch)
+        if any(c not in batch for c in self.rules['required']):
+            raise ValidationError(self.report)
+        for col in self.parts:
+            if col not in batch:
+                continue
+            values = batch[col].to_numpy(dtype=object)
+            h = pd.util.hash_array(values)
+            repeated = self.seen[col].contains(h) | pd.Series(h).duplicated(keep=False).to_numpy()
+            for i in np.flatnonzero(repeated):
+                self.repeated[col].setdefault(h[i], values[i])
+            self.parts[col].append(h)
+            self.seen[col].add(h)
+        cols = self.rules['duplicate']
+        if cols and all(c in batch for c in cols):
+            h = pd.util.hash_pandas_object(batch[cols], index=False).to_numpy()
+            rows = np.flatnonzero(self.row_hashes.contains(h) | pd.Series(h).duplicated().to_numpy())
+            self.report.add('duplicate', cols[-1], rows + offset,
+                            batch[cols[-1]].to_numpy()[rows[:EXAMPLES]],
+                            f"same {' + '.join(cols)} as an earlier case")
+            self.row_hashes.add(h)
+        return batch
+
+    def finish(self):
+        """Report the unique rule over all batches (every occurrence of a repeated value)"""
+        for col, parts in self.parts.items():
+            if not parts:
+                continue
+            h = np.concatenate(parts)
+            _, inverse, counts = np.unique(h, return_inverse=True, return_counts=True)
+            rows = np.flatnonzero((counts[inverse] > 1) | self.prior[col].contains(h))
+            values = [self.repeated[col][v] for v in h[rows[:EXAMPLES]]]
+            self.report.add('unique', col, rows + self.offset, values, 'duplicate value')
+        return self.report
+
+
+def validate_paths(paths, batch_rows=None):
+    """
+    Validate case CSVs: loaded whole (as load_data does), or streamed in
+    batches of batch_rows with bounded memory.
+    """
+    paths = case_data.expand_paths(paths)
+    source = ', '.join(p.name for p in paths)
+    if batch_rows:
+        validator = BatchValidator(source)
+        try:
+            for _ in case_data.iter_batches(paths, batch_rows, validate=validator):
+                pass
+        except ValidationError as exc:
+            return exc.report
+        return validator.finish()
+    frames = [case_data.load_cases(p) for p in paths]
+    df = frames[0] if len(frames) == 1 else case_data.apply_schema(pd.concat(frames, ignore_index=True))
+    return validate(df, source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check case CSVs against the codebook')
+    parser.add_argument('--data', action='append', type=Path, metavar='PATH',
+                        help='case CSV or directory of CSVs (repeatable; default: the 60-case dataset)')
+    parser.add_argument('--batch-rows', type=int,
+                        help='validate in streamed batches of this many rows (default: load whole)')
+    parser.add_argument('--json', type=Path, metavar='PATH', help='write the report as JSON')
+    args = parser.parse_args()
+
+    report = validate_paths(args.data or [case_data.DEFAULT_CSV], args.batch_rows)
+    print(report.summary())
+    if args.json:
+        args.json.write_text(json.dumps(report.to_dict(), indent=2) + '\n')
+        print(f"✓ Report written to {args.json}")
+    if not report.ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()